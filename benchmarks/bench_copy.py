@@ -0,0 +1,84 @@
+"""Throughput and peak RSS of the streaming COPY loader, CSV vs. binary.
+
+Each format runs in its own child process so peak RSS is measured
+independently. With a reachable database (PG* environment variables) rows
+are COPYed into a temporary table; with --no-db the COPY stream is only
+encoded and drained locally.
+
+Usage: python benchmarks/bench_copy.py [--rows N] [--batch-size N] [--no-db]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from qakit.copyload import IterStream, copy_blocks, iter_copy_chunks  # noqa: E402
+from qakit.generator import BlockGenerator  # noqa: E402
+
+TEMP_TABLE_DDL = '''CREATE TEMP TABLE bench_copy (
+  user_id BIGINT NOT NULL, product_id BIGINT NOT NULL, amount NUMERIC(12,2) NOT NULL,
+  currency CHAR(3) NOT NULL, transaction_date TIMESTAMP NOT NULL, status VARCHAR(20) NOT NULL,
+  remarks TEXT, marker_tag UUID)'''
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_child(fmt, rows, batch_size, use_db):
+    blocks = BlockGenerator(seed=42, block_size=batch_size, marker_tag='00000000-0000-0000-0000-000000000042').blocks(rows)
+    baseline_rss = peak_rss_mb()
+    start = time.perf_counter()
+    if use_db:
+        from qakit.db import get_conn
+        conn = get_conn()
+        try:
+            with conn, conn.cursor() as cur:
+                cur.execute(TEMP_TABLE_DDL)
+                loaded = copy_blocks(cur, blocks, fmt=fmt, table='bench_copy')
+        finally:
+            conn.close()
+        payload = None
+    else:
+        stats = {}
+        stream = IterStream(iter_copy_chunks(blocks, fmt, stats))
+        while stream.read(8192):
+            pass
+        loaded, payload = stats['rows'], stats['bytes']
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'format': fmt, 'rows': loaded, 'seconds': elapsed, 'payload_bytes': payload,
+                      'baseline_rss_mb': baseline_rss, 'peak_rss_mb': peak_rss_mb()}))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--batch-size', type=int, default=100_000)
+    parser.add_argument('--no-db', action='store_true')
+    parser.add_argument('--child', choices=['csv', 'binary'], help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        return run_child(args.child, args.rows, args.batch_size, not args.no_db)
+
+    for fmt in ('csv', 'binary'):
+        cmd = [sys.executable, os.path.abspath(__file__), '--child', fmt,
+               '--rows', str(args.rows), '--batch-size', str(args.batch_size)]
+        if args.no_db:
+            cmd.append('--no-db')
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        payload = f", {r['payload_bytes'] / r['rows']:.0f} B/row" if r['payload_bytes'] else ''
+        print(f"{fmt:>6}: {r['rows'] / r['seconds']:>12,.0f} rows/s  {r['rows']:,} rows in {r['seconds']:.2f}s"
+              f"  peak RSS {r['peak_rss_mb']:.0f} MB (baseline {r['baseline_rss_mb']:.0f} MB){payload}")
+
+
+if __name__ == '__main__':
+    main()
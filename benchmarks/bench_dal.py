@@ -0,0 +1,102 @@
+"""Round trips and rows/sec for transaction writes: per-row INSERT strings vs. qakit.dal.
+
+Cases, each inserting --rows rows into a temp copy of sample_data.transactions:
+  legacy       cur.execute() of the full INSERT text once per row (the old steps)
+  prepared     TransactionWriter.insert(): EXECUTE of a statement prepared once
+  values       TransactionWriter.insert_many(): multi-row VALUES pages
+  capture      TransactionWriter.insert_rows() with --bad rows violating NOT NULL
+  legacy-capture  per-row INSERT wrapped in its own SAVEPOINT (what per-row error
+                  capture costs without batching)
+Round trips are counted by qakit.profiling's CountingCursor.
+
+Usage: python benchmarks/bench_dal.py [--rows N] [--bad N] [--page-size N]
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import psycopg2  # noqa: E402
+
+from qakit import dal, profiling  # noqa: E402
+from qakit.db import get_conn  # noqa: E402
+
+TABLE = 'bench_transactions'
+LEGACY_SQL = (f'INSERT INTO {TABLE} (user_id, product_id, amount, currency, transaction_date, status, '
+              'remarks, marker_tag) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)')
+
+
+def make_rows(n, bad):
+    now = datetime.datetime.utcnow()
+    step = n // bad if bad else 0
+    return [(None if step and i % step == step - 1 else i, i, Decimal('1.00'), 'USD', now, 'completed', 'bench-dal', None)
+            for i in range(n)]
+
+
+def legacy(cur, rows):
+    for r in rows:
+        cur.execute(LEGACY_SQL, r)
+
+
+def legacy_capture(cur, rows):
+    failed = []
+    for i, r in enumerate(rows):
+        cur.execute('SAVEPOINT bench')
+        try:
+            cur.execute(LEGACY_SQL, r)
+        except psycopg2.Error:
+            cur.execute('ROLLBACK TO SAVEPOINT bench')
+            failed.append(i)
+        cur.execute('RELEASE SAVEPOINT bench')
+    return failed
+
+
+def run_case(name, rows, page_size):
+    conn = get_conn()
+    try:
+        with conn, conn.cursor() as cur:
+            # a temp copy of the table, so nothing real is written
+            cur.execute(f'CREATE TEMP TABLE {TABLE} (LIKE sample_data.transactions INCLUDING ALL)')
+            writer = dal.TransactionWriter(cur, table=TABLE, page_size=page_size)
+            before = profiling.COUNTERS.snapshot()['round_trips']
+            start = time.perf_counter()
+            if name == 'legacy':
+                legacy(cur, rows)
+            elif name == 'prepared':
+                for r in rows:
+                    writer.insert(r)
+            elif name == 'values':
+                writer.insert_many(rows)
+            elif name == 'capture':
+                failed = writer.insert_rows(rows).failed_rows
+            else:
+                failed = legacy_capture(cur, rows)
+            seconds = time.perf_counter() - start
+            trips = profiling.COUNTERS.snapshot()['round_trips'] - before
+            conn.rollback()
+    finally:
+        conn.close()
+    extra = f'  rejected {len(failed)}' if name in ('capture', 'legacy-capture') else ''
+    print(f'{name:>15}: {trips:>7} round trips  {len(rows) / seconds:>10,.0f} rows/s{extra}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--bad', type=int, default=10, help='rows violating NOT NULL in the capture cases')
+    parser.add_argument('--page-size', type=int, default=dal.PAGE_SIZE)
+    args = parser.parse_args(argv)
+    profiling.ENABLED = True
+    clean, dirty = make_rows(args.rows, 0), make_rows(args.rows, args.bad)
+    for name in ('legacy', 'prepared', 'values'):
+        run_case(name, clean, args.page_size)
+    for name in ('legacy-capture', 'capture'):
+        run_case(name, dirty, args.page_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Extra cost of idempotent (deduplicating) ingestion over a blind COPY.
+
+The input repeats a fraction of its batches (--dup-rate) to mimic retried
+deliveries. With a reachable database (PG* environment variables) both
+paths load into temporary tables: a blind COPY, and DedupIngestor's
+client-side filter + staging COPY + ON CONFLICT DO NOTHING merge. With
+--no-db only the client-side part is timed: COPY encoding alone vs.
+business-key hashing + Bloom filtering + encoding.
+
+Usage: python benchmarks/bench_dedup.py [--rows N] [--batch-size N] [--dup-rate F] [--no-db]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from qakit.copyload import copy_blocks, iter_copy_chunks  # noqa: E402
+from qakit.dedup import DedupIngestor  # noqa: E402
+from qakit.generator import BlockGenerator  # noqa: E402
+
+COLUMNS_DDL = '''user_id BIGINT NOT NULL, product_id BIGINT NOT NULL, amount NUMERIC(12,2) NOT NULL,
+  currency CHAR(3) NOT NULL, transaction_date TIMESTAMP NOT NULL, status VARCHAR(20) NOT NULL,
+  remarks TEXT, marker_tag UUID'''
+
+
+def deliveries(rows, batch_size, dup_rate):
+    blocks = list(BlockGenerator(seed=42, block_size=batch_size).blocks(rows))
+    every = max(1, round(1 / dup_rate)) if dup_rate else None
+    out = []
+    for i, blk in enumerate(blocks):
+        out.append(blk)
+        if every and i % every == every - 1:
+            out.append(blk)
+    return out
+
+
+class DrainCursor:
+    """Stands in for a cursor with --no-db: drains the COPY stream, no merge."""
+
+    rowcount = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def copy_expert(self, sql, stream):
+        while stream.read(65536):
+            pass
+
+    def execute(self, sql, params=None):
+        pass
+
+
+class DrainConn:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return DrainCursor()
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=500_000)
+    parser.add_argument('--batch-size', type=int, default=50_000)
+    parser.add_argument('--dup-rate', type=float, default=0.2, help='fraction of batches delivered twice')
+    parser.add_argument('--no-db', action='store_true')
+    args = parser.parse_args(argv)
+    batches = deliveries(args.rows, args.batch_size, args.dup_rate)
+    offered = sum(len(b) for b in batches)
+
+    if args.no_db:
+        def blind():
+            for _ in iter_copy_chunks(batches, 'binary', {}):
+                pass
+        ingestor = DedupIngestor(DrainConn())
+        blind_s = timed(blind)
+        dedup_s = timed(lambda: [ingestor.ingest([b]) for b in batches])
+        # nothing is merged without a database
+        for key in ('inserted', 'server_duplicates'):
+            ingestor.stats.pop(key)
+    else:
+        from qakit.db import get_conn
+        conn = get_conn()
+        try:
+            with conn, conn.cursor() as cur:
+                cur.execute(f'CREATE TEMP TABLE bench_blind ({COLUMNS_DDL})')
+                cur.execute(f'CREATE TEMP TABLE bench_dedup ({COLUMNS_DDL}, business_key UUID UNIQUE)')
+            with conn, conn.cursor() as cur:
+                blind_s = timed(lambda: [copy_blocks(cur, [b], fmt='binary', table='bench_blind') for b in batches])
+            ingestor = DedupIngestor(conn, table='bench_dedup')
+            dedup_s = timed(lambda: [ingestor.ingest([b]) for b in batches])
+        finally:
+            conn.close()
+    print(json.dumps({'offered_rows': offered, 'blind_seconds': round(blind_s, 3), 'dedup_seconds': round(dedup_s, 3),
+                      'overhead': round(dedup_s / blind_s, 2) if blind_s else None, 'dedup_stats': ingestor.stats}))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Rows/sec of the columnar BlockGenerator vs. the per-row gen_row().
+
+Usage: python benchmarks/bench_generator.py [--rows N] [--legacy-rows N] [--block-size N]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from qakit.generator import BlockGenerator, gen_row  # noqa: E402
+
+
+def bench_legacy(n):
+    start = time.perf_counter()
+    for _ in range(n):
+        gen_row(marker_tag='bench')
+    return n / (time.perf_counter() - start)
+
+
+def bench_blocks(n, block_size, materialize):
+    start = time.perf_counter()
+    gen = BlockGenerator(seed=42, block_size=block_size, marker_tag='bench')
+    setup = time.perf_counter() - start
+    start = time.perf_counter()
+    for blk in gen.blocks(n):
+        if materialize:
+            for _ in blk.rows():
+                pass
+    return n / (time.perf_counter() - start), setup
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--legacy-rows', type=int, default=50_000)
+    parser.add_argument('--block-size', type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    legacy = bench_legacy(args.legacy_rows)
+    columnar, setup = bench_blocks(args.rows, args.block_size, materialize=False)
+    tuples, _ = bench_blocks(args.rows, args.block_size, materialize=True)
+    print(f'gen_row (per row)            : {legacy:>14,.0f} rows/s  ({args.legacy_rows:,} rows)')
+    print(f'BlockGenerator (columns only): {columnar:>14,.0f} rows/s  ({args.rows:,} rows, x{columnar / legacy:,.0f})')
+    print(f'BlockGenerator (row tuples)  : {tuples:>14,.0f} rows/s  ({args.rows:,} rows, x{tuples / legacy:,.0f})')
+    print(f'remarks pool setup           : {setup:.3f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Per-page latency of keyset pagination vs. LIMIT/OFFSET at increasing depth.
+
+Needs a reachable database (PG* environment variables) with a populated
+sample_data.transactions; the (transaction_date, transaction_id) index is
+created if missing.
+
+Usage: python benchmarks/bench_keyset.py [--page-size N] [--pages N]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from qakit.db import get_conn  # noqa: E402
+from qakit.keyset import ensure_index, iter_pages  # noqa: E402
+
+OFFSET_SQL = ('SELECT transaction_date, transaction_id FROM sample_data.transactions '
+              'ORDER BY transaction_date DESC, transaction_id DESC LIMIT %s OFFSET %s')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--page-size', type=int, default=1000)
+    parser.add_argument('--pages', type=int, default=200)
+    args = parser.parse_args(argv)
+    conn = get_conn()
+    try:
+        ensure_index(conn)
+        with conn, conn.cursor() as cur:
+            sample_every = max(args.pages // 10, 1)
+            for n, page in enumerate(iter_pages(cur, args.page_size, descending=True), 1):
+                if n % sample_every == 0 or n == 1:
+                    start = time.perf_counter()
+                    cur.execute(OFFSET_SQL, (args.page_size, (n - 1) * args.page_size))
+                    cur.fetchall()
+                    offset_seconds = time.perf_counter() - start
+                    print(json.dumps({'page': n, 'keyset_ms': round(page.seconds * 1000, 2),
+                                      'offset_ms': round(offset_seconds * 1000, 2)}))
+                if n >= args.pages:
+                    break
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
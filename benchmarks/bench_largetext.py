@@ -0,0 +1,106 @@
+"""Client peak RSS and throughput for large remarks: one bound parameter vs. streaming.
+
+'naive' builds the whole string, inserts it as a single bound parameter
+and SELECTs it back in one piece (what step_insert_large_remarks used to
+do). 'streaming' uses qakit.largetext: a COPY fed chunk by chunk and
+substring() windows hashed as they arrive. Every case runs in a fresh
+subprocess so ru_maxrss is that case's own peak; the figure reported is
+the growth over the interpreter's RSS after imports. With --no-db only
+the client side is measured: building/quoting the parameter vs. encoding
+the COPY stream.
+
+Usage: python benchmarks/bench_largetext.py [--sizes 1,16,128] [--no-db]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import psycopg2.extensions  # noqa: E402
+
+from qakit.largetext import COLUMNS, PATTERN, RemarksCopyStream, payload_chunks, read_remarks, write_remarks  # noqa: E402
+
+TABLE_DDL = '''CREATE TEMP TABLE bench_remarks (transaction_id BIGSERIAL PRIMARY KEY, user_id BIGINT,
+  product_id BIGINT, amount NUMERIC(12,2), currency CHAR(3), transaction_date TIMESTAMP, status VARCHAR(20),
+  marker_tag UUID, remarks TEXT)'''
+ROW = {'user_id': 1, 'product_id': 1, 'amount': '1.00', 'currency': 'USD', 'status': 'completed'}
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def naive_text(size_mb):
+    unit = len(PATTERN.encode('utf-8'))
+    return PATTERN * -(-(size_mb << 20) // unit)
+
+
+def run_case(mode, size_mb, no_db):
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    if no_db:
+        if mode == 'naive':
+            quoted = psycopg2.extensions.QuotedString(naive_text(size_mb))
+            quoted.encoding = 'utf8'
+            octets = len(quoted.getquoted())
+        else:
+            stream = RemarksCopyStream(ROW, payload_chunks(size_mb << 20))
+            octets = 0
+            while True:
+                data = stream.read(1 << 20)
+                if not data:
+                    break
+                octets += len(data)
+    else:
+        from qakit.db import get_conn
+        conn = get_conn()
+        try:
+            with conn, conn.cursor() as cur:
+                cur.execute(TABLE_DDL)
+                if mode == 'naive':
+                    text = naive_text(size_mb)
+                    cols = ', '.join(COLUMNS)
+                    cur.execute(f'INSERT INTO bench_remarks ({cols}) VALUES (%s, %s, %s, %s, NOW(), %s, NULL, %s) '
+                                'RETURNING transaction_id',
+                                (ROW['user_id'], ROW['product_id'], ROW['amount'], ROW['currency'], ROW['status'], text))
+                    tid = cur.fetchone()[0]
+                    del text
+                    cur.execute('SELECT remarks FROM bench_remarks WHERE transaction_id = %s', (tid,))
+                    octets = len(cur.fetchone()[0].encode('utf-8'))
+                else:
+                    written = write_remarks(cur, ROW, payload_chunks(size_mb << 20), table='bench_remarks')
+                    read = read_remarks(cur, written.transaction_id, table='bench_remarks')
+                    assert read.matches(written)
+                    octets = written.octets
+        finally:
+            conn.close()
+    seconds = time.perf_counter() - start
+    return {'mode': mode, 'size_mb': size_mb, 'seconds': round(seconds, 3),
+            'mb_per_sec': round(octets / 2 ** 20 / seconds, 1) if seconds else None,
+            'peak_rss_growth_mb': round(peak_rss_mb() - baseline, 1)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1,16,128', help='payload sizes in MB')
+    parser.add_argument('--no-db', action='store_true')
+    parser.add_argument('--case', nargs=2, metavar=('MODE', 'SIZE_MB'), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.case:
+        print(json.dumps(run_case(args.case[0], int(args.case[1]), args.no_db)))
+        return
+    for size in (int(s) for s in args.sizes.split(',')):
+        for mode in ('naive', 'streaming'):
+            cmd = [sys.executable, os.path.abspath(__file__), '--case', mode, str(size)] + (['--no-db'] if args.no_db else [])
+            out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+            print(out.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    main()
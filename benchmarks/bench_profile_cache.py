@@ -0,0 +1,58 @@
+"""Profiling time saved by ProfileCache across repeated batch runs.
+
+Run 1 is cold; run 2 repeats the batch with --changed of the customers
+modified, as in a nightly refresh where most inputs are unchanged.
+
+Usage: python benchmarks/bench_profile_cache.py [--customers N] [--changed FRACTION] [--disk PATH]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_profiles import synthetic_customers  # noqa: E402
+from qakit.profile_cache import ProfileCache  # noqa: E402
+from qakit.profiles import generate_profiles  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--customers', type=int, default=200_000)
+    parser.add_argument('--changed', type=float, default=0.1)
+    parser.add_argument('--disk', help='SQLite file for the persistent tier')
+    args = parser.parse_args(argv)
+
+    records = list(synthetic_customers(args.customers))
+    rng = random.Random(1)
+    changed = rng.sample(range(len(records)), int(len(records) * args.changed))
+
+    def run(label, func, inputs):
+        start = time.perf_counter()
+        func(inputs)
+        elapsed = time.perf_counter() - start
+        print(f'{label:<34}: {elapsed:.2f}s')
+
+    for kind in ('dict', 'jsonl'):
+        inputs = records if kind == 'dict' else [json.dumps(r) for r in records]
+        rerun = list(inputs)
+        for i in changed:
+            r = dict(records[i], aov=rng.uniform(5, 300))
+            rerun[i] = r if kind == 'dict' else json.dumps(r)
+        if kind == 'dict':
+            run('dict input, no cache', generate_profiles, inputs)
+        else:
+            run('jsonl input, no cache', lambda lines: generate_profiles([json.loads(x) for x in lines]), inputs)
+        cache = ProfileCache(maxsize=args.customers * 2, path=args.disk and f'{args.disk}.{kind}')
+        lookup = cache.profile_many if kind == 'dict' else cache.profile_jsonl
+        run(f'{kind} input, cold cache', lookup, inputs)
+        run(f'{kind} input, warm ({args.changed:.0%} changed)', lookup, rerun)
+        print('  stats:', {k: round(v, 3) if isinstance(v, float) else v for k, v in cache.report().items()})
+        cache.close()
+
+
+if __name__ == '__main__':
+    main()
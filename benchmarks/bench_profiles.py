@@ -0,0 +1,74 @@
+"""Customers/sec of the batch profile engine vs. calling generate_profile() per customer.
+
+Usage: python benchmarks/bench_profiles.py [--customers N] [--batch-size N]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from qakit.profiles import CustomerColumns, evaluate, generate_profile, iter_profiles  # noqa: E402
+
+ITEMS = ['Camping Tents', 'Hiking Boots', 'Sale Shoes', 'Rain Jackets', 'Trail Maps', 'Sleeping Bags']
+NAMES = ['Hiking Boots', 'Backpack', 'T-Shirt', 'Jacket', 'Water Bottle']
+BRANDS = ['NorthFace', 'Osprey', 'Patagonia', 'Generic']
+
+
+def synthetic_customers(n, seed=7):
+    rng = random.Random(seed)
+    for _ in range(n):
+        days = rng.randint(1, 400)
+        yield {
+            'purchases': [{'sku': 'SKU', 'name': rng.choice(NAMES), 'date': f'{days} days ago'}
+                          for _ in range(rng.randint(0, 5))],
+            'last_purchase': f'{days} days ago' if rng.random() > 0.1 else None,
+            'aov': rng.choice([None, rng.uniform(5, 300)]),
+            'browsing': [{'item': rng.choice(ITEMS), 'count': rng.randint(0, 5), 'window_days': 7}
+                         for _ in range(rng.randint(0, 6))],
+            'brand_affinity': rng.sample(BRANDS, rng.randint(0, 2)),
+            'discount_sensitivity': rng.choice(['High', 'Medium', 'Low', None]),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--customers', type=int, default=500_000)
+    parser.add_argument('--batch-size', type=int, default=50_000)
+    args = parser.parse_args(argv)
+    records = list(synthetic_customers(args.customers))
+
+    start = time.perf_counter()
+    for r in records:
+        generate_profile(r)
+    per_row = time.perf_counter() - start
+
+    built = evaluated = emitted = 0.0
+    for i in range(0, len(records), args.batch_size):
+        t0 = time.perf_counter()
+        cols = CustomerColumns.from_records(records[i:i + args.batch_size])
+        t1 = time.perf_counter()
+        evaluate(cols)
+        t2 = time.perf_counter()
+        for _ in iter_profiles(cols):
+            pass
+        built += t1 - t0
+        evaluated += t2 - t1
+        emitted += time.perf_counter() - t2
+    batch = built + emitted  # iter_profiles() runs evaluate() itself
+
+    sample = records[:args.batch_size]
+    assert list(iter_profiles(CustomerColumns.from_records(sample))) == [generate_profile(r) for r in sample], \
+        'batch engine diverged from generate_profile()'
+    n = len(records)
+    print(f'generate_profile (per customer): {n / per_row:>12,.0f} customers/s')
+    print(f'batch engine (records in/out)  : {n / batch:>12,.0f} customers/s  (x{per_row / batch:.1f})')
+    print(f'  columnar build               : {n / built:>12,.0f} customers/s')
+    print(f'  rule evaluation only         : {n / evaluated:>12,.0f} customers/s  (x{per_row / evaluated:.1f})')
+    print(f'  evaluation + profile dicts   : {n / emitted:>12,.0f} customers/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Customers/sec of the compiled rule engine vs. a per-category substring loop as categories grow.
+
+The naive evaluator is what generate_profile() did, generalised: every
+browsing item is lower-cased and tested with `in` against each keyword of
+each category, so its cost grows with the number of categories. The
+compiled engine scans each item once through an Aho-Corasick automaton.
+--distinct bounds how many different item strings exist, which is what the
+automaton's per-string memo benefits from; pass 0 for all-unique items.
+
+Usage: python benchmarks/bench_rules.py [--customers N] [--categories 1,10,100,500] [--distinct N]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from qakit.profiles import CRITICAL_FIELDS  # noqa: E402
+from qakit.rules import Category, CrossSell, RuleSet, compile_rules  # noqa: E402
+
+
+def make_rules(n_categories):
+    categories = [Category(f'Category {i}', (f'kw{i:04d}a', f'kw{i:04d}b')) for i in range(n_categories)]
+    return RuleSet(((150, 'High'), (75, 'Medium')), 'Low', 'Unknown', ('high', '>'), 180, CRITICAL_FIELDS,
+                   recommendations=categories, cross_sell=(CrossSell('gear', ('boot', 'hiking'), ('camp',)),))
+
+
+def make_customers(n, n_categories, distinct, seed=7):
+    rng = random.Random(seed)
+
+    def item():
+        k = rng.randrange(n_categories)
+        suffix = rng.randrange(distinct) if distinct else rng.random()
+        return f'Item KW{k:04d}{rng.choice("ab")} camping {suffix}'
+
+    return [{
+        'purchases': [{'name': rng.choice(['Hiking Boots', 'Backpack', 'Jacket'])} for _ in range(rng.randint(0, 3))],
+        'last_purchase': f'{rng.randint(1, 400)} days ago',
+        'aov': rng.uniform(5, 300),
+        'browsing': [{'item': item(), 'count': rng.randint(0, 5)} for _ in range(rng.randint(0, 6))],
+        'brand_affinity': ['Osprey'],
+        'discount_sensitivity': rng.choice(['High', 'Low']),
+    } for _ in range(n)]
+
+
+def naive_recommendations(rules, data):
+    out = []
+    for b in data.get('browsing', []):
+        item = b.get('item', '').lower()
+        for category in rules.recommendations:
+            if any(k in item for k in category.keywords) and b.get('count', 0) > category.count_above:
+                out.append(category.label)
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--customers', type=int, default=50_000)
+    parser.add_argument('--categories', default='1,10,100,500')
+    parser.add_argument('--distinct', type=int, default=0, help='distinct suffixes per item (0 = all unique)')
+    args = parser.parse_args(argv)
+
+    for n_categories in (int(c) for c in args.categories.split(',')):
+        rules = make_rules(n_categories)
+        customers = make_customers(args.customers, n_categories, args.distinct)
+
+        start = time.perf_counter()
+        expected = [naive_recommendations(rules, c) for c in customers]
+        naive = time.perf_counter() - start
+
+        start = time.perf_counter()
+        engine = compile_rules(rules)
+        compile_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        got = [engine.profile(c)['recommendations'] for c in customers]
+        compiled = time.perf_counter() - start
+        assert got == expected
+
+        print(f'categories={n_categories:>4}  naive (recommendations only) {args.customers / naive:>10,.0f}/s  '
+              f'compiled (full profile) {args.customers / compiled:>10,.0f}/s  '
+              f'speedup {naive / compiled:5.1f}x  compile {compile_seconds * 1000:.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
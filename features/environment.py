@@ -1,7 +1,111 @@
+import logging
+import os
+import uuid
+
+from qakit.cleanup import delete_scenario_rows, id_high_water_mark
+from qakit.db import ConnectionPool, get_conn
+from qakit.generator import seed_from_env
+from qakit.planner import set_autoanalyze
+from qakit.profiling import StatementStats, StepProfiler
+from qakit.snapshots import SnapshotCache
+
+log = logging.getLogger('qa')
+LOG_FILE = os.environ.get('QA_LOG_FILE', os.path.join('reports', 'qa.log'))
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+def setup_logging():
+    # Step output (progress, timings, summaries) goes to QA_LOG_FILE; the runners pass --no-capture,
+    # so the console only gets QA_LOG_LEVEL and above (WARNING by default)
+    if log.handlers:
+        return
+    os.makedirs(os.path.dirname(LOG_FILE) or '.', exist_ok=True)
+    to_file = logging.FileHandler(LOG_FILE)
+    to_file.setFormatter(logging.Formatter(LOG_FORMAT))
+    console = logging.StreamHandler()
+    console.setLevel(os.environ.get('QA_LOG_LEVEL', 'WARNING').upper())
+    console.setFormatter(logging.Formatter('%(levelname)s:%(name)s: %(message)s'))
+    log.addHandler(to_file)
+    log.addHandler(console)
+    log.setLevel(logging.INFO)
+
 def before_all(context):
-    # Placeholder fixture: can be expanded to set up DB connections, test data, or mocks
-    context.test_env = {}
+    setup_logging()
+    context.test_env = {'scenario_checkouts': {}}
+    if os.environ.get('QA_SNAPSHOT_ROWS'):
+        # Start from a cached copy of the large dataset instead of regenerating it; the pool below
+        # then connects to the cloned/restored database
+        cache = SnapshotCache(mode=os.environ.get('QA_SNAPSHOT_MODE', 'template'))
+        target = os.environ.get('QA_SNAPSHOT_DB', 'qa_run')
+        context.snapshot = cache.prepare(int(os.environ['QA_SNAPSHOT_ROWS']), seed_from_env(), target)
+        os.environ['PGDATABASE'] = target
+        log.info(context.snapshot.summary())
+    context.profiler = None
+    if os.environ.get('QA_PROFILE') == '1':
+        # Per-step wall time, round trips, rows and pg_stat_statements deltas (see qakit.profiling)
+        statements = StatementStats(get_conn) if os.environ.get('QA_PROFILE_STATEMENTS', '1') == '1' else None
+        context.profiler = StepProfiler(statements)
+    # One pooled connection layer for the whole run; steps borrow via qakit.db.borrow(context)
+    context.db_pool = ConnectionPool(maxconn=int(os.environ.get('QA_POOL_MAX', 8)))
+
+def before_feature(context, feature):
+    if context.profiler:
+        context.profiler.begin('feature', feature.name)
+
+def after_feature(context, feature):
+    if context.profiler:
+        context.profiler.end(feature.status.name)
+
+def before_scenario(context, scenario):
+    # Rows a scenario writes carry its run_marker and are deleted again in after_scenario
+    # (QA_SCENARIO_CLEANUP=0 keeps them); steps still commit, so this is cleanup, not a rollback
+    context.run_marker = str(uuid.uuid4())
+    context.scenario_cleanup = os.environ.get('QA_SCENARIO_CLEANUP', '1') != '0'
+    if context.scenario_cleanup:
+        with context.db_pool.connection() as conn:
+            context.scenario_start_id = id_high_water_mark(conn)
+    context.pool_checkouts_start = context.db_pool.stats['checkouts']
+    if context.profiler:
+        context.profiler.begin('scenario', scenario.name)
+
+def before_step(context, step):
+    if context.profiler:
+        context.profiler.begin('step', f'{step.keyword} {step.name}')
+
+def after_step(context, step):
+    if context.profiler:
+        context.profiler.end(step.status.name)
+
+def after_scenario(context, scenario):
+    if context.profiler:
+        context.profiler.end(scenario.status.name)
+    pool = context.db_pool
+    context.test_env['scenario_checkouts'][scenario.name] = pool.stats['checkouts'] - context.pool_checkouts_start
+    # Roll back anything a failed step left open and reset session settings (SET, timeouts, ...)
+    # so every scenario starts from clean connections
+    pool.reset()
+    # a planner scenario that failed before its last step left autovacuum off on the table
+    if getattr(context, 'autoanalyze_disabled', False):
+        with pool.connection() as conn:
+            set_autoanalyze(conn, True)
+        context.autoanalyze_disabled = False
+    if context.scenario_cleanup:
+        # batched, with a VACUUM after large deletes (a planner scenario's bulk load is millions of rows)
+        with pool.connection() as conn:
+            removed, vacuum_seconds = delete_scenario_rows(conn, context.run_marker, context.scenario_start_id)
+        if removed:
+            log.info(f'removed {removed} rows written by scenario {scenario.name!r}'
+                  + (f', VACUUM {vacuum_seconds:.1f}s' if vacuum_seconds is not None else ''))
 
 def after_all(context):
     # Clean up any global resources if needed
+    pool = getattr(context, 'db_pool', None)
+    if pool is not None:
+        log.info(pool.summary())
+        pool.closeall()
+    profiler = getattr(context, 'profiler', None)
+    if profiler:
+        profiler.close()
+        log.info(profiler.summary())
+        steps_path, trace_path = profiler.write()
+        log.info(f'profile written to {steps_path} and {trace_path}')
     context.test_env = None
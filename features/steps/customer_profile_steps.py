@@ -1,71 +1,7 @@
 import json
-import re
 from behave import given, when, then
 
-# Simple rule-based generator used by tests
-def parse_days_ago(text):
-    if not text:
-        return None
-    m = re.match(r"(\d+)\s+days\s+ago", text)
-    if m:
-        return int(m.group(1))
-    return None
-
-
-def generate_profile(data):
-    profile = {}
-    aov = data.get("aov")
-    ltv = data.get("ltv_segment")
-    if not ltv:
-        if aov is None:
-            profile["ltv_segment"] = "Unknown"
-        elif aov >= 150:
-            profile["ltv_segment"] = "High"
-        elif aov >= 75:
-            profile["ltv_segment"] = "Medium"
-        else:
-            profile["ltv_segment"] = "Low"
-    else:
-        profile["ltv_segment"] = ltv
-
-    ds = (data.get("discount_sensitivity") or "").lower()
-    if "high" in ds or (isinstance(ds, str) and ">" in ds):
-        profile["discount_sensitive"] = True
-    else:
-        profile["discount_sensitive"] = False
-
-    # recommendations: simple rule for camping tents
-    profile["recommendations"] = []
-    for b in data.get("browsing", []):
-        if "camp" in b.get("item", "").lower() or "tent" in b.get("item", "").lower():
-            if b.get("count", 0) > 0:
-                profile["recommendations"].append("Camping Tents")
-
-    # loyalty flag if single brand affinity is present and only one brand
-    brands = data.get("brand_affinity", []) or []
-    profile["loyalty_flag"] = bool(brands) and len(brands) == 1
-
-    # churn risk: last purchase > 180 days => true
-    last_purchase = data.get("last_purchase")
-    days = None
-    if isinstance(last_purchase, str):
-        days = parse_days_ago(last_purchase)
-    if days is None and last_purchase is None and data.get("purchases"):
-        profile["churn_risk"] = False
-    elif days is None and last_purchase is None:
-        profile["churn_risk"] = True
-    else:
-        profile["churn_risk"] = (days is not None and days > 180)
-
-    # cross-sell: boots + tents browsing
-    names = [p.get("name", "").lower() for p in data.get("purchases", [])]
-    profile["cross_sell_opportunity"] = (any("boot" in n for n in names) or any("hiking" in n for n in names)) and any("camp" in b.get("item", "").lower() for b in data.get("browsing", []))
-
-    # needs_more_data if critical fields missing
-    critical = ["purchases", "last_purchase", "aov", "browsing", "brand_affinity", "discount_sensitivity"]
-    profile["needs_more_data"] = any(data.get(k) in (None, [], "") for k in critical)
-
-    return profile
+from qakit.profiles import generate_profile
 
 @given('the customer data:')
 def step_given_customer_data(context):
@@ -97,3 +33,7 @@ def step_assert_loyalty(context, expected):
 def step_assert_churn(context, expected):
     exp = True if expected.lower() == "true" else False
     assert context.profile.get("churn_risk") == exp, f"churn_risk {context.profile.get('churn_risk')} != {exp}"
+
+@then('the profile should indicate "{flag}"')
+def step_assert_flag(context, flag):
+    assert context.profile.get(flag) is True, f"{flag} {context.profile.get(flag)} != True"
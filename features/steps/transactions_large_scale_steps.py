@@ -0,0 +1,560 @@
+import datetime
+import logging
+import os
+import re
+import shutil
+import subprocess
+import time
+import uuid
+from behave import given, when, then
+
+import psycopg2.errors
+
+from qakit.baselines import Aggregates, list_manifests, save_manifest, verify as verify_baseline
+from qakit.checksum import compare
+from qakit.cleanup import delete_marker_batched, ensure_marker_index, table_stats, vacuum
+from qakit.copyload import copy_blocks
+from qakit.db import TRANSACTIONS_DDL, ConnectionPool, borrow
+from qakit.dedup import DedupIngestor, ensure_business_key
+from qakit.generator import BlockGenerator, seed_from_env
+from qakit.ingest import AimdBatchSizer, ingest
+from qakit.keyset import PAGE_SIZE, ensure_index, verify
+from qakit.partitions import (add_months, apply_retention, assert_pruned, ensure_partitions, is_partitioned,
+                              list_partitions, migrate_to_partitioned, month_start, restore_partition)
+from qakit.planner import (PlanStore, PlannerReport, advise, after_bulk_load, analyze, create_indexes,
+                           default_params, drop_indexes, freshness, measure, set_autoanalyze)
+from qakit.population import populate
+from qakit.sla import SlaHistory, run_benchmark, sla_violations
+from qakit.snapshots import create_database, drop_database, pg_env
+from qakit.workload import run_workload
+
+log = logging.getLogger('qa.steps')
+
+
+def report_progress(done, total, rate):
+    log.info(f'populated {done:,}/{total:,} rows ({rate:,.0f} rows/s)')
+
+
+# Helper: refresh planner statistics once a load has committed (QA_ANALYZE_AFTER_LOAD=0 skips it)
+def analyze_after_load(context, rows_loaded):
+    with borrow(context) as conn:
+        result = after_bulk_load(conn, rows_loaded)
+    if result:
+        log.info(f'ANALYZE after load: {result}')
+
+
+# Helper: column names declared in a CREATE TABLE statement
+def ddl_columns(ddl):
+    body = ddl[ddl.index('(') + 1:ddl.rindex(')')]
+    return {m.group(1).lower() for m in re.finditer(r'^\s*(\w+)\s+\w', body, re.M)}
+
+
+@given('the database contains the transactions table DDL:')
+def step_reference_ddl(context):
+    # The feature's DDL is a reference: the table itself is created from qakit.db.TRANSACTIONS_DDL (which adds
+    # the marker_tag column cleanup relies on), so only check that it declares every referenced column
+    missing = ddl_columns(context.text) - ddl_columns(TRANSACTIONS_DDL)
+    assert not missing, f"TRANSACTIONS_DDL lacks columns from the feature's DDL: {sorted(missing)}"
+    context.reference_ddl = context.text.strip()
+
+
+@given('the transactions table exists and is populated with >{min_rows:d} rows')
+def step_populate_large(context, min_rows):
+    context.execute_steps('Given the transactions table exists')
+    with borrow(context) as conn:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT COUNT(*) FROM sample_data.transactions")
+                existing = cur.fetchone()[0]
+    missing = min_rows + 1 - existing
+    if missing <= 0:
+        return
+    # a marker of its own rather than the scenario's run_marker: the populated rows are a shared
+    # fixture for later scenarios and must survive the per-scenario cleanup
+    marker = str(uuid.uuid4())
+    workers = int(os.environ['QA_POPULATE_WORKERS']) if os.environ.get('QA_POPULATE_WORKERS') else None
+    context.population = populate(missing, marker, workers=workers, seed=seed_from_env(), progress=report_progress)
+    analyze_after_load(context, missing)
+
+
+@given('the transactions table contains >{min_rows:d} rows and the system is under load')
+def step_populated_under_load(context, min_rows):
+    context.execute_steps(f'Given the transactions table exists and is populated with >{min_rows} rows')
+
+
+@given('the transactions table exists with representative distribution')
+def step_representative_distribution(context):
+    context.execute_steps('Given the transactions table exists')
+    rows = int(os.environ.get('QA_BASELINE_ROWS', 10_000_001))
+    with borrow(context) as conn:
+        with conn:
+            with conn.cursor() as cur:
+                # reuse the newest load whose baseline manifest is still backed by rows in the table
+                for manifest in list_manifests():
+                    if manifest['rows'] >= rows:
+                        cur.execute('SELECT EXISTS (SELECT 1 FROM sample_data.transactions WHERE marker_tag = %s)',
+                                    (manifest['marker_tag'],))
+                        if cur.fetchone()[0]:
+                            context.baseline_marker = manifest['marker_tag']
+                            context.baseline = Aggregates.from_manifest(manifest)
+                            return
+    # a fresh marker: the manifest must describe exactly the rows carrying it
+    context.baseline_marker = str(uuid.uuid4())
+    context.population = populate(rows, context.baseline_marker, seed=seed_from_env(), progress=report_progress)
+    context.baseline = context.population.aggregates
+    log.info(f'baseline manifest: {save_manifest(context.baseline, context.baseline_marker)}')
+    analyze_after_load(context, rows)
+
+
+@when('I run "{query}"')
+@when('I query "{query}"')
+def step_run_query(context, query):
+    # Single execution that keeps the rows for later assertions; it also warms the cache for the SLA runs
+    context.query = query
+    context.query_result = None
+    context.query_error = None
+    timeout_ms = int(float(os.environ.get('QA_SLA_MAX_SECONDS', 300)) * 1000)
+    with borrow(context) as conn:
+        try:
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute('SET LOCAL statement_timeout = %s', (timeout_ms,))
+                    start = time.perf_counter()
+                    cur.execute(query)
+                    context.query_result = cur.fetchall() if cur.description is not None else cur.rowcount
+                    context.query_seconds = time.perf_counter() - start
+        except psycopg2.errors.QueryCanceled as e:
+            context.query_error = e
+
+
+@then('the returned count should be > {expected:d}')
+def step_assert_count(context, expected):
+    assert context.query_error is None, f'count query failed: {context.query_error}'
+    count = context.query_result[0][0]
+    assert count > expected, f'{context.query} returned {count:,}, expected more than {expected:,}'
+
+
+@then('the query should complete within {timeout_seconds:d} seconds or return a controlled timeout error')
+def step_query_sla(context, timeout_seconds):
+    runs = int(os.environ.get('QA_SLA_RUNS', 5))
+    warmup = int(os.environ.get('QA_SLA_WARMUP', 1))
+    with borrow(context) as conn:
+        ceiling = float(os.environ['QA_SLA_MAX_SECONDS']) if os.environ.get('QA_SLA_MAX_SECONDS') else None
+        result = run_benchmark(conn, context.query, timeout_seconds, runs=runs, warmup=warmup, ceiling_seconds=ceiling)
+    history = SlaHistory()
+    # a timeout comes from the statement_timeout ceiling above the SLA and fails like any other SLA breach
+    problems = sla_violations(result, history.baseline(context.query))
+    history.record(result, passed=not problems)
+    history.save()
+    context.sla_result = result
+    log.info(f'{context.query}: {result.summary()}')
+    assert not problems, '; '.join(problems)
+
+
+@then('the numeric aggregation results should be within acceptable precision and match expected baselines')
+def step_assert_aggregates(context):
+    assert context.query_error is None, f'aggregate query failed: {context.query_error}'
+    with borrow(context) as conn:
+        with conn:
+            with conn.cursor() as cur:
+                problems = verify_baseline(cur, context.baseline, context.baseline_marker)
+                cur.execute('SELECT COUNT(*) FROM sample_data.transactions')
+                table_rows = cur.fetchone()[0]
+    assert not problems, 'server aggregates differ from the generation-time baseline:\n' + '\n'.join(problems)
+    (total, avg), = context.query_result
+    if table_rows != context.baseline.rows:
+        log.info(f'table holds {table_rows:,} rows, baseline covers {context.baseline.rows:,}: '
+              f'whole-table result {total}/{avg} checked per marker only')
+        return
+    match = re.search(r"currency\s*=\s*'(\w+)'", context.query)
+    want = context.baseline.expected(currency=match.group(1) if match else None)
+    assert total == want['sum'], f"SUM {total} != baseline {want['sum']}"
+    assert avg == want['avg'], f"AVG {avg} != baseline {want['avg']} (exact {want['sum'] / want['count']})"
+
+
+@given('the table contains >{millions:d}M rows with many equal transaction_date values')
+def step_populated_with_date_ties(context, millions):
+    context.execute_steps(f'Given the transactions table exists and is populated with >{millions * 1_000_000} rows')
+    context.page_size = int(os.environ.get('QA_PAGE_SIZE', PAGE_SIZE))
+    marker = getattr(context, 'run_marker', None) or str(uuid.uuid4())
+    context.run_marker = marker
+    # One tie group spanning several pages, so page boundaries fall between rows with equal transaction_date
+    block = BlockGenerator(seed=seed_from_env(), marker_tag=marker).block(3 * context.page_size + 7)
+    block.transaction_date[:] = block.transaction_date[0]
+    with borrow(context) as conn:
+        ensure_index(conn)
+        with conn:
+            with conn.cursor() as cur:
+                copy_blocks(cur, [block])
+    analyze_after_load(context, len(block))
+
+
+@when('paginating by transaction_date DESC LIMIT/OFFSET or keyset pagination')
+def step_paginate_keyset(context):
+    with borrow(context) as conn:
+        context.pagination = verify(conn, page_size=getattr(context, 'page_size', PAGE_SIZE), descending=True)
+    log.info(context.pagination.summary())
+
+
+@then('pagination must be stable (no missing or duplicate rows across pages)')
+def step_assert_pagination_stable(context):
+    report = context.pagination
+    assert report.ok, report.summary()
+    max_drift = float(os.environ.get('QA_KEYSET_MAX_DRIFT', 5.0))
+    assert report.latency_drift() <= max_drift, f'page latency grew with depth: {report.summary()}'
+
+
+@given('the transactions table exists and multiple clients are writing concurrently')
+def step_concurrent_clients(context):
+    context.execute_steps('Given the transactions table exists')
+    context.workload_clients = int(os.environ.get('QA_WORKLOAD_CLIENTS', 8))
+    context.run_marker = getattr(context, 'run_marker', None) or str(uuid.uuid4())
+
+
+@when('a high-concurrency workload is applied (multi-client inserts/updates)')
+def step_apply_workload(context):
+    clients = context.workload_clients
+    duration = float(os.environ['QA_WORKLOAD_SECONDS']) if os.environ.get('QA_WORKLOAD_SECONDS') else None
+    operations = None if duration else int(os.environ.get('QA_WORKLOAD_OPS', 500))
+    # Clients hold their connection for the whole run, so they get a pool of their own
+    pool = ConnectionPool(maxconn=clients + 1)
+    try:
+        context.workload = run_workload(pool, context.run_marker, clients=clients, operations=operations,
+                                        duration=duration, isolation=os.environ.get('QA_WORKLOAD_ISOLATION', 'READ COMMITTED'),
+                                        seed=seed_from_env())
+    finally:
+        pool.closeall()
+    log.info(context.workload.summary())
+
+
+@then('no lost updates or data corruption should occur and deadlocks should be handled')
+def step_assert_workload_consistent(context):
+    report = context.workload
+    assert not report.problems, f'lost writes detected: {report.problems}'
+    assert report.failed == 0, f'{report.failed} operations still failed after {report.deadlocks} deadlocks / {report.serialization_failures} serialization failures were retried'
+
+
+@given('ingestion rate spikes beyond operational thresholds (>{millions:d}M rows/hour)')
+def step_ingestion_spike(context, millions):
+    context.execute_steps('Given the transactions table exists')
+    # The threshold becomes the controller's rate limit; the generator offers rows as fast as it can
+    context.ingest_rate = millions * 1_000_000 / 3600
+    context.ingest_rows = int(context.ingest_rate * float(os.environ.get('QA_INGEST_SECONDS', 10)))
+    context.run_marker = getattr(context, 'run_marker', None) or str(uuid.uuid4())
+
+
+@when('automatic throttling or scale-up is executed')
+def step_throttled_ingest(context):
+    rate = context.ingest_rate
+    sizer = AimdBatchSizer(initial=max(100, int(rate // 4)), minimum=100, maximum=max(100, int(rate)),
+                           target_seconds=float(os.environ.get('QA_INGEST_TARGET_SECONDS', 1.0)))
+    last = [0.0]
+
+    def on_metrics(snapshot):
+        if time.perf_counter() - last[0] >= 2.0:
+            log.info(f'ingest: {snapshot}')
+            last[0] = time.perf_counter()
+
+    with borrow(context) as conn:
+        context.ingest_metrics = ingest(conn, context.ingest_rows, context.run_marker, rate=rate, burst=rate,
+                                        sizer=sizer, seed=seed_from_env(), chunk_rows=sizer.minimum,
+                                        on_metrics=on_metrics)
+    log.info(context.ingest_metrics.summary())
+
+
+@then('monitoring alerts should trigger and backpressure should protect system stability')
+def step_assert_backpressure(context):
+    metrics = context.ingest_metrics
+    summary = metrics.summary()
+    assert metrics.rows == context.ingest_rows, summary
+    assert {'rate_limited', 'backpressure'} & set(metrics.alerts), f'no throttling alert raised: {summary}'
+    # average rate may exceed the limit only by the one-second burst allowance
+    assert metrics.rows <= context.ingest_rate * metrics.seconds + context.ingest_rate, summary
+    max_batch_seconds = float(os.environ.get('QA_INGEST_MAX_BATCH_SECONDS', 5.0))
+    assert summary['max_copy_seconds'] <= max_batch_seconds, f'COPY latency piled up: {summary}'
+
+
+@given('ingestion can retry and produce duplicates based on business keys')
+def step_retrying_ingestion(context):
+    context.execute_steps('Given the transactions table exists')
+    with borrow(context) as conn:
+        ensure_business_key(conn)
+    marker = getattr(context, 'run_marker', None) or str(uuid.uuid4())
+    context.run_marker = marker
+    context.dedup_unique = int(os.environ.get('QA_DEDUP_ROWS', 50_000))
+    blocks = list(BlockGenerator(seed=seed_from_env(), block_size=5_000, marker_tag=marker).blocks(context.dedup_unique))
+    # every third delivery is retried together with the one before it; a restarted client replays the first
+    deliveries = []
+    for i, blk in enumerate(blocks):
+        deliveries.append([blk])
+        if i % 3 == 1:
+            deliveries.append([blocks[i - 1], blk])
+    context.dedup_deliveries = deliveries
+    context.dedup_replay = [blocks[0]]
+
+
+@when('deduplication logic runs (e.g., upsert using unique business key)')
+def step_dedup_ingest(context):
+    with borrow(context) as conn:
+        ingestor = DedupIngestor(conn)
+        for delivery in context.dedup_deliveries:
+            ingestor.ingest(delivery)
+        restarted = DedupIngestor(conn)
+        restarted.ingest(context.dedup_replay)
+    context.dedup_stats = {k: ingestor.stats[k] + restarted.stats[k] for k in ingestor.stats}
+    log.info(f'dedup: {context.dedup_stats}')
+
+
+@then('duplicates are removed and only unique events remain')
+def step_assert_unique_events(context):
+    stats = context.dedup_stats
+    with borrow(context) as conn:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT COUNT(*), COUNT(DISTINCT business_key) FROM sample_data.transactions WHERE marker_tag = %s",
+                            (context.run_marker,))
+                rows, keys = cur.fetchone()
+    assert rows == keys == context.dedup_unique, f'{rows} rows / {keys} keys for {context.dedup_unique} unique events: {stats}'
+    assert stats['client_duplicates'] > 0 and stats['server_duplicates'] > 0, stats
+
+
+@given('the transactions table exists and a large bulk load was performed')
+def step_bulk_load_stale_stats(context):
+    context.execute_steps('Given the transactions table exists')
+    marker = getattr(context, 'run_marker', None) or str(uuid.uuid4())
+    context.run_marker = marker
+    with borrow(context) as conn:
+        # statistics describe the table as it was before the load, and autovacuum must not refresh them mid-scenario
+        analyze(conn)
+        set_autoanalyze(conn, False)
+        context.autoanalyze_disabled = True
+        with conn:
+            with conn.cursor() as cur:
+                # earlier scenarios may have left millions of rows; the load must exceed the 10% + 50 staleness
+                # threshold of whatever the table already holds
+                estimated = freshness(cur).estimated_rows
+                rows = max(int(os.environ.get('QA_PLANNER_ROWS', 1_000_000)), int(0.2 * estimated) + 100)
+                generator = BlockGenerator(seed=seed_from_env(), marker_tag=marker)
+                loaded = copy_blocks(cur, generator.blocks(rows))
+    assert loaded == rows, f'loaded {loaded} of {rows} rows'
+
+
+@when('queries become slow due to stale statistics')
+def step_measure_stale_plans(context):
+    context.planner_params = default_params(context.run_marker)
+    with borrow(context) as conn:
+        with conn:
+            with conn.cursor() as cur:
+                context.planner_stale = freshness(cur)
+        context.planner_before = measure(conn, context.planner_params)
+    log.info(f'statistics before ANALYZE: {context.planner_stale.as_dict()}')
+    for name, qp in context.planner_before.items():
+        log.info(f'{name}: {qp.seconds * 1000:.1f}ms {qp.shape} misestimates={qp.misestimates}')
+
+
+@then('running ANALYZE should restore appropriate planner choices and improve performance')
+def step_assert_analyze_restores_plans(context):
+    create = os.environ.get('QA_PLANNER_CREATE_INDEXES', '1') != '0'
+    built = {}
+    try:
+        with borrow(context) as conn:
+            with conn:
+                with conn.cursor() as cur:
+                    recommendations = advise(cur, context.planner_before)
+            built = create_indexes(conn, recommendations) if create else {}
+            analyze_seconds = analyze(conn)
+            after = measure(conn, context.planner_params)
+    finally:
+        with borrow(context) as conn:
+            # the advised indexes belong to this scenario; later loads and timings must not pay for them
+            drop_indexes(conn, built)
+            set_autoanalyze(conn, True)
+        context.autoanalyze_disabled = False
+    store = PlanStore()
+    report = PlannerReport(context.planner_before, after, context.planner_stale, recommendations, built,
+                           analyze_seconds, changes=store.changes(after))
+    store.record(after)
+    store.save()
+    log.info(f'planner report: {report.write()}')
+    for rec in recommendations:
+        log.info(f"{'built' if rec.qualified_name in built else 'recommended'}: {rec.ddl()} (used by {', '.join(rec.queries)})")
+    if report.changes:
+        log.warning(f'plan shapes changed since the last run: {report.changes}')
+    assert context.planner_stale.stale, f'statistics were not stale after the load: {context.planner_stale.as_dict()}'
+    problems = report.problems(max_slowdown=float(os.environ.get('QA_PLANNER_MAX_SLOWDOWN', 1.1)))
+    assert not problems, '; '.join(problems)
+
+
+HISTORY_SQL = ("SELECT date_trunc('month', transaction_date) AS month, COUNT(*), SUM(amount) "
+               "FROM sample_data.transactions WHERE transaction_date >= %s AND transaction_date < %s "
+               "GROUP BY 1 ORDER BY 1")
+
+
+@given('the transactions table is partitioned by month (optional)')
+def step_partitioned_by_month(context):
+    context.execute_steps('Given the transactions table exists')
+    with borrow(context) as conn:
+        with conn:
+            with conn.cursor() as cur:
+                partitioned = is_partitioned(cur)
+        if not partitioned:
+            if os.environ.get('QA_PARTITION_MIGRATE') != '1':
+                context.scenario.skip('sample_data.transactions is a plain table; '
+                                      'set QA_PARTITIONED=1 or QA_PARTITION_MIGRATE=1 to run this scenario')
+                return
+            migrate_to_partitioned(conn)
+        with conn:
+            with conn.cursor() as cur:
+                ensure_partitions(cur)
+
+
+@when('older partitions are archived to cheaper storage')
+def step_archive_partitions(context):
+    keep = int(os.environ.get('QA_ARCHIVE_KEEP_MONTHS', 12))
+    cutoff = add_months(month_start(datetime.datetime.now()), -keep)
+    with borrow(context) as conn:
+        with conn:
+            with conn.cursor() as cur:
+                parts = list_partitions(cur)
+                # the historical window: every archivable month plus the first month that stays active
+                context.history_range = (parts[0][1] if parts else cutoff, add_months(cutoff, 1))
+                cur.execute(HISTORY_SQL, context.history_range)
+                context.history_baseline = cur.fetchall()
+        context.archived = apply_retention(conn, keep)
+    log.info(f'archived {len(context.archived)} partitions older than {cutoff:%Y-%m}')
+
+
+@then('queries spanning active + archived ranges should return consistent results and meet SLA for historical reads')
+def step_assert_historical_reads(context):
+    sla_seconds = float(os.environ.get('QA_HISTORICAL_SLA_SECONDS', 30))
+    assert context.archived, 'no partitions were old enough to archive'
+    with borrow(context) as conn:
+        # historical reads reattach the archived months on demand
+        for name in context.archived:
+            restore_partition(conn, name)
+        with conn:
+            with conn.cursor() as cur:
+                assert_pruned(cur, HISTORY_SQL, context.history_range, *context.history_range)
+                cur.execute('SET LOCAL statement_timeout = %s', (int(sla_seconds * 1000),))
+                start = time.perf_counter()
+                cur.execute(HISTORY_SQL, context.history_range)
+                rows = cur.fetchall()
+                elapsed = time.perf_counter() - start
+    assert rows == context.history_baseline, 'historical aggregates changed across archive/restore'
+    assert elapsed <= sla_seconds, f'historical read took {elapsed:.2f}s (SLA {sla_seconds}s)'
+
+
+READ_PROBE_SQL = 'SELECT COUNT(*), SUM(amount) FROM sample_data.transactions'
+
+
+# Helper: time one full-table read, the measure of "read performance" for the bloat scenario
+def time_full_read(conn):
+    with conn:
+        with conn.cursor() as cur:
+            start = time.perf_counter()
+            cur.execute(READ_PROBE_SQL)
+            cur.fetchall()
+            return time.perf_counter() - start
+
+
+# Helper: pg_stat_user_tables counters arrive asynchronously; poll until `ready(stats)` or timeout
+def wait_for_stats(conn, ready, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        with conn:
+            with conn.cursor() as cur:
+                stats = table_stats(cur)
+        if ready(stats) or time.monotonic() >= deadline:
+            return stats
+        time.sleep(0.2)
+
+
+@given('a delete of millions of rows is executed')
+def step_mass_delete(context):
+    context.execute_steps('Given the transactions table exists')
+    rows = int(os.environ.get('QA_BLOAT_ROWS', 2_000_000))
+    marker = str(uuid.uuid4())
+    with borrow(context) as conn:
+        ensure_marker_index(conn)
+        context.read_baseline = time_full_read(conn)
+        context.population = populate(rows, marker, seed=seed_from_env(), progress=report_progress)
+        with conn:
+            with conn.cursor() as cur:
+                context.stats_before_delete = table_stats(cur)
+        start = time.perf_counter()
+        context.mass_deleted, batches = delete_marker_batched(conn, marker)
+        context.delete_seconds = time.perf_counter() - start
+        dead_floor = context.stats_before_delete.dead + context.mass_deleted // 2
+        context.stats_after_delete = wait_for_stats(conn, lambda s: s.dead >= dead_floor)
+        context.read_bloated = time_full_read(conn)
+    assert context.mass_deleted == rows, f'deleted {context.mass_deleted} of {rows} rows'
+    log.info(f'deleted {rows:,} rows in {batches} batches ({context.delete_seconds:.1f}s): '
+          f'{context.stats_after_delete.as_dict()}, full read {context.read_bloated:.2f}s')
+
+
+@when('VACUUM/auto-vacuum runs or manual maintenance is executed')
+def step_vacuum(context):
+    with borrow(context) as conn:
+        context.vacuum_seconds = vacuum(conn)
+        context.stats_after_vacuum = wait_for_stats(conn, lambda s: s.vacuums > context.stats_after_delete.vacuums)
+        context.read_restored = time_full_read(conn)
+    log.info(f'VACUUM took {context.vacuum_seconds:.1f}s: {context.stats_after_vacuum.as_dict()}, '
+          f'full read {context.read_restored:.2f}s (baseline {context.read_baseline:.2f}s)')
+
+
+@then('table bloat should be reclaimed and read performance restored within expected window')
+def step_assert_bloat_reclaimed(context):
+    window = float(os.environ.get('QA_VACUUM_WINDOW_SECONDS', 600))
+    read_factor = float(os.environ.get('QA_BLOAT_READ_FACTOR', 1.5))
+    after = context.stats_after_vacuum
+    assert context.vacuum_seconds <= window, f'VACUUM took {context.vacuum_seconds:.1f}s (window {window}s)'
+    assert after.dead <= context.stats_before_delete.dead + context.mass_deleted * 0.05, \
+        f'dead tuples not reclaimed: {after.as_dict()}'
+    assert context.read_restored <= context.read_baseline * read_factor, \
+        f'full read {context.read_restored:.2f}s vs baseline {context.read_baseline:.2f}s'
+
+
+@given('a full backup is taken when the table contains >{millions:d}M rows')
+def step_full_backup(context, millions):
+    context.execute_steps(f'Given the transactions table exists and is populated with >{millions * 1_000_000} rows')
+    with borrow(context) as conn:
+        context.backup_source_db = conn.info.dbname
+    context.backup_path = os.path.join(os.environ.get('QA_BACKUP_DIR', os.path.join('reports', 'backup')),
+                                       str(uuid.uuid4()))
+    # pg_dump -Fd creates the dump directory itself but not its parents
+    os.makedirs(os.path.dirname(context.backup_path), exist_ok=True)
+    jobs = str(os.cpu_count() or 1)
+    start = time.perf_counter()
+    subprocess.run(['pg_dump', '-Fd', '-j', jobs, '-n', 'sample_data', '-f', context.backup_path,
+                    context.backup_source_db], check=True, env=pg_env())
+    log.info(f'backup of {context.backup_source_db} taken in {time.perf_counter() - start:.1f}s')
+
+
+@when('the backup is restored to a test instance')
+def step_restore_backup(context):
+    context.restore_db = os.environ.get('QA_RESTORE_DB', 'qa_restore')
+    create_database(context.restore_db)
+    jobs = str(os.cpu_count() or 1)
+    start = time.perf_counter()
+    subprocess.run(['pg_restore', '--no-owner', '-j', jobs, '-d', context.restore_db, context.backup_path],
+                   check=True, env=pg_env())
+    log.info(f'backup restored into {context.restore_db} in {time.perf_counter() - start:.1f}s')
+
+
+@then('row counts and sample checksums should match the original source for validated partitions')
+def step_assert_restore_matches(context):
+    workers = int(os.environ.get('QA_CHECKSUM_WORKERS', 4))
+    restored = ConnectionPool(maxconn=workers, dbname=context.restore_db)
+    try:
+        report = compare(context.db_pool, restored, workers=workers)
+    finally:
+        restored.closeall()
+        if os.environ.get('QA_KEEP_RESTORE') != '1':
+            drop_database(context.restore_db)
+            shutil.rmtree(context.backup_path, ignore_errors=True)
+    log.info(f'checksum: {report.summary()}')
+    assert report.source_rows == report.target_rows, \
+        f'row counts differ: source {report.source_rows:,}, restored {report.target_rows:,}'
+    assert report.matches, (f'{len(report.divergent_ranges)} of {report.leaves} id ranges differ: '
+                            f'{len(report.missing)} missing, {len(report.extra)} extra, {len(report.changed)} changed '
+                            f'(e.g. {report.summary()["sample_ids"]})')
@@ -1,42 +1,32 @@
 import os
-import io
-import csv
 import uuid
 import time
 import random
 import string
 import datetime
+import logging
 from decimal import Decimal
 from behave import given, when, then
 import psycopg2
-import psycopg2.extras
-from faker import Faker
-
-fake = Faker()
-
-# Helper: read DB connection from environment variables
-def get_conn():
-    params = {
-        'host': os.environ.get('PGHOST', 'localhost'),
-        'port': int(os.environ.get('PGPORT', 5432)),
-        'dbname': os.environ.get('PGDATABASE', 'postgres'),
-        'user': os.environ.get('PGUSER', 'postgres'),
-        'password': os.environ.get('PGPASSWORD', ''),
-    }
-    return psycopg2.connect(**params)
-
-# Helper: generate a single synthetic transaction row (dictionary)
-def gen_row(marker_tag=None):
-    return {
-        'user_id': random.randint(1, 10_000_000),
-        'product_id': random.randint(1, 1_000_000),
-        'amount': Decimal(str(round(random.uniform(1.0, 500.0), 2))),
-        'currency': random.choice(['USD','EUR','GBP','USD','USD']),
-        'transaction_date': fake.date_time_between(start_date='-2y', end_date='now'),
-        'status': random.choice(['completed','pending','failed']),
-        'remarks': None if random.random() < 0.2 else fake.sentence(nb_words=10),
-        'marker_tag': marker_tag,
-    }
+import psycopg2.errorcodes
+
+from qakit.cleanup import cleanup_run
+from qakit.copyload import copy_blocks
+from qakit.dal import TransactionWriter
+from qakit.db import TRANSACTIONS_DDL, borrow
+from qakit.generator import BlockGenerator, seed_from_env
+from qakit.integrity import scan
+from qakit.largetext import payload_chunks, read_remarks, server_digest, write_remarks
+from qakit.partitions import add_months, create_partitioned_table, ensure_partitions, is_partitioned, month_start
+from qakit.planner import after_bulk_load
+
+log = logging.getLogger('qa.steps')
+
+# Helper: run every registered integrity rule in one pass (QA_INTEGRITY_WORKERS parallel id ranges)
+def integrity_scan(context):
+    workers = int(os.environ.get('QA_INTEGRITY_WORKERS', 1))
+    context.integrity_report = scan(context.db_pool, workers=workers)
+    return context.integrity_report
 
 # Create schema helper (will attempt to create the schema/table if not exists)
 @given('the transactions table DDL is available')
@@ -46,95 +36,71 @@ def step_ddls_available(context):
 @given('the transactions table exists')
 def step_create_table(context):
     ddl = getattr(context, 'ddl', None)
+    # QA_PARTITIONED=1: create the default table range-partitioned by month instead of as one heap
+    partitioned = not ddl and os.environ.get('QA_PARTITIONED') == '1'
     if not ddl:
         # Use default create statement
-        ddl = '''CREATE SCHEMA IF NOT EXISTS sample_data;\nCREATE TABLE IF NOT EXISTS sample_data.transactions (
-  transaction_id BIGSERIAL PRIMARY KEY,
-  user_id BIGINT NOT NULL,
-  product_id BIGINT NOT NULL,
-  amount NUMERIC(12,2) NOT NULL,
-  currency CHAR(3) NOT NULL DEFAULT 'USD',
-  transaction_date TIMESTAMP NOT NULL DEFAULT NOW(),
-  status VARCHAR(20) NOT NULL DEFAULT 'pending',
-  remarks TEXT,
-  marker_tag UUID
-);'''
-    conn = get_conn()
-    try:
+        ddl = TRANSACTIONS_DDL
+    with borrow(context) as conn:
         with conn:
             with conn.cursor() as cur:
-                cur.execute(ddl)
-    finally:
-        conn.close()
+                if partitioned:
+                    create_partitioned_table(cur)
+                    # partitions for the generator's two-year date span plus a few months ahead
+                    # (an existing heap table is left alone)
+                    if is_partitioned(cur):
+                        ensure_partitions(cur, start=add_months(month_start(datetime.datetime.now()), -25))
+                else:
+                    cur.execute(ddl)
 
 @when('I bulk-insert {num_rows:d} synthetic rows (batch_size={batch_size:d})')
 def step_bulk_insert(context, num_rows, batch_size):
-    marker = str(uuid.uuid4())
+    step_bulk_insert_format(context, num_rows, batch_size, 'csv')
+
+@when('I bulk-insert {num_rows:d} synthetic rows (batch_size={batch_size:d}, format={fmt})')
+def step_bulk_insert_format(context, num_rows, batch_size, fmt):
+    marker = getattr(context, 'run_marker', None) or str(uuid.uuid4())
     context.run_marker = marker
-    conn = get_conn()
-    try:
+    with borrow(context) as conn:
         with conn:
             with conn.cursor() as cur:
-                # Use COPY FROM STDIN for efficiency
-                cols = ['user_id','product_id','amount','currency','transaction_date','status','remarks','marker_tag']
-                sio = io.StringIO()
-                writer = csv.writer(sio)
-                rows_written = 0
-                for i in range(num_rows):
-                    r = gen_row(marker_tag=marker)
-                    writer.writerow([r['user_id'], r['product_id'], str(r['amount']), r['currency'], r['transaction_date'].isoformat(sep=' '), r['status'], r['remarks'] or '', marker])
-                    rows_written += 1
-                    # Flush per batch to avoid huge memory usage
-                    if rows_written % batch_size == 0:
-                        sio.seek(0)
-                        cur.copy_expert("COPY sample_data.transactions(user_id, product_id, amount, currency, transaction_date, status, remarks, marker_tag) FROM STDIN WITH (FORMAT csv)", sio)
-                        sio = io.StringIO()
-                        writer = csv.writer(sio)
-                # flush remaining
-                sio.seek(0)
-                if sio.tell() != 0:
-                    cur.copy_expert("COPY sample_data.transactions(user_id, product_id, amount, currency, transaction_date, status, remarks, marker_tag) FROM STDIN WITH (FORMAT csv)", sio)
-    finally:
-        conn.close()
+                # Stream generated blocks straight into one COPY FROM STDIN (csv or binary)
+                generator = BlockGenerator(seed=seed_from_env(), block_size=batch_size, marker_tag=marker)
+                context.rows_loaded = copy_blocks(cur, generator.blocks(num_rows), fmt=fmt)
+        # fresh planner statistics for the queries that follow (QA_ANALYZE_AFTER_LOAD=0 skips it)
+        context.analyze_after_load = after_bulk_load(conn, context.rows_loaded)
+    assert context.rows_loaded == num_rows, f"Loaded {context.rows_loaded} rows but {num_rows} were requested"
 
 @when('I insert a sample set of transactions:')
 def step_insert_sample_table(context):
     # context.table is behave table with amount/currency
     rows = []
     for row in context.table:
-        rows.append((1, 1, Decimal(row['amount']), row['currency'], datetime.datetime.utcnow(), 'completed', 'sample', None))
-    conn = get_conn()
-    try:
+        rows.append((1, 1, Decimal(row['amount']), row['currency'], datetime.datetime.utcnow(), 'completed', 'sample', getattr(context, 'run_marker', None)))
+    with borrow(context) as conn:
         with conn:
             with conn.cursor() as cur:
-                psycopg2.extras.execute_values(cur,
-                                               "INSERT INTO sample_data.transactions (user_id, product_id, amount, currency, transaction_date, status, remarks, marker_tag) VALUES %s",
-                                               rows,
-                                               template=None)
-    finally:
-        conn.close()
+                TransactionWriter(cur).insert_many(rows)
 
 @when('I attempt to insert a transaction with amount = {amount_str}')
+@when('I insert a transaction with amount = {amount_str}')
 def step_insert_amount(context, amount_str):
     marker = getattr(context, 'run_marker', str(uuid.uuid4()))
-    conn = get_conn()
     context.last_error = None
-    try:
+    with borrow(context) as conn:
         with conn:
             with conn.cursor() as cur:
                 try:
-                    cur.execute("INSERT INTO sample_data.transactions (user_id, product_id, amount, currency, transaction_date, status, remarks, marker_tag) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)",
-                                (1,1,Decimal(amount_str), 'USD', datetime.datetime.utcnow(), 'completed', 'overflow-test', marker))
+                    TransactionWriter(cur).insert((1,1,Decimal(amount_str), 'USD', datetime.datetime.utcnow(), 'completed', 'overflow-test', marker))
                 except Exception as e:
                     context.last_error = e
-    finally:
-        conn.close()
 
 @then('the insert should succeed')
 def step_assert_insert_success(context):
     assert getattr(context, 'last_error', None) is None, f"Expected insert to succeed but got error: {context.last_error}"
 
 @then('the insert should fail with a numeric overflow error')
+@then('the insert should fail with numeric overflow or out-of-range error')
 def step_assert_insert_overflow(context):
     assert getattr(context, 'last_error', None) is not None, 'Expected an error but insert succeeded'
     # basic check for numeric overflow text in exception
@@ -144,99 +110,87 @@ def step_assert_insert_overflow(context):
 @when('I insert a refund transaction with amount = {amount_str}')
 def step_insert_refund(context, amount_str):
     marker = getattr(context, 'run_marker', str(uuid.uuid4()))
-    conn = get_conn()
-    try:
+    with borrow(context) as conn:
         with conn:
             with conn.cursor() as cur:
-                cur.execute("INSERT INTO sample_data.transactions (user_id, product_id, amount, currency, transaction_date, status, remarks, marker_tag) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)",
-                            (2,2,Decimal(amount_str), 'USD', datetime.datetime.utcnow(), 'refund', 'refund-test', marker))
-    finally:
-        conn.close()
+                TransactionWriter(cur).insert((2,2,Decimal(amount_str), 'USD', datetime.datetime.utcnow(), 'refund', 'refund-test', marker))
+
+@when('I insert refund transactions (amount < 0)')
+def step_insert_refunds(context):
+    for amount_str in ('-25.00', '-0.01'):
+        step_insert_refund(context, amount_str)
 
 @then('selecting COUNT(*) WHERE amount < 0 should return at least 1')
+@then('refund rows should be queryable and counted by downstream rules')
 def step_assert_negative_count(context):
-    conn = get_conn()
-    try:
-        with conn:
-            with conn.cursor() as cur:
-                cur.execute("SELECT COUNT(*) FROM sample_data.transactions WHERE amount < 0")
-                cnt = cur.fetchone()[0]
-                assert cnt >= 1, f"Expected at least 1 negative amount row but found {cnt}"
-    finally:
-        conn.close()
+    cnt = integrity_scan(context).violations('negative_amount')
+    assert cnt >= 1, f"Expected at least 1 negative amount row but found {cnt}"
 
 @when("I insert transactions with currencies: 'USD', '', 'US', '€', NULL")
 def step_insert_currencies(context):
     marker = getattr(context, 'run_marker', str(uuid.uuid4()))
-    conn = get_conn()
-    try:
+    with borrow(context) as conn:
         with conn:
             with conn.cursor() as cur:
-                samples = [('USD',), ('',), ('US',), ('€',), (None,)]
-                for cur_code, in samples:
-                    cur.execute("INSERT INTO sample_data.transactions (user_id, product_id, amount, currency, transaction_date, status, remarks, marker_tag) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)",
-                                (3,3,Decimal('10.00'), cur_code, datetime.datetime.utcnow(), 'completed', 'currency-test', marker))
-    finally:
-        conn.close()
+                samples = ['USD', '', 'US', '€', None]
+                # one batch; rows the table's constraints reject (NULL under NOT NULL) are reported, the rest kept
+                result = TransactionWriter(cur).insert_rows(
+                    (3,3,Decimal('10.00'), cur_code, datetime.datetime.utcnow(), 'completed', 'currency-test', marker) for cur_code in samples)
+    context.insert_errors = {samples[e.index]: e for e in result.errors}
+    log.info(f"currency samples: {result.summary()}")
+    # only NULL breaks the schema (NOT NULL); the malformed codes must be stored for the integrity check to find
+    rejected = {code: e.pgcode for code, e in context.insert_errors.items()}
+    assert rejected == {None: psycopg2.errorcodes.NOT_NULL_VIOLATION}, f"Expected only the NULL currency to be rejected with {psycopg2.errorcodes.NOT_NULL_VIOLATION}, got {context.insert_errors}"
 
 @then('currency integrity check should flag invalid_currency_count >= {min_invalid:d}')
 def step_check_invalid_currency(context, min_invalid):
-    conn = get_conn()
-    try:
-        with conn:
-            with conn.cursor() as cur:
-                cur.execute("SELECT COUNT(*) FROM sample_data.transactions WHERE length(trim(currency)) != 3 OR currency IS NULL OR currency ~ '[^A-Za-z0-9]'")
-                cnt = cur.fetchone()[0]
-                assert cnt >= min_invalid, f"Expected at least {min_invalid} invalid currency rows but found {cnt}"
-    finally:
-        conn.close()
+    report = integrity_scan(context)
+    cnt = report.violations('invalid_currency')
+    assert cnt >= min_invalid, f"Expected at least {min_invalid} invalid currency rows but found {cnt}: {report['invalid_currency'].as_dict()}"
+
+@then('an integrity check should flag invalid or nonconforming currencies')
+def step_check_nonconforming_currencies(context):
+    # '', 'US' and '€' from the sample set are stored and must all be flagged
+    step_check_invalid_currency(context, 3)
 
 @when('I insert transactions with dates {date1} and {date2}')
+@when("I insert transactions with transaction_date = '{date1}' and '{date2}'")
 def step_insert_extreme_dates(context, date1, date2):
     marker = getattr(context, 'run_marker', str(uuid.uuid4()))
     d1 = datetime.datetime.fromisoformat(date1)
     d2 = datetime.datetime.fromisoformat(date2)
-    conn = get_conn()
-    try:
+    with borrow(context) as conn:
         with conn:
             with conn.cursor() as cur:
-                cur.execute("INSERT INTO sample_data.transactions (user_id, product_id, amount, currency, transaction_date, status, remarks, marker_tag) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)",
-                            (4,4,Decimal('50.00'),'USD', d1, 'completed', 'date-extreme', marker))
-                cur.execute("INSERT INTO sample_data.transactions (user_id, product_id, amount, currency, transaction_date, status, remarks, marker_tag) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)",
-                            (5,5,Decimal('60.00'),'USD', d2, 'completed', 'date-extreme', marker))
-    finally:
-        conn.close()
+                TransactionWriter(cur).insert_many([(4,4,Decimal('50.00'),'USD', d1, 'completed', 'date-extreme', marker),
+                                                    (5,5,Decimal('60.00'),'USD', d2, 'completed', 'date-extreme', marker)])
 
 @then('querying recent window \(last 30 days\) should exclude those extreme dates')
+@then('queries constrained to the last 30 days should exclude those extreme records')
 def step_assert_recent_excludes_extremes(context):
-    conn = get_conn()
-    try:
-        with conn:
-            with conn.cursor() as cur:
-                cur.execute("SELECT COUNT(*) FROM sample_data.transactions WHERE transaction_date >= NOW() - INTERVAL '30 days' AND (remarks = 'date-extreme')")
-                cnt = cur.fetchone()[0]
-                assert cnt == 0, f"Expected 0 extreme-date rows in last 30 days but found {cnt}"
-    finally:
-        conn.close()
+    report = integrity_scan(context)
+    cnt = report.violations('extreme_date_in_recent_window')
+    assert cnt == 0, f"Expected 0 extreme-date rows in last 30 days but found {cnt}: {report['extreme_date_in_recent_window'].as_dict()}"
 
 @when('I insert a transaction with status of length {length:d}')
 def step_insert_long_status(context, length):
     status = ''.join(random.choices(string.ascii_letters + string.digits, k=length))
     marker = getattr(context, 'run_marker', str(uuid.uuid4()))
-    conn = get_conn()
     context.last_status_error = None
-    try:
+    with borrow(context) as conn:
         with conn:
             with conn.cursor() as cur:
                 try:
-                    cur.execute("INSERT INTO sample_data.transactions (user_id, product_id, amount, currency, transaction_date, status, remarks, marker_tag) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)",
-                                (6,6,Decimal('12.00'),'USD', datetime.datetime.utcnow(), status, 'long-status', marker))
+                    TransactionWriter(cur).insert((6,6,Decimal('12.00'),'USD', datetime.datetime.utcnow(), status, 'long-status', marker))
                 except Exception as e:
                     context.last_status_error = e
-    finally:
-        conn.close()
+
+@when('I attempt to insert a row with a status string longer than {limit:d} characters')
+def step_insert_status_over_limit(context, limit):
+    step_insert_long_status(context, limit + 1)
 
 @then('the insert should either truncate or fail depending on DB constraint')
+@then('the DB should either reject with an error or truncate per schema/DB settings')
 def step_assert_status_behavior(context):
     # If last_status_error is set, it's a failure; otherwise it succeeded (DB may truncate)
     if getattr(context, 'last_status_error', None):
@@ -245,105 +199,128 @@ def step_assert_status_behavior(context):
     else:
         assert True
 
-@when('I insert a transaction with a remarks field of size 1MB and unicode content')
-def step_insert_large_remarks(context):
-    big = ('𠜎' * 1000) * 1000  # ~1M characters of unicode
+# Helper: stream a multi-byte remarks payload of size_bytes in with COPY (see qakit.largetext)
+def insert_large_remarks(context, size_bytes):
     marker = getattr(context, 'run_marker', str(uuid.uuid4()))
-    conn = get_conn()
-    try:
+    row = {'user_id': 7, 'product_id': 7, 'amount': Decimal('99.99'), 'currency': 'USD',
+           'transaction_date': datetime.datetime.utcnow(), 'status': 'completed', 'marker_tag': marker}
+    with borrow(context) as conn:
         with conn:
             with conn.cursor() as cur:
-                cur.execute("INSERT INTO sample_data.transactions (user_id, product_id, amount, currency, transaction_date, status, remarks, marker_tag) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)",
-                            (7,7,Decimal('99.99'),'USD', datetime.datetime.utcnow(), 'completed', big, marker))
-                context.large_remarks_marker = marker
-    finally:
-        conn.close()
+                context.large_remarks = write_remarks(cur, row, payload_chunks(size_bytes))
+    context.large_remarks_marker = marker
+    log.info(f'large remarks written: {context.large_remarks.as_dict()}')
 
-@then('selecting that transaction should return the full remarks text')
-def step_assert_large_remarks_retrieved(context):
-    marker = getattr(context, 'large_remarks_marker', None)
-    assert marker is not None
-    conn = get_conn()
-    try:
+# Helper: read the payload back in substring windows, hashing as it arrives, and compare with what was written
+def assert_large_remarks_intact(context):
+    written = getattr(context, 'large_remarks', None)
+    assert written is not None
+    with borrow(context) as conn:
         with conn:
             with conn.cursor() as cur:
-                cur.execute("SELECT length(remarks::text) FROM sample_data.transactions WHERE marker_tag = %s", (marker,))
-                row = cur.fetchone()
-                assert row and row[0] > 500_000, f"Remarks size too small or missing: {row}"
-    finally:
-        conn.close()
+                read = read_remarks(cur, written.transaction_id)
+                server = server_digest(cur, written.transaction_id)
+    log.info(f'large remarks read: {read.as_dict()}')
+    assert read.matches(written), f'remarks corrupted: wrote {written.as_dict()}, read {read.as_dict()}'
+    assert server == (written.chars, written.octets, written.sha256), f'server-side digest differs: {server}'
+
+@when('I insert a transaction with a remarks field of size 1MB and unicode content')
+def step_insert_large_remarks(context):
+    insert_large_remarks(context, int(float(os.environ.get('QA_LARGE_REMARKS_MB', 1)) * 2 ** 20))
+
+@then('selecting that transaction should return the full remarks text')
+def step_assert_large_remarks_retrieved(context):
+    assert_large_remarks_intact(context)
+
+@when('I insert a transaction with a remarks payload >= {mb:d}MB containing multi-byte unicode')
+def step_insert_large_remarks_payload(context, mb):
+    insert_large_remarks(context, int(max(mb, float(os.environ.get('QA_LARGE_REMARKS_MB', mb))) * 2 ** 20))
+
+@then('selecting that row should return the full remarks content without corruption')
+def step_assert_large_remarks_content(context):
+    assert_large_remarks_intact(context)
 
 @when('I perform a transactional bulk import where one row violates NOT NULL')
+@when('I perform a transactional bulk import where one row violates a NOT NULL constraint')
 def step_bulk_import_with_violation(context):
     marker = getattr(context, 'run_marker', str(uuid.uuid4()))
-    conn = get_conn()
     context.bulk_import_error = None
-    try:
+    with borrow(context) as conn:
         with conn:
             with conn.cursor() as cur:
                 try:
                     # begin transaction explicitly
                     cur.execute("BEGIN")
-                    cur.execute("INSERT INTO sample_data.transactions (user_id, product_id, amount, currency, transaction_date, status, remarks, marker_tag) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)",
-                                (8,8,Decimal('10.00'),'USD', datetime.datetime.utcnow(), 'completed', 'ok', marker))
-                    # violate NOT NULL by inserting NULL into user_id
-                    cur.execute("INSERT INTO sample_data.transactions (user_id, product_id, amount, currency, transaction_date, status, remarks, marker_tag) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)",
-                                (None,9,Decimal('20.00'),'USD', datetime.datetime.utcnow(), 'completed', 'viol', marker))
+                    # one batch; the NULL user_id violates NOT NULL and fails the whole statement
+                    TransactionWriter(cur).insert_many([(8,8,Decimal('10.00'),'USD', datetime.datetime.utcnow(), 'completed', 'ok', marker),
+                                                        (None,9,Decimal('20.00'),'USD', datetime.datetime.utcnow(), 'completed', 'viol', marker)])
                     cur.execute("COMMIT")
                 except Exception as e:
                     context.bulk_import_error = e
                     # rollback
                     cur.execute("ROLLBACK")
-    finally:
-        conn.close()
 
 @then('the entire import should be rolled back (no partial commits)')
+@then('the entire import should be rolled back and no partial rows should persist')
 def step_assert_bulk_rollback(context):
     marker = getattr(context, 'run_marker', None)
-    conn = get_conn()
-    try:
+    with borrow(context) as conn:
         with conn:
             with conn.cursor() as cur:
                 cur.execute("SELECT COUNT(*) FROM sample_data.transactions WHERE marker_tag = %s", (marker,))
                 cnt = cur.fetchone()[0]
                 assert cnt == 0, f"Expected 0 rows for marker {marker} after rollback but found {cnt}"
-    finally:
-        conn.close()
 
 @when('I simulate sequence near exhaustion by setting sequence to a high value')
 def step_simulate_sequence(context):
     # caution: this manipulates the sequence - only for test environments
-    conn = get_conn()
     context.seq_error = None
-    try:
-        with conn:
-            with conn.cursor() as cur:
-                # set sequence to a high but safe value for testing
-                cur.execute("SELECT setval(pg_get_serial_sequence('sample_data.transactions','transaction_id'), 9223372036854770000)")
-    except Exception as e:
-        context.seq_error = e
-    finally:
-        conn.close()
+    with borrow(context) as conn:
+        try:
+            with conn:
+                with conn.cursor() as cur:
+                    # set sequence to a high but safe value for testing
+                    cur.execute("SELECT setval(pg_get_serial_sequence('sample_data.transactions','transaction_id'), 9223372036854770000)")
+        except Exception as e:
+            context.seq_error = e
 
 @when('I attempt a bulk insert of {small_rows:d} rows')
 def step_attempt_bulk_after_seq(context, small_rows):
     # try inserting small_rows and capture errors
     marker = getattr(context, 'run_marker', str(uuid.uuid4()))
-    conn = get_conn()
     context.seq_insert_error = None
-    try:
+    with borrow(context) as conn:
         with conn:
             with conn.cursor() as cur:
                 try:
-                    for i in range(small_rows):
-                        cur.execute("INSERT INTO sample_data.transactions (user_id, product_id, amount, currency, transaction_date, status, remarks, marker_tag) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)",
-                                    (10+i,10+i,Decimal('1.00'),'USD', datetime.datetime.utcnow(), 'completed', 'seq-test', marker))
+                    now = datetime.datetime.utcnow()
+                    TransactionWriter(cur).insert_many((10+i,10+i,Decimal('1.00'),'USD', now, 'completed', 'seq-test', marker)
+                                                       for i in range(small_rows))
                 except Exception as e:
                     context.seq_insert_error = e
+
+@when('I set the transaction_id sequence near BIGINT max and attempt bulk inserts')
+def step_sequence_exhaustion(context):
+    # the sequence is put back afterwards (the high-id rows go with the scenario's cleanup), otherwise every
+    # later scenario's inserts would fail
+    with borrow(context) as conn:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_get_serial_sequence('sample_data.transactions','transaction_id')")
+                sequence = cur.fetchone()[0]
+                cur.execute(f"SELECT last_value, is_called FROM {sequence}")
+                last_value, is_called = cur.fetchone()
+    try:
+        step_simulate_sequence(context)
+        step_attempt_bulk_after_seq(context, 10)
     finally:
-        conn.close()
+        with borrow(context) as conn:
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT setval(%s, %s, %s)", (sequence, last_value, is_called))
 
 @then('insertion should either fail gracefully or raise a sequence error')
+@then('inserts should fail with understandable errors or the system should handle sequence rotation per policy')
 def step_assert_seq_behavior(context):
     # either error occurred or not; if error, check message refers to sequence or bigint overflow
     if getattr(context, 'seq_insert_error', None):
@@ -357,14 +334,11 @@ def step_cleanup_marker(context):
     marker = getattr(context, 'run_marker', None)
     if not marker:
         return
-    conn = get_conn()
-    try:
-        with conn:
-            with conn.cursor() as cur:
-                cur.execute("DELETE FROM sample_data.transactions WHERE marker_tag = %s", (marker,))
-                context.cleanup_deleted = cur.rowcount
-    finally:
-        conn.close()
+    # Indexed, batched delete followed by VACUUM (QA_CLEANUP_VACUUM=0 skips it)
+    with borrow(context) as conn:
+        report = cleanup_run(conn, marker, run_vacuum=os.environ.get('QA_CLEANUP_VACUUM', '1') != '0')
+    context.cleanup_deleted = report.deleted
+    context.cleanup_report = report
 
 @then('the cleanup should remove rows with marker_tag equal to the current run id')
 def step_assert_cleanup(context):
@@ -25,12 +25,14 @@ Feature: Transactions table edge cases for very large datasets
     When I query "SELECT COUNT(*) FROM sample_data.transactions;"
     Then the returned count should be > 10000000
 
+  @plan-031
   Scenario: Aggregation correctness at scale (SUM/AVG)
     Given the transactions table exists with representative distribution
     When I run "SELECT SUM(amount)::numeric(20,2), AVG(amount)::numeric(12,2) FROM sample_data.transactions WHERE currency='USD';"
     Then the numeric aggregation results should be within acceptable precision and match expected baselines
 
   # Validation / boundary
+  @plan-032
   Scenario: Numeric precision boundary and overflow handling
     Given the transactions table exists
     When I insert a transaction with amount = 9999999999.99
@@ -38,11 +40,13 @@ Feature: Transactions table edge cases for very large datasets
     When I insert a transaction with amount = 10000000000.00
     Then the insert should fail with numeric overflow or out-of-range error
 
+  @plan-033
   Scenario: Negative amounts and refund processing
     Given the transactions table exists
     When I insert refund transactions (amount < 0)
     Then refund rows should be queryable and counted by downstream rules
 
+  @plan-034
   Scenario: Currency code validation and malformed values
     Given the transactions table exists
     When I insert transactions with currencies: 'USD', '', 'US', '€', NULL
@@ -58,27 +62,32 @@ Feature: Transactions table edge cases for very large datasets
     When I attempt to insert a row with a status string longer than 20 characters
     Then the DB should either reject with an error or truncate per schema/DB settings
 
+  @plan-035
   Scenario: Remarks large payload and unicode support
     Given the transactions table exists
     When I insert a transaction with a remarks payload >= 1MB containing multi-byte unicode
     Then selecting that row should return the full remarks content without corruption
 
   # Operational / resilience
+  @plan-036
   Scenario: Bulk import atomicity (transactional rollback on violation)
     Given the transactions table exists
     When I perform a transactional bulk import where one row violates a NOT NULL constraint
     Then the entire import should be rolled back and no partial rows should persist
 
+  @plan-037
   Scenario: Sequence exhaustion simulation and graceful failure
     Given the transactions table exists
     When I set the transaction_id sequence near BIGINT max and attempt bulk inserts
     Then inserts should fail with understandable errors or the system should handle sequence rotation per policy
 
+  @plan-038
   Scenario: Concurrent writes and isolation under heavy load
     Given the transactions table exists and multiple clients are writing concurrently
     When a high-concurrency workload is applied (multi-client inserts/updates)
     Then no lost updates or data corruption should occur and deadlocks should be handled
 
+  @plan-039
   Scenario: Pagination determinism with duplicate sort keys
     Given the table contains >10M rows with many equal transaction_date values
     When paginating by transaction_date DESC LIMIT/OFFSET or keyset pagination
@@ -99,11 +108,13 @@ Feature: Transactions table edge cases for very large datasets
     When VACUUM/auto-vacuum runs or manual maintenance is executed
     Then table bloat should be reclaimed and read performance restored within expected window
 
+  @plan-040
   Scenario: Backup & restore integrity for very large datasets
     Given a full backup is taken when the table contains >10M rows
     When the backup is restored to a test instance
     Then row counts and sample checksums should match the original source for validated partitions
 
+  @plan-041
   Scenario: Deduplication and idempotent ingestion
     Given ingestion can retry and produce duplicates based on business keys
     When deduplication logic runs (e.g., upsert using unique business key)
@@ -6,10 +6,12 @@ Feature: Transactions data validation and business rule checks
   Background:
     Given the transactions table exists
 
+  @plan-001
   Scenario: Insert transaction with invalid currency length
     When inserting a transaction with currency = "USDX"
     Then the database should reject the insert due to CHAR(3) constraint
 
+  @plan-002
   Scenario: Update status field with unexpected value
     When updating status to "invalid_state"
     Then the database allows the update
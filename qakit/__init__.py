@@ -0,0 +1 @@
+# Shared helpers for the behave steps, pytest tests and benchmarks in this repo
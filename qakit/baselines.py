@@ -0,0 +1,152 @@
+import datetime
+import json
+import os
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+
+from qakit.copyload import COPY_TABLE
+
+BASELINE_DIR = os.environ.get('QA_BASELINE_DIR', os.path.join('reports', 'baselines'))
+CENT = Decimal('0.01')
+
+VERIFY_SQL = '''SELECT currency, status, COUNT(*), SUM(amount), MIN(amount), MAX(amount)
+FROM {table} WHERE marker_tag = %s GROUP BY currency, status'''
+
+
+def _money(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+def _cents(value):
+    return int(Decimal(value).scaleb(2))
+
+
+def _factorize(values):
+    # (distinct values, int code per row); much cheaper than np.unique on object arrays
+    values = values.tolist()
+    codes = {}
+    for v in set(values):
+        codes[v] = len(codes)
+    return list(codes), np.fromiter(map(codes.__getitem__, values), np.int64, len(values))
+
+
+class Aggregates:
+    """Exact COUNT/SUM/MIN/MAX of amount per (currency, status), accumulated as rows are generated.
+
+    Amounts are kept as integer cents, so sums are exact at any row count;
+    Decimal values are produced on the way out. Aggregates from parallel
+    shards merge() into the same totals a single pass would give.
+    """
+
+    def __init__(self, groups=None):
+        self.groups = groups or {}  # (currency, status) -> [count, sum_cents, min_cents, max_cents]
+
+    @property
+    def rows(self):
+        return sum(g[0] for g in self.groups.values())
+
+    def _add(self, key, count, total, lo, hi):
+        g = self.groups.get(key)
+        if g is None:
+            self.groups[key] = [count, total, lo, hi]
+        else:
+            g[0] += count
+            g[1] += total
+            g[2] = min(g[2], lo)
+            g[3] = max(g[3], hi)
+
+    def update(self, blk):
+        """Fold one RowBlock in: one sort and three reduceat passes per block."""
+        if not len(blk):
+            return self
+        currencies, ci = _factorize(blk.currency)
+        statuses, si = _factorize(blk.status)
+        codes = ci * len(statuses) + si
+        order = np.argsort(codes, kind='stable')
+        codes, cents = codes[order], blk.amount_cents[order]
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        counts = np.diff(np.r_[starts, len(codes)])
+        sums = np.add.reduceat(cents, starts)
+        mins = np.minimum.reduceat(cents, starts)
+        maxs = np.maximum.reduceat(cents, starts)
+        for code, count, total, lo, hi in zip(codes[starts].tolist(), counts.tolist(), sums.tolist(),
+                                              mins.tolist(), maxs.tolist()):
+            self._add((currencies[code // len(statuses)], statuses[code % len(statuses)]), count, total, lo, hi)
+        return self
+
+    def merge(self, other):
+        for key, (count, total, lo, hi) in other.groups.items():
+            self._add(key, count, total, lo, hi)
+        return self
+
+    def expected(self, currency=None, status=None):
+        """{'count', 'sum', 'avg', 'min', 'max'} over the groups matching currency/status (None = any).
+
+        avg is the exact quotient rounded half away from zero to cents, as
+        AVG(amount)::numeric(12,2) rounds it.
+        """
+        picked = [g for (c, s), g in self.groups.items()
+                  if (currency is None or c == currency) and (status is None or s == status)]
+        count = sum(g[0] for g in picked)
+        total = sum(g[1] for g in picked)
+        if not count:
+            return {'count': 0, 'sum': None, 'avg': None, 'min': None, 'max': None}
+        return {'count': count, 'sum': _money(total),
+                'avg': (_money(total) / count).quantize(CENT, rounding=ROUND_HALF_UP),
+                'min': _money(min(g[2] for g in picked)), 'max': _money(max(g[3] for g in picked))}
+
+    def manifest(self, marker_tag, table=COPY_TABLE):
+        return {'marker_tag': marker_tag, 'table': table, 'rows': self.rows,
+                'created': datetime.datetime.now().isoformat(timespec='seconds'),
+                'groups': [{'currency': c, 'status': s, 'count': g[0], 'sum': str(_money(g[1])),
+                            'min': str(_money(g[2])), 'max': str(_money(g[3]))}
+                           for (c, s), g in sorted(self.groups.items())]}
+
+    @classmethod
+    def from_manifest(cls, manifest):
+        return cls({(g['currency'], g['status']): [g['count'], _cents(g['sum']), _cents(g['min']), _cents(g['max'])]
+                    for g in manifest['groups']})
+
+
+def manifest_path(marker_tag, directory=BASELINE_DIR):
+    return os.path.join(directory, f'{marker_tag}.json')
+
+
+def save_manifest(aggregates, marker_tag, table=COPY_TABLE, directory=BASELINE_DIR):
+    os.makedirs(directory, exist_ok=True)
+    path = manifest_path(marker_tag, directory)
+    with open(path, 'w') as f:
+        json.dump(aggregates.manifest(marker_tag, table), f, indent=2)
+    return path
+
+
+def load_manifest(marker_tag, directory=BASELINE_DIR):
+    with open(manifest_path(marker_tag, directory)) as f:
+        return Aggregates.from_manifest(json.load(f))
+
+
+def list_manifests(directory=BASELINE_DIR):
+    """Saved manifests, newest first."""
+    if not os.path.isdir(directory):
+        return []
+    manifests = []
+    for entry in os.listdir(directory):
+        if entry.endswith('.json'):
+            with open(os.path.join(directory, entry)) as f:
+                manifests.append(json.load(f))
+    return sorted(manifests, key=lambda m: m['created'], reverse=True)
+
+
+def verify(cur, aggregates, marker_tag, table=COPY_TABLE):
+    """Compare one server-side GROUP BY over the marker's rows with the baseline; returns mismatch strings."""
+    cur.execute(VERIFY_SQL.format(table=table), (marker_tag,))
+    actual = {(c.strip() if c else c, s): (n, total, lo, hi) for c, s, n, total, lo, hi in cur.fetchall()}
+    problems = []
+    for key in sorted(set(actual) | set(aggregates.groups)):
+        g = aggregates.groups.get(key)
+        want = (g[0], _money(g[1]), _money(g[2]), _money(g[3])) if g else None
+        got = actual.get(key)
+        if got != want:
+            problems.append(f'{key[0]}/{key[1]}: expected (count, sum, min, max) {want}, server has {got}')
+    return problems
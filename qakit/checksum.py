@@ -0,0 +1,200 @@
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from qakit.generator import COLUMNS
+
+CHECKSUM_TABLE = 'sample_data.transactions'
+CHECKSUM_COLUMNS = ('transaction_id',) + COLUMNS
+# Rows per Merkle leaf: 10M rows -> 100 leaves, a few KB of digests per side
+LEAF_ROWS = 100_000
+# Divergent ranges are split this many ways per round trip until they hold at most ROW_DIFF_ROWS ids
+FANOUT = 16
+ROW_DIFF_ROWS = 1_000
+
+# 64-bit row hash; sums of it are order independent, so ranges can be aggregated in any plan order
+ROW_HASH_SQL = "('x' || left(md5(ROW({cols})::text), 16))::bit(64)::bigint"
+
+DIGEST_SQL = '''SELECT (transaction_id - %(origin)s) / %(width)s, COUNT(*), mod(SUM({row_hash}::numeric), 18446744073709551616)
+FROM {table} WHERE transaction_id >= %(lo)s AND transaction_id < %(hi)s GROUP BY 1'''
+
+ROWS_SQL = '''SELECT transaction_id, md5(ROW({cols})::text) FROM {table}
+WHERE transaction_id >= %(lo)s AND transaction_id < %(hi)s'''
+
+
+def digest_sql(table=CHECKSUM_TABLE, columns=CHECKSUM_COLUMNS):
+    row_hash = ROW_HASH_SQL.format(cols=', '.join(columns))
+    return DIGEST_SQL.format(row_hash=row_hash, table=table)
+
+
+def rows_sql(table=CHECKSUM_TABLE, columns=CHECKSUM_COLUMNS):
+    return ROWS_SQL.format(cols=', '.join(columns), table=table)
+
+
+def _leaf_hash(index, count, total):
+    return hashlib.sha256(f'{index}:{count}:{total}'.encode()).digest()
+
+
+class MerkleTree:
+    """Binary hash tree over per-range (row count, hash sum) leaves; an odd node is carried up unchanged."""
+
+    def __init__(self, leaves):
+        self.leaves = list(leaves)
+        level = [_leaf_hash(i, c, s) for i, (c, s) in enumerate(self.leaves)] or [hashlib.sha256(b'').digest()]
+        self.levels = [level]
+        while len(level) > 1:
+            level = [hashlib.sha256(b''.join(level[i:i + 2])).digest() if i + 1 < len(level) else level[i]
+                     for i in range(0, len(level), 2)]
+            self.levels.append(level)
+
+    @property
+    def root(self):
+        return self.levels[-1][0].hex()
+
+    def diff(self, other):
+        """Indices of the leaves that differ, found by descending only into subtrees whose hashes differ."""
+        if len(self.leaves) != len(other.leaves):
+            raise ValueError('trees cover different leaf ranges')
+        differing = []
+        stack = [(len(self.levels) - 1, 0)]
+        while stack:
+            depth, i = stack.pop()
+            if self.levels[depth][i] == other.levels[depth][i]:
+                continue
+            if depth == 0:
+                differing.append(i)
+                continue
+            for child in (2 * i + 1, 2 * i):
+                if child < len(self.levels[depth - 1]):
+                    stack.append((depth - 1, child))
+        return sorted(differing)
+
+
+class _Side:
+    """One table being compared: a pool plus a count of the result rows it returned."""
+
+    def __init__(self, pool, table, columns):
+        self.pool = pool
+        self.digest_sql = digest_sql(table, columns)
+        self.rows_sql = rows_sql(table, columns)
+        self.table = table
+        self.queries = 0
+        self.result_rows = 0
+        self._lock = threading.Lock()
+
+    def fetch(self, sql, params):
+        with self.pool.connection() as conn:
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute(sql, params)
+                    rows = cur.fetchall()
+        with self._lock:
+            self.queries += 1
+            self.result_rows += len(rows)
+        return rows
+
+    def bounds(self):
+        return self.fetch(f'SELECT MIN(transaction_id), MAX(transaction_id) FROM {self.table}', None)[0]
+
+    def digests(self, origin, width, lo, hi):
+        """{bucket: (count, hash sum)} for [lo, hi) cut into buckets of `width` ids starting at `origin`."""
+        rows = self.fetch(self.digest_sql, {'origin': origin, 'width': width, 'lo': lo, 'hi': hi})
+        return {bucket: (count, int(total)) for bucket, count, total in rows}
+
+    def row_hashes(self, lo, hi):
+        return dict(self.fetch(self.rows_sql, {'lo': lo, 'hi': hi}))
+
+
+def leaf_digests(side, origin, leaves, leaf_rows, workers):
+    """[(count, hash sum)] per leaf, computed server-side over `workers` concurrent id ranges."""
+    per_worker = -(-leaves // max(1, workers))
+    chunks = [(origin + i * leaf_rows, origin + min(i + per_worker, leaves) * leaf_rows)
+              for i in range(0, leaves, per_worker)]
+    with ThreadPoolExecutor(max_workers=len(chunks) or 1) as executor:
+        parts = list(executor.map(lambda c: side.digests(origin, leaf_rows, *c), chunks))
+    merged = {}
+    for part in parts:
+        merged.update(part)
+    return [merged.get(i, (0, 0)) for i in range(leaves)]
+
+
+class ChecksumReport:
+    def __init__(self, source_root, target_root, source_rows, target_rows, leaves, leaf_rows):
+        self.source_root = source_root
+        self.target_root = target_root
+        self.source_rows = source_rows
+        self.target_rows = target_rows
+        self.leaves = leaves
+        self.leaf_rows = leaf_rows
+        self.divergent_ranges = []
+        self.missing = []
+        self.extra = []
+        self.changed = []
+        self.queries = 0
+        self.result_rows = 0
+        self.seconds = 0.0
+
+    @property
+    def matches(self):
+        return self.source_root == self.target_root
+
+    def summary(self):
+        return {'matches': self.matches, 'source_rows': self.source_rows, 'target_rows': self.target_rows,
+                'root': self.source_root, 'leaves': self.leaves, 'divergent_ranges': len(self.divergent_ranges),
+                'missing': len(self.missing), 'extra': len(self.extra), 'changed': len(self.changed),
+                'sample_ids': sorted(self.missing + self.extra + self.changed)[:10], 'queries': self.queries,
+                'result_rows': self.result_rows, 'seconds': round(self.seconds, 3)}
+
+
+def _localize(source, target, lo, hi, row_diff_rows, fanout, report):
+    """Narrow a divergent [lo, hi) down to individual ids, splitting it `fanout` ways per level."""
+    stack = [(lo, hi)]
+    while stack:
+        lo, hi = stack.pop()
+        if hi - lo <= row_diff_rows:
+            a, b = source.row_hashes(lo, hi), target.row_hashes(lo, hi)
+            report.missing.extend(i for i in a if i not in b)
+            report.extra.extend(i for i in b if i not in a)
+            report.changed.extend(i for i in a if i in b and a[i] != b[i])
+            continue
+        width = -(-(hi - lo) // fanout)
+        a, b = source.digests(lo, width, lo, hi), target.digests(lo, width, lo, hi)
+        for bucket in sorted(set(a) | set(b), reverse=True):
+            if a.get(bucket) != b.get(bucket):
+                stack.append((lo + bucket * width, min(hi, lo + (bucket + 1) * width)))
+
+
+def compare(source_pool, target_pool, table=CHECKSUM_TABLE, target_table=None, columns=CHECKSUM_COLUMNS,
+            leaf_rows=LEAF_ROWS, workers=4, fanout=FANOUT, row_diff_rows=ROW_DIFF_ROWS, localize=True):
+    """Compare two copies of a table by transaction_id range digests instead of pulling rows to the client.
+
+    Both sides hash every row on the server and return one (count, sum)
+    digest per leaf range, `workers` ranges at a time. Equal Merkle roots
+    mean equal tables. Otherwise only the leaves whose digests differ are
+    split further (fanout-way digests, then per-row md5s once a range holds
+    at most row_diff_rows ids) to list missing, extra and changed ids.
+    The pools may point at different databases or servers.
+    """
+    start = time.perf_counter()
+    source = _Side(source_pool, table, columns)
+    target = _Side(target_pool, target_table or table, columns)
+    bounds = [b for b in (source.bounds(), target.bounds()) if b[0] is not None]
+    origin = min(b[0] for b in bounds) if bounds else 0
+    end = max(b[1] for b in bounds) + 1 if bounds else 0
+    leaves = -(-(end - origin) // leaf_rows)
+    source_leaves = leaf_digests(source, origin, leaves, leaf_rows, workers)
+    target_leaves = leaf_digests(target, origin, leaves, leaf_rows, workers)
+    source_tree, target_tree = MerkleTree(source_leaves), MerkleTree(target_leaves)
+    report = ChecksumReport(source_tree.root, target_tree.root, sum(c for c, _ in source_leaves),
+                            sum(c for c, _ in target_leaves), leaves, leaf_rows)
+    for leaf in source_tree.diff(target_tree):
+        lo = origin + leaf * leaf_rows
+        report.divergent_ranges.append((lo, min(end, lo + leaf_rows)))
+    if localize:
+        for lo, hi in report.divergent_ranges:
+            _localize(source, target, lo, hi, row_diff_rows, fanout, report)
+    report.queries = source.queries + target.queries
+    report.result_rows = source.result_rows + target.result_rows
+    report.seconds = time.perf_counter() - start
+    return report
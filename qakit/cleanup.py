@@ -0,0 +1,169 @@
+import os
+import time
+
+CLEANUP_TABLE = 'sample_data.transactions'
+MARKER_INDEX = 'transactions_marker_tag_idx'
+DELETE_BATCH = 50_000
+
+STATS_SQL = '''SELECT COALESCE(SUM(n_live_tup), 0)::bigint, COALESCE(SUM(n_dead_tup), 0)::bigint,
+       COALESCE(SUM(n_tup_del), 0)::bigint, COALESCE(SUM(vacuum_count + autovacuum_count), 0)::bigint,
+       MAX(GREATEST(last_vacuum, last_autovacuum)),
+       (pg_total_relation_size(%(table)s::regclass)
+         + COALESCE((SELECT SUM(pg_total_relation_size(relid)) FROM pg_partition_tree(%(table)s::regclass)
+                     WHERE relid <> %(table)s::regclass), 0))::bigint
+FROM pg_stat_user_tables
+WHERE relid = %(table)s::regclass OR relid IN (SELECT relid FROM pg_partition_tree(%(table)s::regclass))'''
+
+# below this many deleted rows a scenario's cleanup leaves the dead tuples to autovacuum
+SCENARIO_VACUUM_ROWS = int(os.environ.get('QA_SCENARIO_VACUUM_ROWS', 100_000))
+
+# one keyset batch: the next batch starts after the highest id this one deleted
+SCENARIO_DELETE_SQL = '''WITH batch AS (
+  SELECT transaction_id FROM {table} WHERE transaction_id > %(above)s AND marker_tag = %(marker)s
+  ORDER BY transaction_id LIMIT %(limit)s),
+deleted AS (DELETE FROM {table} WHERE transaction_id IN (SELECT transaction_id FROM batch) RETURNING transaction_id)
+SELECT COUNT(*), MAX(transaction_id) FROM deleted'''
+
+DELETE_SQL = '''DELETE FROM {table} WHERE marker_tag = %(marker)s AND transaction_id = ANY(ARRAY(
+  SELECT transaction_id FROM {table} WHERE marker_tag = %(marker)s LIMIT %(limit)s))'''
+
+
+def ensure_marker_index(conn, table=CLEANUP_TABLE):
+    """Partial index on marker_tag so per-run cleanup is an index scan instead of a full-table scan."""
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute(f'CREATE INDEX IF NOT EXISTS {MARKER_INDEX} ON {table} (marker_tag) WHERE marker_tag IS NOT NULL')
+
+
+def id_high_water_mark(conn, table=CLEANUP_TABLE):
+    """Highest transaction_id in the table, 0 while it is empty or does not exist yet."""
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute('SELECT to_regclass(%s)', (table,))
+            if cur.fetchone()[0] is None:
+                return 0
+            cur.execute(f'SELECT COALESCE(MAX(transaction_id), 0) FROM {table}')
+            return cur.fetchone()[0]
+
+
+def delete_scenario_rows(conn, marker_tag, above_id, table=CLEANUP_TABLE, batch_size=DELETE_BATCH,
+                         vacuum_rows=SCENARIO_VACUUM_ROWS):
+    """Delete the rows one scenario tagged with marker_tag; returns (rows, vacuum seconds or None).
+
+    Only ids above the high-water mark taken when the scenario started are
+    considered, so the primary key bounds the scan without a marker_tag
+    index. Rows go in short transactions of at most batch_size, each
+    resuming after the last id the previous one removed, and a delete of
+    vacuum_rows or more is followed by VACUUM so later scenarios do not
+    scan its dead tuples.
+    """
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute('SELECT to_regclass(%s)', (table,))
+            if cur.fetchone()[0] is None:
+                return 0, None
+    sql = SCENARIO_DELETE_SQL.format(table=table)
+    deleted = 0
+    while True:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(sql, {'above': above_id, 'marker': marker_tag, 'limit': batch_size})
+                n, last_id = cur.fetchone()
+        deleted += n
+        if n < batch_size:
+            break
+        above_id = last_id
+    return deleted, vacuum(conn, table, analyze=False) if deleted and deleted >= vacuum_rows else None
+
+
+class TableStats:
+    def __init__(self, live, dead, deleted, vacuums, last_vacuum, total_bytes):
+        self.live = live
+        self.dead = dead
+        self.deleted = deleted
+        self.vacuums = vacuums
+        self.last_vacuum = last_vacuum
+        self.total_bytes = total_bytes
+
+    @property
+    def dead_ratio(self):
+        return self.dead / (self.live + self.dead) if self.live + self.dead else 0.0
+
+    def as_dict(self):
+        return {'live': self.live, 'dead': self.dead, 'dead_ratio': round(self.dead_ratio, 4),
+                'vacuums': self.vacuums, 'total_mb': round(self.total_bytes / 2 ** 20, 1)}
+
+
+def table_stats(cur, table=CLEANUP_TABLE):
+    """Live/dead tuple counts and on-disk size from pg_stat_user_tables, summed over partitions.
+
+    The statistics are cumulative counters flushed by each backend shortly
+    after its transactions end, so they can lag writes by about a second.
+    """
+    cur.execute('SELECT pg_stat_clear_snapshot()')
+    cur.execute(STATS_SQL, {'table': table})
+    return TableStats(*cur.fetchone())
+
+
+def vacuum(conn, table=CLEANUP_TABLE, analyze=True):
+    """VACUUM (ANALYZE) the table; VACUUM cannot run inside a transaction block. Returns seconds taken."""
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            start = time.perf_counter()
+            cur.execute(f"VACUUM {'(ANALYZE) ' if analyze else ''}{table}")
+            return time.perf_counter() - start
+    finally:
+        conn.autocommit = False
+
+
+class CleanupReport:
+    def __init__(self, deleted, batches, delete_seconds, vacuum_seconds, before, after):
+        self.deleted = deleted
+        self.batches = batches
+        self.delete_seconds = delete_seconds
+        self.vacuum_seconds = vacuum_seconds
+        self.before = before
+        self.after = after
+
+    def summary(self):
+        return {'deleted': self.deleted, 'batches': self.batches, 'delete_seconds': round(self.delete_seconds, 3),
+                'vacuum_seconds': None if self.vacuum_seconds is None else round(self.vacuum_seconds, 3),
+                'before': self.before.as_dict(), 'after': self.after.as_dict()}
+
+
+def delete_marker_batched(conn, marker_tag, table=CLEANUP_TABLE, batch_size=DELETE_BATCH):
+    """Delete a run's rows in short transactions of at most batch_size rows; returns (rows, batches)."""
+    deleted = batches = 0
+    sql = DELETE_SQL.format(table=table)
+    while True:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(sql, {'marker': marker_tag, 'limit': batch_size})
+                n = cur.rowcount
+        deleted += n
+        batches += 1
+        if n < batch_size:
+            return deleted, batches
+
+
+def cleanup_run(conn, marker_tag, table=CLEANUP_TABLE, batch_size=DELETE_BATCH, run_vacuum=True):
+    """Remove every row tagged marker_tag and reclaim the dead tuples it leaves behind.
+
+    Uses the marker_tag index and batched short transactions, so no single
+    long-running DELETE holds locks or pins an old snapshot, then VACUUMs
+    so later scenarios do not scan the dead tuples. Returns a CleanupReport
+    with pg_stat_user_tables figures from before and after.
+    """
+    ensure_marker_index(conn, table)
+    with conn:
+        with conn.cursor() as cur:
+            before = table_stats(cur, table)
+    start = time.perf_counter()
+    deleted, batches = delete_marker_batched(conn, marker_tag, table, batch_size)
+    delete_seconds = time.perf_counter() - start
+    vacuum_seconds = vacuum(conn, table) if run_vacuum and deleted else None
+    with conn:
+        with conn.cursor() as cur:
+            after = table_stats(cur, table)
+    return CleanupReport(deleted, batches, delete_seconds, vacuum_seconds, before, after)
@@ -0,0 +1,175 @@
+import io
+import struct
+import uuid
+from functools import lru_cache
+
+import numpy as np
+
+from qakit.generator import COLUMNS
+
+COPY_TABLE = 'sample_data.transactions'
+FORMATS = ('csv', 'binary')
+# Rows encoded per chunk handed to COPY; bounds client memory independently of num_rows/batch_size
+CHUNK_ROWS = 8192
+
+
+def copy_sql(fmt='csv', table=COPY_TABLE, columns=COLUMNS):
+    if fmt not in FORMATS:
+        raise ValueError(f'Unsupported COPY format: {fmt!r} (expected one of {FORMATS})')
+    return f"COPY {table}({', '.join(columns)}) FROM STDIN WITH (FORMAT {fmt})"
+
+
+class IterStream(io.RawIOBase):
+    """Read-only file object that pulls bytes lazily from an iterator of chunks.
+
+    Lets cursor.copy_expert() consume a generator directly: only the chunk
+    currently being read is held in memory.
+    """
+
+    def __init__(self, chunks):
+        super().__init__()
+        self._chunks = iter(chunks)
+        self._buf = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def _fill(self):
+        while not self._buf:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return False
+            self._buf = memoryview(chunk)
+        return True
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            if not self._fill():
+                return b''
+            out = b''.join([bytes(self._buf)] + list(self._chunks))
+            self._buf, self._chunks = memoryview(b''), iter(())
+            return out
+        if not self._fill():
+            return b''
+        out, self._buf = self._buf[:size], self._buf[size:]
+        return bytes(out)
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+
+# --- CSV encoding ---
+
+def _csv_field(value):
+    # None -> unquoted empty (NULL); quote anything COPY csv would misread, including ''
+    if value is None:
+        return ''
+    if value == '' or any(c in value for c in ',"\n\r'):
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def encode_csv(blk):
+    marker = '' if blk.marker_tag is None else str(blk.marker_tag)
+    amounts = [f'{c / 100:.2f}' for c in blk.amount_cents.tolist()]
+    dates = np.datetime_as_string(blk.transaction_date, unit='us').tolist()
+    lines = [
+        f'{uid},{pid},{amount},{_csv_field(cur)},{ts},{_csv_field(status)},{_csv_field(remarks)},{marker}\n'
+        for uid, pid, amount, cur, ts, status, remarks in zip(
+            blk.user_id.tolist(), blk.product_id.tolist(), amounts, blk.currency.tolist(),
+            dates, blk.status.tolist(), blk.remarks.tolist())
+    ]
+    return ''.join(lines).encode('utf-8')
+
+
+# --- PostgreSQL binary COPY encoding ---
+
+BINARY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('>ii', 0, 0)
+BINARY_TRAILER = struct.pack('>h', -1)
+PG_EPOCH = np.datetime64('2000-01-01T00:00:00', 'us')
+_NULL = struct.pack('>i', -1)
+_int8_field = struct.Struct('>iq').pack
+_fixed_head = struct.Struct('>hiqiq').pack  # field count, user_id, product_id
+
+
+@lru_cache(maxsize=None)
+def encode_numeric_cents(cents):
+    """Binary NUMERIC(12,2) field (length prefix included) for an amount given in cents."""
+    sign = 0x4000 if cents < 0 else 0x0000
+    int_part, frac = divmod(abs(cents), 100)
+    digits = []
+    while int_part:
+        int_part, d = divmod(int_part, 10000)
+        digits.insert(0, d)
+    weight = len(digits) - 1
+    digits.append(frac * 100)
+    while digits and digits[-1] == 0:
+        digits.pop()
+    if not digits:
+        sign, weight = 0, 0
+    body = struct.pack(f'>hhhh{len(digits)}h', len(digits), weight, sign, 2, *digits)
+    return struct.pack('>i', len(body)) + body
+
+
+def _text_field(value):
+    if value is None:
+        return _NULL
+    data = value.encode('utf-8')
+    return struct.pack('>i', len(data)) + data
+
+
+# currency/status come from tiny vocabularies, so their encodings are worth caching
+_short_text_field = lru_cache(maxsize=1024)(_text_field)
+
+
+def encode_binary(blk):
+    marker = _NULL if blk.marker_tag is None else struct.pack('>i', 16) + uuid.UUID(str(blk.marker_tag)).bytes
+    micros = (blk.transaction_date - PG_EPOCH).astype(np.int64).tolist()
+    parts = []
+    for uid, pid, cents, cur, ts, status, remarks in zip(
+            blk.user_id.tolist(), blk.product_id.tolist(), blk.amount_cents.tolist(), blk.currency.tolist(),
+            micros, blk.status.tolist(), blk.remarks.tolist()):
+        parts.append(b''.join((
+            _fixed_head(len(COLUMNS), 8, uid, 8, pid), encode_numeric_cents(cents), _short_text_field(cur),
+            _int8_field(8, ts), _short_text_field(status), _text_field(remarks), marker)))
+    return b''.join(parts)
+
+
+ENCODERS = {'csv': encode_csv, 'binary': encode_binary}
+
+
+def iter_copy_chunks(blocks, fmt='csv', stats=None, chunk_rows=CHUNK_ROWS):
+    """Encode RowBlocks into COPY payload chunks of at most chunk_rows rows.
+
+    `stats` (a dict) receives the running 'rows' and 'bytes' totals, so the
+    caller always knows exactly how many rows were handed to COPY.
+    """
+    encode = ENCODERS[fmt]
+    if stats is None:
+        stats = {}
+    stats.setdefault('rows', 0)
+    stats.setdefault('bytes', 0)
+    if fmt == 'binary':
+        stats['bytes'] += len(BINARY_HEADER)
+        yield BINARY_HEADER
+    for blk in blocks:
+        for start in range(0, len(blk), chunk_rows):
+            part = blk if len(blk) <= chunk_rows else blk.slice(start, start + chunk_rows)
+            chunk = encode(part)
+            stats['rows'] += len(part)
+            stats['bytes'] += len(chunk)
+            yield chunk
+    if fmt == 'binary':
+        stats['bytes'] += len(BINARY_TRAILER)
+        yield BINARY_TRAILER
+
+
+def copy_blocks(cur, blocks, fmt='csv', table=COPY_TABLE, chunk_rows=CHUNK_ROWS):
+    """Stream RowBlocks into `table` with a single COPY and return the number of rows loaded."""
+    stats = {}
+    cur.copy_expert(copy_sql(fmt, table), IterStream(iter_copy_chunks(blocks, fmt, stats, chunk_rows)))
+    if cur.rowcount >= 0 and cur.rowcount != stats['rows']:
+        raise RuntimeError(f"COPY reported {cur.rowcount} rows but {stats['rows']} were generated")
+    return stats['rows']
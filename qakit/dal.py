@@ -0,0 +1,132 @@
+import re
+import threading
+import weakref
+
+import psycopg2
+import psycopg2.extras
+
+TRANSACTIONS_TABLE = 'sample_data.transactions'
+# Column order of every row tuple passed to TransactionWriter
+TRANSACTION_COLUMNS = ('user_id', 'product_id', 'amount', 'currency', 'transaction_date', 'status', 'remarks',
+                       'marker_tag')
+PARAM_TYPES = 'bigint, bigint, numeric, text, timestamp, text, text, uuid'
+PAGE_SIZE = 1000
+SAVEPOINT = 'qa_dal_batch'
+RETURNING = ' RETURNING transaction_id'
+
+# Prepared statements live as long as the server session; track which ones each connection has
+_prepared = weakref.WeakKeyDictionary()
+_prepared_lock = threading.Lock()
+
+
+def prepare(cur, name, types, statement):
+    """PREPARE `statement` as `name` on cur's connection unless it already is; returns the EXECUTE prefix."""
+    conn = cur.connection
+    with _prepared_lock:
+        names = _prepared.setdefault(conn, set())
+        known = name in names
+    if not known:
+        cur.execute(f'PREPARE {name} ({types}) AS {statement}')
+        with _prepared_lock:
+            names.add(name)
+    return f'EXECUTE {name}'
+
+
+def forget_prepared(conn):
+    """Drop the bookkeeping for conn, e.g. after DISCARD ALL / DEALLOCATE ALL."""
+    with _prepared_lock:
+        _prepared.pop(conn, None)
+
+
+class RowError:
+    def __init__(self, index, row, error):
+        self.index = index
+        self.row = row
+        self.error = error
+
+    @property
+    def pgcode(self):
+        return getattr(self.error, 'pgcode', None)
+
+    def __repr__(self):
+        return f'RowError(index={self.index}, pgcode={self.pgcode}, error={str(self.error).strip()!r})'
+
+
+class BatchResult:
+    """Outcome of TransactionWriter.insert_rows(): ids of the rows written and a RowError per rejected row."""
+
+    def __init__(self):
+        self.ids = []
+        self.errors = []
+
+    @property
+    def failed_rows(self):
+        return [e.index for e in self.errors]
+
+    def summary(self):
+        return f'{len(self.ids)} rows inserted, {len(self.errors)} rejected {self.failed_rows}'
+
+
+class TransactionWriter:
+    """Writes to sample_data.transactions (or a table with the same columns).
+
+    Rows are tuples in TRANSACTION_COLUMNS order. insert() runs a statement
+    prepared once per connection (parse/plan paid on the first call only);
+    insert_many() sends page_size rows per round trip with execute_values.
+    insert_rows() is insert_many() for constraint tests: the batch runs
+    under a savepoint and, if the server rejects it, is split in halves
+    until each rejected row is isolated, so every valid row is kept and
+    each bad one is reported with its index and error. Nothing here
+    commits; the caller's transaction does.
+    """
+
+    def __init__(self, cur, table=TRANSACTIONS_TABLE, page_size=PAGE_SIZE):
+        self.cur = cur
+        self.table = table
+        self.page_size = page_size
+        cols = ', '.join(TRANSACTION_COLUMNS)
+        self.values_sql = f'INSERT INTO {table} ({cols}) VALUES %s'
+        params = ', '.join(f'${i}' for i in range(1, len(TRANSACTION_COLUMNS) + 1))
+        self._statement = f'INSERT INTO {table} ({cols}) VALUES ({params})' + RETURNING
+        self._statement_name = 'qa_insert_' + re.sub(r'\W', '_', table)
+
+    def insert(self, row):
+        """Insert one row with the prepared statement; returns its transaction_id."""
+        execute = prepare(self.cur, self._statement_name, PARAM_TYPES, self._statement)
+        self.cur.execute(f"{execute} ({', '.join(['%s'] * len(TRANSACTION_COLUMNS))})", tuple(row))
+        return self.cur.fetchone()[0]
+
+    def insert_many(self, rows, returning=False):
+        """Insert rows in multi-row VALUES pages; returns the new ids when `returning` (else None)."""
+        rows = [tuple(r) for r in rows]
+        if not rows:
+            return [] if returning else None
+        sql = self.values_sql + (RETURNING if returning else '')
+        out = psycopg2.extras.execute_values(self.cur, sql, rows, page_size=self.page_size, fetch=returning)
+        return [r[0] for r in out] if returning else None
+
+    def insert_rows(self, rows):
+        """Insert rows, keeping every valid one; returns a BatchResult naming each rejected row."""
+        rows = [tuple(r) for r in rows]
+        result = BatchResult()
+        for start in range(0, len(rows), self.page_size):
+            self._insert_or_split(rows[start:start + self.page_size], start, result)
+        return result
+
+    def _insert_or_split(self, rows, offset, result):
+        self.cur.execute(f'SAVEPOINT {SAVEPOINT}')
+        try:
+            ids = psycopg2.extras.execute_values(self.cur, self.values_sql + RETURNING, rows, page_size=len(rows),
+                                                 fetch=True)
+        except psycopg2.Error as e:
+            # ROLLBACK TO keeps the savepoint; release it so nested attempts don't pile up
+            self.cur.execute(f'ROLLBACK TO SAVEPOINT {SAVEPOINT}; RELEASE SAVEPOINT {SAVEPOINT}')
+            if len(rows) == 1:
+                result.errors.append(RowError(offset, rows[0], e))
+                return
+            mid = len(rows) // 2
+            self._insert_or_split(rows[:mid], offset, result)
+            self._insert_or_split(rows[mid:], offset + mid, result)
+            return
+        self.cur.execute(f'RELEASE SAVEPOINT {SAVEPOINT}')
+        result.ids.extend(r[0] for r in ids)
@@ -0,0 +1,200 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+
+from qakit import profiling
+from qakit.dal import forget_prepared
+
+
+# Helper: connection parameters from the standard PG* environment variables
+def conn_params():
+    return {
+        'host': os.environ.get('PGHOST', 'localhost'),
+        'port': int(os.environ.get('PGPORT', 5432)),
+        'dbname': os.environ.get('PGDATABASE', 'postgres'),
+        'user': os.environ.get('PGUSER', 'postgres'),
+        'password': os.environ.get('PGPASSWORD', ''),
+    }
+
+
+# Default schema for sample_data.transactions, shared by the steps and dataset snapshot builds
+TRANSACTIONS_DDL = '''CREATE SCHEMA IF NOT EXISTS sample_data;
+CREATE TABLE IF NOT EXISTS sample_data.transactions (
+  transaction_id BIGSERIAL PRIMARY KEY,
+  user_id BIGINT NOT NULL,
+  product_id BIGINT NOT NULL,
+  amount NUMERIC(12,2) NOT NULL,
+  currency CHAR(3) NOT NULL DEFAULT 'USD',
+  transaction_date TIMESTAMP NOT NULL DEFAULT NOW(),
+  status VARCHAR(20) NOT NULL DEFAULT 'pending',
+  remarks TEXT,
+  marker_tag UUID
+);'''
+
+
+def get_conn(**overrides):
+    params = conn_params()
+    params.update(overrides)
+    if profiling.ENABLED:
+        profiling.COUNTERS.add('connections')
+        params.setdefault('cursor_factory', profiling.CountingCursor)
+    return psycopg2.connect(**params)
+
+
+class PoolTimeout(psycopg2.pool.PoolError):
+    pass
+
+
+class ConnectionPool:
+    """Thread-safe pool of psycopg2 connections shared by the whole test session.
+
+    Connections are opened lazily up to `maxconn`; callers beyond that wait
+    for one to be returned. Returned connections have any open transaction
+    rolled back, and reset() restores every idle session to its defaults
+    between scenarios. `stats` counts connects, connect time, checkouts and
+    pool waits so the saving over one connection per step can be measured.
+    """
+
+    def __init__(self, maxconn=8, timeout=30.0, **overrides):
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.overrides = overrides
+        self._idle = []
+        self._busy = set()
+        self._opened = 0
+        self._cond = threading.Condition()
+        self.stats = {'connects': 0, 'connect_seconds': 0.0, 'checkouts': 0,
+                      'waits': 0, 'wait_seconds': 0.0, 'discarded': 0, 'resets': 0}
+
+    def _connect(self):
+        start = time.perf_counter()
+        conn = get_conn(**self.overrides)
+        with self._cond:
+            self.stats['connects'] += 1
+            self.stats['connect_seconds'] += time.perf_counter() - start
+        return conn
+
+    def getconn(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            waited = None
+            while not self._idle and self._opened >= self.maxconn:
+                waited = waited or time.perf_counter()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    raise PoolTimeout(f'no connection available within {timeout}s (maxconn={self.maxconn})')
+            if waited:
+                self.stats['waits'] += 1
+                self.stats['wait_seconds'] += time.perf_counter() - waited
+            self.stats['checkouts'] += 1
+            if self._idle:
+                conn = self._idle.pop()
+                self._busy.add(conn)
+                return conn
+            self._opened += 1
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._opened -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._busy.add(conn)
+        return conn
+
+    def putconn(self, conn):
+        with self._cond:
+            if conn not in self._busy:
+                # already reclaimed by reset()/closeall()
+                return
+        keep = not conn.closed
+        if keep:
+            try:
+                if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if conn.autocommit:
+                    conn.autocommit = False
+            except psycopg2.Error:
+                keep = False
+        with self._cond:
+            self._busy.discard(conn)
+            if keep:
+                self._idle.append(conn)
+            else:
+                self._opened -= 1
+                self.stats['discarded'] += 1
+            self._cond.notify()
+        if not keep and not conn.closed:
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def reset(self):
+        """Scenario boundary: drop leaked connections and reset idle sessions to defaults."""
+        with self._cond:
+            leaked, self._busy = list(self._busy), set()
+            idle = list(self._idle)
+        for conn in leaked:
+            conn.close()
+        with self._cond:
+            self._opened -= len(leaked)
+            self.stats['discarded'] += len(leaked)
+            self._cond.notify_all()
+        for conn in idle:
+            try:
+                # DISCARD ALL, which also deallocates the statements qakit.dal prepared on it
+                conn.reset()
+                forget_prepared(conn)
+                with self._cond:
+                    self.stats['resets'] += 1
+            except psycopg2.Error:
+                with self._cond:
+                    self._idle.remove(conn)
+                    self._opened -= 1
+                    self.stats['discarded'] += 1
+                conn.close()
+
+    def closeall(self):
+        with self._cond:
+            conns, self._idle, self._busy = self._idle + list(self._busy), [], set()
+            self._opened = 0
+        for conn in conns:
+            if not conn.closed:
+                conn.close()
+
+    def summary(self):
+        s = self.stats
+        return (f"db pool: {s['connects']} connects ({s['connect_seconds']:.3f}s), {s['checkouts']} checkouts, "
+                f"{s['waits']} waits ({s['wait_seconds']:.3f}s), {s['resets']} resets, {s['discarded']} discarded")
+
+
+@contextmanager
+def borrow(context):
+    """Borrow a connection from the session pool in context.db_pool.
+
+    Falls back to a dedicated connection when no pool was set up (e.g. a step
+    function called outside behave).
+    """
+    pool = getattr(context, 'db_pool', None)
+    if pool is None:
+        conn = get_conn()
+        try:
+            yield conn
+        finally:
+            conn.close()
+        return
+    with pool.connection() as conn:
+        yield conn
@@ -0,0 +1,153 @@
+import datetime
+import os
+import random
+from decimal import Decimal
+
+import numpy as np
+from faker import Faker
+
+fake = Faker()
+
+# Column order used by every loader (matches the COPY column list)
+COLUMNS = ('user_id', 'product_id', 'amount', 'currency', 'transaction_date', 'status', 'remarks', 'marker_tag')
+
+# Value distributions shared by gen_row() and BlockGenerator
+USER_ID_MAX = 10_000_000
+PRODUCT_ID_MAX = 1_000_000
+AMOUNT_MIN = 1.0
+AMOUNT_MAX = 500.0
+CURRENCIES = ('USD', 'EUR', 'GBP', 'USD', 'USD')
+STATUSES = ('completed', 'pending', 'failed')
+REMARKS_NULL_RATE = 0.2
+REMARKS_WORDS = 10
+# Faker's '-2y' is 2 * 365.24 days
+DATE_SPAN = datetime.timedelta(days=2 * 365.24)
+
+
+# Helper: optional fixed seed (QA_DATA_SEED) so synthetic datasets are reproducible between runs
+def seed_from_env():
+    seed = os.environ.get('QA_DATA_SEED')
+    return int(seed) if seed else None
+
+
+# Helper: the fixed `now` synthetic dates count back from, so a seeded dataset is reproducible.
+# QA_DATA_NOW (ISO timestamp) pins it; otherwise a seeded run anchors to the start of the current UTC
+# month, keeping the data recent enough for the date-window scenarios. None means unseeded: use the clock.
+def data_now(seed=None):
+    value = os.environ.get('QA_DATA_NOW')
+    if value:
+        return datetime.datetime.fromisoformat(value)
+    if seed is None:
+        return None
+    today = datetime.datetime.utcnow()
+    return datetime.datetime(today.year, today.month, 1)
+
+
+# Helper: generate a single synthetic transaction row (dictionary)
+def gen_row(marker_tag=None):
+    return {
+        'user_id': random.randint(1, USER_ID_MAX),
+        'product_id': random.randint(1, PRODUCT_ID_MAX),
+        'amount': Decimal(str(round(random.uniform(AMOUNT_MIN, AMOUNT_MAX), 2))),
+        'currency': random.choice(CURRENCIES),
+        'transaction_date': fake.date_time_between(start_date='-2y', end_date='now'),
+        'status': random.choice(STATUSES),
+        'remarks': None if random.random() < REMARKS_NULL_RATE else fake.sentence(nb_words=REMARKS_WORDS),
+        'marker_tag': marker_tag,
+    }
+
+
+class RowBlock:
+    """A block of synthetic rows stored column by column."""
+
+    def __init__(self, user_id, product_id, amount_cents, currency, transaction_date, status, remarks, marker_tag):
+        self.user_id = user_id                    # int64
+        self.product_id = product_id              # int64
+        self.amount_cents = amount_cents          # int64, NUMERIC(12,2) scaled by 100
+        self.currency = currency                  # object (str)
+        self.transaction_date = transaction_date  # datetime64[us]
+        self.status = status                      # object (str)
+        self.remarks = remarks                    # object (str or None)
+        self.marker_tag = marker_tag
+
+    def __len__(self):
+        return len(self.user_id)
+
+    def slice(self, start, stop):
+        return RowBlock(self.user_id[start:stop], self.product_id[start:stop], self.amount_cents[start:stop],
+                        self.currency[start:stop], self.transaction_date[start:stop], self.status[start:stop],
+                        self.remarks[start:stop], self.marker_tag)
+
+    def take(self, indices):
+        """New block holding the rows at `indices` (an integer or boolean index array)."""
+        return RowBlock(self.user_id[indices], self.product_id[indices], self.amount_cents[indices],
+                        self.currency[indices], self.transaction_date[indices], self.status[indices],
+                        self.remarks[indices], self.marker_tag)
+
+    def amounts(self):
+        return [Decimal(c).scaleb(-2) for c in self.amount_cents.tolist()]
+
+    def rows(self):
+        """Yield rows as tuples in COLUMNS order, with the same Python types as gen_row()."""
+        marker = self.marker_tag
+        for uid, pid, amount, cur, ts, status, remarks in zip(
+                self.user_id.tolist(), self.product_id.tolist(), self.amounts(), self.currency.tolist(),
+                self.transaction_date.astype(object).tolist(), self.status.tolist(), self.remarks.tolist()):
+            yield (uid, pid, amount, cur, ts, status, remarks, marker)
+
+
+class BlockGenerator:
+    """Columnar, seedable replacement for calling gen_row() once per row.
+
+    Draws whole blocks of values with NumPy using the same distributions as
+    gen_row(). Remarks are picked from a pool of Faker sentences built once up
+    front. The same seed and `now` always give the same rows; `now`
+    defaults to data_now(seed), the wall clock only when unseeded.
+    """
+
+    def __init__(self, seed=None, block_size=100_000, marker_tag=None, now=None, remarks_pool_size=4096):
+        if block_size <= 0:
+            raise ValueError('block_size must be positive')
+        self.seed = seed
+        self.block_size = block_size
+        self.marker_tag = marker_tag
+        self.now = now or data_now(seed) or datetime.datetime.now()
+        self.rng = np.random.default_rng(seed)
+        self._currencies = np.array(CURRENCIES, dtype=object)
+        self._statuses = np.array(STATUSES, dtype=object)
+        self._remarks_pool = np.array(self._build_remarks_pool(remarks_pool_size) + [None], dtype=object)
+        self._end = np.datetime64(self.now, 'us')
+        self._span_us = int(DATE_SPAN / datetime.timedelta(microseconds=1))
+
+    def _build_remarks_pool(self, size):
+        faker = Faker()
+        faker.seed_instance(self.seed)
+        return [faker.sentence(nb_words=REMARKS_WORDS) for _ in range(size)]
+
+    def block(self, n):
+        rng = self.rng
+        pool_size = len(self._remarks_pool) - 1
+        remarks_idx = rng.integers(0, pool_size, n)
+        remarks_idx[rng.random(n) < REMARKS_NULL_RATE] = pool_size
+        return RowBlock(
+            user_id=rng.integers(1, USER_ID_MAX, n, endpoint=True, dtype=np.int64),
+            product_id=rng.integers(1, PRODUCT_ID_MAX, n, endpoint=True, dtype=np.int64),
+            amount_cents=np.rint(rng.uniform(AMOUNT_MIN, AMOUNT_MAX, n) * 100).astype(np.int64),
+            currency=self._currencies[rng.integers(0, len(CURRENCIES), n)],
+            transaction_date=self._end - rng.integers(0, self._span_us, n, endpoint=True).astype('timedelta64[us]'),
+            status=self._statuses[rng.integers(0, len(STATUSES), n)],
+            remarks=self._remarks_pool[remarks_idx],
+            marker_tag=self.marker_tag,
+        )
+
+    def blocks(self, num_rows):
+        """Yield RowBlocks totalling exactly num_rows rows."""
+        remaining = num_rows
+        while remaining > 0:
+            n = min(self.block_size, remaining)
+            yield self.block(n)
+            remaining -= n
+
+    def rows(self, num_rows):
+        for blk in self.blocks(num_rows):
+            yield from blk.rows()
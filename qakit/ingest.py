@@ -0,0 +1,206 @@
+import queue
+import threading
+import time
+
+from qakit.copyload import COPY_TABLE, copy_blocks
+from qakit.generator import BlockGenerator
+
+CHUNK_ROWS = 5_000
+QUEUE_CHUNKS = 16
+BUSY_WAITERS = 4
+
+LOAD_SQL = '''SELECT count(*) FILTER (WHERE state = 'active'),
+       count(*) FILTER (WHERE state = 'active' AND wait_event_type IN ('Lock', 'LWLock', 'IO', 'BufferPin'))
+FROM pg_stat_activity
+WHERE datname = current_database() AND pid <> pg_backend_pid() AND backend_type = 'client backend' '''
+
+_DONE = object()
+
+
+class TokenBucket:
+    """Token bucket allowing `rate` rows/sec on average with bursts up to `burst` rows."""
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self.rate = rate
+        self.capacity = burst or rate
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+
+    def acquire(self, n):
+        """Take n tokens, sleeping until the bucket has paid for them; returns the seconds slept."""
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= n
+        if self.tokens >= 0:
+            return 0.0
+        wait = -self.tokens / self.rate
+        self.sleep(wait)
+        return wait
+
+
+class AimdBatchSizer:
+    """Additive-increase / multiplicative-decrease batch size driven by COPY latency and server load."""
+
+    def __init__(self, initial=10_000, minimum=1_000, maximum=100_000, target_seconds=1.0, step=None):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.size = max(minimum, min(initial, maximum))
+        self.target_seconds = target_seconds
+        self.step = step or minimum
+
+    def observe(self, seconds, busy=False):
+        if busy or seconds > self.target_seconds:
+            self.size = max(self.minimum, self.size // 2)
+        else:
+            self.size = min(self.maximum, self.size + self.step)
+        return self.size
+
+
+def server_load(cur):
+    """(active, waiting) client backends of this database besides our own, from pg_stat_activity."""
+    cur.execute(LOAD_SQL)
+    return cur.fetchone()
+
+
+class IngestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.rows = 0
+        self.batches = []  # (rows, copy seconds, next batch size, queue depth)
+        self.throttle_seconds = 0.0
+        self.producer_blocked_seconds = 0.0
+        self.max_queue_depth = 0
+        self.alerts = {}
+
+    def alert(self, kind, message):
+        entry = self.alerts.setdefault(kind, {'count': 0, 'first': message,
+                                              'at': round(time.perf_counter() - self.started, 3)})
+        entry['count'] += 1
+
+    @property
+    def seconds(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def snapshot(self):
+        last = self.batches[-1] if self.batches else (0, 0.0, 0, 0)
+        return {'rows': self.rows, 'rows_per_sec': round(self.rows_per_sec, 1), 'batch_size': last[2],
+                'queue_depth': last[3], 'last_copy_seconds': round(last[1], 3)}
+
+    def summary(self):
+        copy_seconds = sorted(b[1] for b in self.batches)
+        return dict(self.snapshot(), batches=len(self.batches), seconds=round(self.seconds, 3),
+                    max_queue_depth=self.max_queue_depth, throttle_seconds=round(self.throttle_seconds, 3),
+                    producer_blocked_seconds=round(self.producer_blocked_seconds, 3),
+                    max_copy_seconds=round(copy_seconds[-1], 3) if copy_seconds else 0.0, alerts=self.alerts)
+
+
+def _put(q, item, stop):
+    """Blocking put that gives up when `stop` is set; returns the seconds spent waiting for space."""
+    start = time.perf_counter()
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            break
+        except queue.Full:
+            pass
+    return time.perf_counter() - start
+
+
+def _produce(generator, total_rows, q, stop, metrics, errors):
+    try:
+        for blk in generator.blocks(total_rows):
+            blocked = _put(q, blk, stop)
+            if blocked > 0.001:
+                metrics.producer_blocked_seconds += blocked
+                metrics.alert('backpressure', f'generator waited {blocked:.3f}s for the loader (queue full)')
+            if stop.is_set():
+                return
+    except BaseException as e:
+        errors.append(e)
+    finally:
+        _put(q, _DONE, stop)
+
+
+def ingest(conn, total_rows, marker_tag, rate=None, burst=None, sizer=None, fmt='binary', seed=None,
+           table=COPY_TABLE, chunk_rows=CHUNK_ROWS, queue_chunks=QUEUE_CHUNKS, busy_waiters=BUSY_WAITERS,
+           on_metrics=None):
+    """Load total_rows synthetic rows through a rate-limited, self-tuning COPY loop.
+
+    A generator thread fills a bounded queue with chunk_rows-row blocks, so
+    when loading falls behind generation blocks instead of buffering. The
+    loader takes sizer.size rows per batch, waits on the token bucket
+    (`rate` rows/sec, None for unlimited) and COPYs them in their own
+    transaction. After each batch the AIMD sizer grows the batch while COPY
+    stays under its target latency and halves it when a COPY is slow or
+    pg_stat_activity shows `busy_waiters` or more other backends waiting on
+    locks or I/O. on_metrics(snapshot) is called after every batch. Returns
+    the IngestMetrics; `alerts` records throttling, backpressure, slow
+    batches and server load.
+    """
+    sizer = sizer or AimdBatchSizer()
+    bucket = TokenBucket(rate, burst) if rate else None
+    metrics = IngestMetrics()
+    q = queue.Queue(maxsize=queue_chunks)
+    stop = threading.Event()
+    errors = []
+    generator = BlockGenerator(seed=seed, block_size=chunk_rows, marker_tag=marker_tag)
+    producer = threading.Thread(target=_produce, args=(generator, total_rows, q, stop, metrics, errors),
+                                name='ingest-producer', daemon=True)
+    producer.start()
+    carry = None
+    finished = False
+    try:
+        while not finished:
+            batch, size = [], 0
+            while size < sizer.size:
+                blk, carry = (carry, None) if carry is not None else (q.get(), None)
+                if blk is _DONE:
+                    finished = True
+                    break
+                take = min(len(blk), sizer.size - size)
+                if take < len(blk):
+                    blk, carry = blk.slice(0, take), blk.slice(take, len(blk))
+                batch.append(blk)
+                size += take
+            metrics.max_queue_depth = max(metrics.max_queue_depth, q.qsize())
+            if not batch:
+                break
+            if bucket:
+                waited = bucket.acquire(size)
+                if waited:
+                    metrics.throttle_seconds += waited
+                    metrics.alert('rate_limited', f'demand exceeds {rate:,.0f} rows/s; held a batch for {waited:.3f}s')
+            start = time.perf_counter()
+            with conn:
+                with conn.cursor() as cur:
+                    loaded = copy_blocks(cur, batch, fmt=fmt, table=table)
+            elapsed = time.perf_counter() - start
+            busy = False
+            if busy_waiters:
+                with conn:
+                    with conn.cursor() as cur:
+                        active, waiting = server_load(cur)
+                busy = waiting >= busy_waiters
+                if busy:
+                    metrics.alert('server_busy', f'{waiting} of {active} active backends waiting on locks/IO')
+            if elapsed > sizer.target_seconds:
+                metrics.alert('slow_batch', f'COPY of {loaded} rows took {elapsed:.3f}s')
+            metrics.rows += loaded
+            metrics.batches.append((loaded, elapsed, sizer.observe(elapsed, busy), q.qsize()))
+            if on_metrics:
+                on_metrics(metrics.snapshot())
+    finally:
+        stop.set()
+        producer.join()
+    if errors:
+        raise errors[0]
+    return metrics
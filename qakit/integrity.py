@@ -0,0 +1,162 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+INTEGRITY_TABLE = 'sample_data.transactions'
+ALLOWED_STATUSES = ('pending', 'completed', 'failed', 'refund')
+SAMPLE_IDS = 5
+
+
+class Rule:
+    """An integrity rule: `predicate` is a SQL boolean expression that is true for violating rows."""
+
+    def __init__(self, name, predicate, description=''):
+        self.name = name
+        self.predicate = predicate
+        self.description = description
+
+    def __repr__(self):
+        return f'Rule({self.name!r})'
+
+
+RULES = {}
+
+
+def register_rule(name, predicate, description=''):
+    """Add (or replace) a rule evaluated by every scan() that does not pass its own rule list."""
+    RULES[name] = Rule(name, predicate, description)
+    return RULES[name]
+
+
+register_rule('invalid_currency',
+              "length(trim(currency)) != 3 OR currency IS NULL OR currency ~ '[^A-Za-z0-9]'",
+              'currency is not a three-character alphanumeric code')
+register_rule('negative_amount', 'amount < 0', 'amount below zero (refunds)')
+register_rule('extreme_date_in_recent_window',
+              "transaction_date BETWEEN NOW() - INTERVAL '30 days' AND NOW() AND remarks = 'date-extreme'",
+              'an extreme-date test row falls inside the last 30 days')
+register_rule('unknown_status',
+              'status IS NULL OR status NOT IN (' + ', '.join(f"'{s}'" for s in ALLOWED_STATUSES) + ')',
+              'status outside the allowed business states')
+
+
+def scan_sql(rules, table=INTEGRITY_TABLE, ranged=False):
+    """One aggregate query computing a violation count and lowest and highest offending id per rule."""
+    cols = ['COUNT(*)']
+    for rule in rules:
+        cols.append(f'COUNT(*) FILTER (WHERE {rule.predicate})')
+        cols.append(f'MIN(transaction_id) FILTER (WHERE {rule.predicate})')
+        cols.append(f'MAX(transaction_id) FILTER (WHERE {rule.predicate})')
+    where = ' WHERE transaction_id BETWEEN %s AND %s' if ranged else ''
+    return f"SELECT {', '.join(cols)} FROM {table}{where}"
+
+
+def id_ranges(lo, hi, parts):
+    """Split [lo, hi] into at most `parts` contiguous, non-overlapping inclusive ranges."""
+    if lo is None:
+        return []
+    parts = max(1, min(parts, hi - lo + 1))
+    step = (hi - lo + 1) // parts
+    bounds = [lo + i * step for i in range(parts)] + [hi + 1]
+    return [(bounds[i], bounds[i + 1] - 1) for i in range(parts)]
+
+
+class RuleResult:
+    def __init__(self, rule, violations, first_id, last_id, sample_ids):
+        self.rule = rule
+        self.violations = violations
+        self.first_id = first_id
+        self.last_id = last_id
+        self.sample_ids = sample_ids
+
+    def as_dict(self):
+        return {'rule': self.rule.name, 'violations': self.violations, 'sample_ids': self.sample_ids}
+
+
+class IntegrityReport:
+    def __init__(self, rows, results, ranges, seconds):
+        self.rows = rows
+        self.results = results
+        self.ranges = ranges
+        self.seconds = seconds
+
+    def __getitem__(self, name):
+        return self.results[name]
+
+    def violations(self, name):
+        return self.results[name].violations
+
+    def failing(self):
+        return [r for r in self.results.values() if r.violations]
+
+    def summary(self):
+        return {'rows': self.rows, 'ranges': self.ranges, 'seconds': round(self.seconds, 3),
+                'rules': [r.as_dict() for r in self.results.values()]}
+
+
+def merge_partials(rules, partials):
+    """Combine per-range aggregate rows (as returned by scan_sql) into totals and lowest/highest ids."""
+    rows = sum(p[0] for p in partials)
+    merged = {}
+    for i, rule in enumerate(rules):
+        counts = [p[1 + 3 * i] for p in partials]
+        firsts = [p[2 + 3 * i] for p in partials if p[2 + 3 * i] is not None]
+        lasts = [p[3 + 3 * i] for p in partials if p[3 + 3 * i] is not None]
+        merged[rule.name] = (sum(counts), min(firsts) if firsts else None, max(lasts) if lasts else None)
+    return rows, merged
+
+
+def _scan_range(pool, sql, bounds):
+    with pool.connection() as conn:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(sql, bounds)
+                return cur.fetchone()
+
+
+def scan(pool, rules=None, workers=1, samples=SAMPLE_IDS, table=INTEGRITY_TABLE):
+    """Evaluate every rule in one pass over the table and report violations per rule.
+
+    All rules share a single sequential scan via COUNT(*) FILTER aggregates.
+    With workers > 1 the transaction_id span is split into ranges scanned
+    concurrently on separate pool connections (each range uses the primary
+    key index to bound its scan). The pass also finds each rule's lowest
+    and highest offending id: with one or two violations those are the
+    samples, otherwise a follow-up reads at most `samples` ids between them.
+    Parallel ranges run in separate transactions, so rows committed during
+    the scan may or may not be counted.
+    `pool` is anything with a connection() context manager, e.g. ConnectionPool.
+    """
+    start = time.perf_counter()
+    rules = list(rules if rules is not None else RULES.values())
+    if workers > 1:
+        with pool.connection() as conn:
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute(f'SELECT MIN(transaction_id), MAX(transaction_id) FROM {table}')
+                    lo, hi = cur.fetchone()
+        ranges = id_ranges(lo, hi, workers)
+        sql = scan_sql(rules, table, ranged=True)
+        with ThreadPoolExecutor(max_workers=len(ranges) or 1) as executor:
+            partials = list(executor.map(lambda b: _scan_range(pool, sql, b), ranges))
+    else:
+        ranges = [None]
+        partials = [_scan_range(pool, scan_sql(rules, table), None)]
+    rows, merged = merge_partials(rules, partials)
+
+    results = {}
+    with pool.connection() as conn:
+        with conn:
+            with conn.cursor() as cur:
+                for rule in rules:
+                    count, first, last = merged[rule.name]
+                    ids = []
+                    if count and samples and count <= 2:
+                        ids = sorted({first, last})[:samples]
+                    elif count and samples:
+                        # bounded by the pass's own min/max, so a sparse rule does not walk to the end of the table
+                        cur.execute(f'SELECT transaction_id FROM {table} WHERE transaction_id BETWEEN %s AND %s '
+                                    f'AND ({rule.predicate}) ORDER BY transaction_id LIMIT %s',
+                                    (first, last, min(samples, count)))
+                        ids = [r[0] for r in cur.fetchall()]
+                    results[rule.name] = RuleResult(rule, count, first, last, ids)
+    return IntegrityReport(rows, results, len(ranges), time.perf_counter() - start)
@@ -0,0 +1,150 @@
+import base64
+import datetime
+import json
+import statistics
+import time
+
+KEYSET_TABLE = 'sample_data.transactions'
+KEYSET_INDEX = 'transactions_date_id_idx'
+KEY_COLUMNS = ('transaction_date', 'transaction_id')
+PAGE_SIZE = 10_000
+
+
+def index_ddl(table=KEYSET_TABLE, name=KEYSET_INDEX):
+    return f'CREATE INDEX IF NOT EXISTS {name} ON {table} (transaction_date, transaction_id)'
+
+
+def ensure_index(conn, table=KEYSET_TABLE):
+    """Create the (transaction_date, transaction_id) index keyset pages seek on."""
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute(index_ddl(table))
+
+
+def encode_token(key, descending=False):
+    """Opaque, URL-safe resume token for the last (transaction_date, transaction_id) seen."""
+    payload = {'d': key[0].isoformat(), 'id': key[1], 'desc': descending}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode('ascii')).decode('ascii')
+
+
+def decode_token(token):
+    """Returns ((transaction_date, transaction_id), descending) for a token from encode_token()."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        return (datetime.datetime.fromisoformat(payload['d']), int(payload['id'])), bool(payload['desc'])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f'invalid keyset token: {token!r}') from e
+
+
+def page_sql(columns, descending, first, table=KEYSET_TABLE):
+    """Seek query for one page; `columns` must end with the two key columns."""
+    order = 'DESC' if descending else 'ASC'
+    where = '' if first else f"WHERE (transaction_date, transaction_id) {'<' if descending else '>'} (%s, %s) "
+    return (f"SELECT {', '.join(columns)} FROM {table} {where}"
+            f'ORDER BY transaction_date {order}, transaction_id {order} LIMIT %s')
+
+
+class Page:
+    def __init__(self, rows, token, seconds):
+        self.rows = rows
+        self.token = token
+        self.seconds = seconds
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def iter_pages(cur, page_size=PAGE_SIZE, descending=False, columns=(), token=None, table=KEYSET_TABLE):
+    """Stream the table in (transaction_date, transaction_id) order, one Page per query.
+
+    Every page is an index seek past the previous page's last key rather
+    than an OFFSET, so page N costs the same as page 1. Rows are tuples of
+    `columns` followed by the two key columns. Page.token resumes the scan
+    after that page (pass it back as `token`, also across processes).
+    Pages run on the caller's cursor, so the caller picks the transaction
+    scope: one REPEATABLE READ transaction gives a consistent snapshot.
+    """
+    after = None
+    if token is not None:
+        after, token_desc = decode_token(token)
+        if token_desc != descending:
+            raise ValueError('keyset token was issued for the opposite sort direction')
+    columns = tuple(c for c in columns if c not in KEY_COLUMNS) + KEY_COLUMNS
+    while True:
+        start = time.perf_counter()
+        if after is None:
+            cur.execute(page_sql(columns, descending, True, table), (page_size,))
+        else:
+            cur.execute(page_sql(columns, descending, False, table), (after[0], after[1], page_size))
+        rows = cur.fetchall()
+        elapsed = time.perf_counter() - start
+        if not rows:
+            return
+        after = rows[-1][-2:]
+        yield Page(rows, encode_token(after, descending), elapsed)
+        if len(rows) < page_size:
+            return
+
+
+def iter_rows(cur, page_size=PAGE_SIZE, descending=False, columns=(), token=None, table=KEYSET_TABLE):
+    for page in iter_pages(cur, page_size, descending, columns, token, table):
+        yield from page.rows
+
+
+class VerifyReport:
+    def __init__(self, rows, expected, pages, problems, page_seconds):
+        self.rows = rows
+        self.expected = expected
+        self.pages = pages
+        self.problems = problems
+        self.page_seconds = page_seconds
+
+    @property
+    def ok(self):
+        return not self.problems
+
+    def latency_drift(self):
+        """Median latency of the last 10% of pages over the first 10%; ~1.0 means constant cost per page."""
+        if len(self.page_seconds) < 10:
+            return 1.0
+        tenth = len(self.page_seconds) // 10
+        head = statistics.median(self.page_seconds[:tenth])
+        tail = statistics.median(self.page_seconds[-tenth:])
+        return tail / head if head else 1.0
+
+    def summary(self):
+        return {'rows': self.rows, 'expected': self.expected, 'pages': self.pages, 'ok': self.ok,
+                'problems': self.problems[:10], 'latency_drift': round(self.latency_drift(), 3)}
+
+
+def verify(conn, page_size=PAGE_SIZE, descending=False, table=KEYSET_TABLE):
+    """Walk the whole table by keyset and prove no row was missed or repeated.
+
+    Runs in one REPEATABLE READ snapshot. Keys are unique, so if every key is
+    strictly past the one before it no row was returned twice; each row
+    comes from the table, so a row total equal to COUNT(*) in the same
+    snapshot then means none was skipped either.
+    """
+    problems = []
+    page_seconds = []
+    rows = pages = 0
+    previous = None
+    conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(f'SELECT COUNT(*) FROM {table}')
+                expected = cur.fetchone()[0]
+                for page in iter_pages(cur, page_size, descending, table=table):
+                    pages += 1
+                    page_seconds.append(page.seconds)
+                    for key in page.rows:
+                        if previous is not None and (key <= previous if not descending else key >= previous):
+                            problems.append(f'page {pages}: key {key} does not follow {previous}')
+                        previous = key
+                    rows += len(page)
+    finally:
+        conn.set_session(isolation_level='DEFAULT', readonly='DEFAULT')
+    if rows != expected:
+        problems.append(f'walked {rows} rows but the snapshot holds {expected}')
+    return VerifyReport(rows, expected, pages, problems, page_seconds)
@@ -0,0 +1,158 @@
+import datetime
+import hashlib
+import time
+
+from qakit.copyload import COPY_TABLE
+
+# Mixed 1-4 byte UTF-8 plus the characters COPY text format has to escape
+PATTERN = 'remarks é€𠜎 \t\\ \n'
+CHUNK_BYTES = 1 << 20
+# substring() window; on multi-byte text every window makes the server read the value up to its end
+WINDOW_CHARS = 4 << 20
+COLUMNS = ('user_id', 'product_id', 'amount', 'currency', 'transaction_date', 'status', 'marker_tag', 'remarks')
+
+
+def copy_escape(text):
+    """Escape a value for COPY ... (FORMAT text)."""
+    # chained replace() is several times faster than str.translate() on non-ASCII text
+    return text.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def _copy_field(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(sep=' ')
+    return copy_escape(str(value))
+
+
+def payload_chunks(size_bytes, chunk_bytes=CHUNK_BYTES, pattern=PATTERN):
+    """Yield str chunks of whole `pattern` repeats until at least size_bytes UTF-8 bytes were produced."""
+    unit = len(pattern.encode('utf-8'))
+    per_chunk = max(1, chunk_bytes // unit)
+    chunk = pattern * per_chunk
+    remaining = -(-size_bytes // unit)
+    while remaining > 0:
+        n = min(per_chunk, remaining)
+        yield chunk if n == per_chunk else pattern * n
+        remaining -= n
+
+
+class TextDigest:
+    """Running char count, UTF-8 byte count and sha256 of text seen chunk by chunk."""
+
+    def __init__(self):
+        self.chars = 0
+        self.octets = 0
+        self._sha = hashlib.sha256()
+
+    def update(self, text):
+        data = text.encode('utf-8')
+        self.chars += len(text)
+        self.octets += len(data)
+        self._sha.update(data)
+        return data
+
+    @property
+    def sha256(self):
+        return self._sha.hexdigest()
+
+    def as_tuple(self):
+        return self.chars, self.octets, self.sha256
+
+
+class RemarksCopyStream:
+    """File-like COPY source for a single row whose remarks arrive as an iterator of str chunks.
+
+    read() hands psycopg2 at most about one chunk at a time, so the client
+    never holds the whole payload (or an escaped copy of it).
+    """
+
+    def __init__(self, row, chunks):
+        self.digest = TextDigest()
+        prefix = '\t'.join(_copy_field(row.get(c)) for c in COLUMNS[:-1]) + '\t'
+        self._pieces = self._encode(prefix, chunks)
+        self._buffer = b''
+        self._pos = 0
+
+    def _encode(self, prefix, chunks):
+        yield prefix.encode('utf-8')
+        for chunk in chunks:
+            self.digest.update(chunk)
+            yield copy_escape(chunk).encode('utf-8')
+        yield b'\n'
+
+    def read(self, size=-1):
+        # short reads are fine: copy_expert keeps reading until it gets b''
+        if self._pos >= len(self._buffer):
+            self._buffer, self._pos = next(self._pieces, b''), 0
+        end = len(self._buffer) if size < 0 else self._pos + size
+        data = self._buffer[self._pos:end]
+        self._pos += len(data)
+        return data
+
+
+class TextResult:
+    def __init__(self, transaction_id, digest, seconds, windows=None):
+        self.transaction_id = transaction_id
+        self.chars, self.octets, self.sha256 = digest.as_tuple()
+        self.seconds = seconds
+        self.windows = windows
+
+    @property
+    def mb_per_sec(self):
+        return self.octets / 2 ** 20 / self.seconds if self.seconds else 0.0
+
+    def matches(self, other):
+        return (self.chars, self.octets, self.sha256) == (other.chars, other.octets, other.sha256)
+
+    def as_dict(self):
+        return {'transaction_id': self.transaction_id, 'chars': self.chars, 'octets': self.octets,
+                'sha256': self.sha256, 'seconds': round(self.seconds, 3), 'mb_per_sec': round(self.mb_per_sec, 1),
+                'windows': self.windows}
+
+
+def write_remarks(cur, row, chunks, table=COPY_TABLE):
+    """Insert one row with COPY, streaming its remarks from `chunks`; returns a TextResult with the new id.
+
+    `row` maps the other columns (user_id, product_id, amount, currency,
+    transaction_date, status, marker_tag) to values. Unlike a bound
+    parameter, the text never exists client-side in full, and the server
+    does not also receive it inside a query string.
+    """
+    start = time.perf_counter()
+    stream = RemarksCopyStream(row, chunks)
+    cur.copy_expert(f"COPY {table} ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT text)", stream, size=CHUNK_BYTES)
+    cur.execute("SELECT currval(pg_get_serial_sequence(%s, 'transaction_id'))", (table,))
+    transaction_id = cur.fetchone()[0]
+    return TextResult(transaction_id, stream.digest, time.perf_counter() - start)
+
+
+def iter_remarks(cur, transaction_id, window_chars=WINDOW_CHARS, table=COPY_TABLE):
+    """Yield a row's remarks as consecutive substring() windows of at most window_chars characters."""
+    cur.execute(f'SELECT char_length(remarks) FROM {table} WHERE transaction_id = %s', (transaction_id,))
+    row = cur.fetchone()
+    if row is None or row[0] is None:
+        return
+    for offset in range(0, row[0], window_chars):
+        cur.execute(f'SELECT substring(remarks FROM %s FOR %s) FROM {table} WHERE transaction_id = %s',
+                    (offset + 1, window_chars, transaction_id))
+        yield cur.fetchone()[0]
+
+
+def read_remarks(cur, transaction_id, window_chars=WINDOW_CHARS, table=COPY_TABLE):
+    """Read a row's remarks window by window, hashing as it goes; returns a TextResult (nothing is kept)."""
+    start = time.perf_counter()
+    digest = TextDigest()
+    windows = 0
+    for window in iter_remarks(cur, transaction_id, window_chars, table):
+        digest.update(window)
+        windows += 1
+    return TextResult(transaction_id, digest, time.perf_counter() - start, windows)
+
+
+def server_digest(cur, transaction_id, table=COPY_TABLE):
+    """(chars, octets, sha256 hex) of a row's remarks computed by the server, with no text transferred."""
+    cur.execute(f"SELECT char_length(remarks), octet_length(remarks), encode(sha256(convert_to(remarks, 'UTF8')), 'hex') "
+                f'FROM {table} WHERE transaction_id = %s', (transaction_id,))
+    return cur.fetchone()
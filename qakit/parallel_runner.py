@@ -0,0 +1,311 @@
+"""Run the behave suite across worker processes, each against its own database.
+
+Scenarios are sharded by location (file:line) across workers. Longest
+first by the durations recorded in the previous merged report, falling
+back to round-robin order for scenarios never run before. Every worker is
+a separate behave process whose PGDATABASE points at a private database
+(qa_worker_<n>), so scenarios that move sequences, truncate or bulk-delete
+cannot disturb each other; step_create_table creates the schema inside
+it. With QA_SNAPSHOT_ROWS set the worker databases are cloned from the
+dataset snapshot instead of starting empty. The per-worker JSON outputs
+are merged into one report.
+
+Workers share the working directory, so the files steps keep state in
+(SLA history, plan fingerprints, step profiles) are redirected to
+reports/parallel/worker_<n>/, seeded from the shared copies, and merged
+back once every worker has finished.
+
+Usage: python -m qakit.parallel_runner [--workers N] [--keep-databases] [paths ...] [-- behave args]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from behave.parser import parse_file
+
+from qakit import planner, profiling, sla
+from qakit.generator import seed_from_env
+from qakit.snapshots import SnapshotCache, create_database, drop_database
+
+REPORT_DIR = os.environ.get('QA_PARALLEL_REPORT_DIR', os.path.join('reports', 'parallel'))
+WORKER_DB = 'qa_worker_{}'
+# Worst outcome wins when a feature's scenarios ran on different workers
+STATUS_ORDER = ('untested', 'skipped', 'passed', 'undefined', 'error', 'hook_error', 'failed')
+
+
+def discover(paths=('features',)):
+    """Scenario locations ('features/x.feature:12') under paths, in file order; outline rows are listed one by one."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in sorted(os.walk(path)):
+                files.extend(os.path.join(root, n) for n in sorted(names) if n.endswith('.feature'))
+        else:
+            files.append(path)
+    locations = []
+    for path in files:
+        feature = parse_file(path)
+        if feature is not None:
+            locations.extend(str(s.location) for s in feature.walk_scenarios())
+    return locations
+
+
+def load_durations(report_path):
+    """{scenario location: seconds} from a merged report of an earlier run; {} if there is none."""
+    if not os.path.exists(report_path):
+        return {}
+    with open(report_path) as f:
+        features = json.load(f)
+    durations = {}
+    for feature in features:
+        for element in feature.get('elements', []):
+            if element.get('type') == 'scenario':
+                durations[element['location']] = sum(s.get('result', {}).get('duration', 0.0)
+                                                      for s in element.get('steps', []))
+    return durations
+
+
+def plan_shards(locations, workers, durations=None):
+    """Split locations into `workers` lists of roughly equal expected duration (longest-first greedy).
+
+    Scenarios without a recorded duration count as the median known
+    duration (1s if none is known). Each shard keeps file order.
+    """
+    if not locations:
+        return []
+    durations = durations or {}
+    known = sorted(durations[loc] for loc in locations if loc in durations)
+    default = known[len(known) // 2] if known else 1.0
+    order = {loc: i for i, loc in enumerate(locations)}
+    shards = [[] for _ in range(max(1, min(workers, len(locations))))]
+    loads = [0.0] * len(shards)
+    for loc in sorted(locations, key=lambda loc: (-durations.get(loc, default), order[loc])):
+        i = loads.index(min(loads))
+        shards[i].append(loc)
+        loads[i] += durations.get(loc, default)
+    return [sorted(shard, key=order.get) for shard in shards]
+
+
+def _scenario_groups(elements):
+    # background elements precede the scenario they ran for; keep each pair together
+    groups = []
+    for element in elements:
+        if groups and groups[-1][-1].get('type') == 'background':
+            groups[-1].append(element)
+        else:
+            groups.append([element])
+    return groups
+
+
+def merge_reports(reports):
+    """Merge per-worker behave JSON outputs into one list of features, one per feature file, in file order.
+
+    reports is [(locations, features)]: behave lists a feature's unselected
+    scenarios as skipped, so only each worker's own locations are kept.
+    """
+    merged = {}
+    for locations, features in reports:
+        selected = set(locations)
+        for feature in features:
+            groups = [g for g in _scenario_groups(feature.get('elements', [])) if g[-1]['location'] in selected]
+            if not groups:
+                continue
+            key = feature['location'].rsplit(':', 1)[0]
+            target = merged.setdefault(key, dict(feature, elements=[], status='untested'))
+            for group in groups:
+                target['elements'].extend(group)
+                target['status'] = worst(target['status'], group[-1].get('status', 'untested'))
+    for feature in merged.values():
+        groups = sorted(_scenario_groups(feature['elements']), key=lambda g: int(g[-1]['location'].rsplit(':', 1)[1]))
+        feature['elements'] = [e for g in groups for e in g]
+    return sorted(merged.values(), key=lambda f: f['location'])
+
+
+def worst(a, b):
+    rank = {s: i for i, s in enumerate(STATUS_ORDER)}
+    return a if rank.get(a, len(rank)) >= rank.get(b, len(rank)) else b
+
+
+def scenario_counts(features):
+    counts = {}
+    for feature in features:
+        for element in feature.get('elements', []):
+            if element.get('type') == 'scenario':
+                counts[element.get('status', 'untested')] = counts.get(element.get('status', 'untested'), 0) + 1
+    return counts
+
+
+def prepare_databases(workers, snapshot_rows=None, mode='template'):
+    """Create one database per worker, cloned from the dataset snapshot when snapshot_rows is set; returns their names."""
+    names = [WORKER_DB.format(i) for i in range(workers)]
+    cache = SnapshotCache(mode=mode) if snapshot_rows else None
+    # one at a time: CREATE DATABASE ... TEMPLATE fails while another session is copying the template
+    for name in names:
+        if cache:
+            print(cache.prepare(snapshot_rows, seed_from_env(), name).summary())
+        else:
+            create_database(name)
+    return names
+
+
+def worker_state(index, report_dir=REPORT_DIR):
+    """{env var: path} of worker `index`'s private state files, with the history files seeded from the shared ones."""
+    state_dir = os.path.join(report_dir, f'worker_{index}')
+    profile_dir = os.path.join(state_dir, 'profile')
+    shutil.rmtree(profile_dir, ignore_errors=True)
+    os.makedirs(state_dir, exist_ok=True)
+    env = {'QA_PROFILE_DIR': profile_dir, 'QA_LOG_FILE': os.path.join(state_dir, 'qa.log')}
+    for var, shared in (('QA_SLA_HISTORY', sla.HISTORY_PATH), ('QA_PLAN_HISTORY', planner.PLAN_HISTORY)):
+        path = os.path.join(state_dir, os.path.basename(shared))
+        if os.path.exists(shared):
+            # baselines and plan changes are judged against the history as it was before this run
+            shutil.copyfile(shared, path)
+        elif os.path.exists(path):
+            os.remove(path)
+        env[var] = path
+    return env
+
+
+def merge_sla_histories(paths, shared=None):
+    """Append the runs each worker recorded past its seeded copy to the shared SLA history."""
+    history = sla.SlaHistory(shared or sla.HISTORY_PATH)
+    seeded = {key: len(entry['runs']) for key, entry in history.data.items()}
+    for path in paths:
+        for key, entry in sla.SlaHistory(path).data.items():
+            target = history.data.setdefault(key, {'query': entry['query'], 'runs': []})
+            target['runs'].extend(entry['runs'][seeded.get(key, 0):])
+            if 'last_explain' in entry:
+                target['last_explain'] = entry['last_explain']
+    history.save()
+    return history
+
+
+def merge_plan_histories(paths, shared=None):
+    """Copy the plan fingerprints workers re-recorded into the shared plan history."""
+    store = planner.PlanStore(shared or planner.PLAN_HISTORY)
+    seeded = dict(store.data)
+    for path in paths:
+        store.data.update({name: entry for name, entry in planner.PlanStore(path).data.items()
+                           if entry != seeded.get(name)})
+    store.save()
+    return store
+
+
+def merge_profiles(directories, shared=None):
+    """Combine worker steps.json/trace.json into the shared profile directory; None if no worker profiled."""
+    records, events = [], []
+    for index, directory in enumerate(directories):
+        steps_path = os.path.join(directory, 'steps.json')
+        if not os.path.exists(steps_path):
+            continue
+        with open(steps_path) as f:
+            records.extend(dict(r, worker=index) for r in json.load(f))
+        with open(os.path.join(directory, 'trace.json')) as f:
+            # each worker is its own process, so its events already carry a distinct pid
+            events.extend(json.load(f)['traceEvents'])
+    if not records and not events:
+        return None
+    shared = shared or profiling.PROFILE_DIR
+    os.makedirs(shared, exist_ok=True)
+    with open(os.path.join(shared, 'steps.json'), 'w') as f:
+        json.dump(records, f, indent=2)
+    with open(os.path.join(shared, 'trace.json'), 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+    return shared
+
+
+def merge_worker_state(states):
+    """Fold the per-worker state files (worker_state() dicts) back into the shared ones."""
+    histories = [s['QA_SLA_HISTORY'] for s in states if os.path.exists(s['QA_SLA_HISTORY'])]
+    if histories:
+        merge_sla_histories(histories)
+    plans = [s['QA_PLAN_HISTORY'] for s in states if os.path.exists(s['QA_PLAN_HISTORY'])]
+    if plans:
+        merge_plan_histories(plans)
+    merge_profiles([s['QA_PROFILE_DIR'] for s in states])
+
+
+def run_worker(index, dbname, locations, behave_args=(), report_dir=REPORT_DIR, state=None):
+    """Run one behave process over `locations` against `dbname`; returns (exit code, seconds, report path)."""
+    report = os.path.join(report_dir, f'worker_{index}.json')
+    env = dict(os.environ, PGDATABASE=dbname, **(state or {}))
+    # the runner already cloned the snapshot into dbname
+    env.pop('QA_SNAPSHOT_ROWS', None)
+    cmd = [sys.executable, '-m', 'behave', '--no-capture', '-f', 'json', '-o', report, '-f', 'progress',
+           *behave_args, *locations]
+    start = time.perf_counter()
+    with open(os.path.join(report_dir, f'worker_{index}.log'), 'w') as log:
+        code = subprocess.call(cmd, env=env, stdout=log, stderr=subprocess.STDOUT)
+    return code, time.perf_counter() - start, report
+
+
+def run(paths=('features',), workers=None, behave_args=(), keep_databases=False, report_dir=REPORT_DIR):
+    """Shard, run and merge; returns a summary dict (written next to the merged report as summary.json)."""
+    os.makedirs(report_dir, exist_ok=True)
+    merged_path = os.path.join(report_dir, 'report.json')
+    locations = discover(paths)
+    shards = plan_shards(locations, workers or os.cpu_count() or 1, load_durations(merged_path))
+    if not shards:
+        # behave without locations would run the whole default suite
+        summary = {'workers': 0, 'scenarios': 0, 'counts': {}, 'wall_seconds': 0.0, 'worker_seconds': [],
+                   'speedup': None, 'exit_codes': []}
+        with open(os.path.join(report_dir, 'summary.json'), 'w') as f:
+            json.dump(summary, f, indent=2)
+        return summary
+    rows = os.environ.get('QA_SNAPSHOT_ROWS')
+    databases = prepare_databases(len(shards), int(rows) if rows else None,
+                                  os.environ.get('QA_SNAPSHOT_MODE', 'template'))
+    states = [worker_state(i, report_dir) for i in range(len(shards))]
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+            results = list(pool.map(lambda i: run_worker(i, databases[i], shards[i], behave_args, report_dir,
+                                                         states[i]),
+                                    range(len(shards))))
+    finally:
+        if not keep_databases:
+            for name in databases:
+                drop_database(name)
+    merge_worker_state(states)
+    wall = time.perf_counter() - start
+    reports = []
+    for shard, (_, _, path) in zip(shards, results):
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path) as f:
+                reports.append((shard, json.load(f)))
+    merged = merge_reports(reports)
+    with open(merged_path, 'w') as f:
+        json.dump(merged, f, indent=2)
+    worker_seconds = [seconds for _, seconds, _ in results]
+    summary = {'workers': len(shards), 'scenarios': len(locations), 'counts': scenario_counts(merged),
+               'wall_seconds': round(wall, 2), 'worker_seconds': [round(s, 2) for s in worker_seconds],
+               'speedup': round(sum(worker_seconds) / wall, 2) if wall else None,
+               'exit_codes': [code for code, _, _ in results]}
+    with open(os.path.join(report_dir, 'summary.json'), 'w') as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    behave_args = []
+    if '--' in argv:
+        split = argv.index('--')
+        argv, behave_args = argv[:split], argv[split + 1:]
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='*', default=['features'])
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('QA_PARALLEL_WORKERS', 0)) or None)
+    parser.add_argument('--keep-databases', action='store_true', help='leave the worker databases for inspection')
+    args = parser.parse_args(argv)
+    summary = run(args.paths, args.workers, behave_args, args.keep_databases)
+    print(json.dumps(summary))
+    sys.exit(1 if any(summary['exit_codes']) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,314 @@
+import datetime
+import gzip
+import hashlib
+import json
+import os
+
+from qakit.generator import COLUMNS
+
+PARTITIONED_TABLE = 'sample_data.transactions'
+ARCHIVE_DIR = os.environ.get('QA_ARCHIVE_DIR', os.path.join('reports', 'archive'))
+
+PARTITIONED_DDL = '''CREATE SCHEMA IF NOT EXISTS sample_data;
+CREATE TABLE IF NOT EXISTS {table} (
+  transaction_id BIGSERIAL,
+  user_id BIGINT NOT NULL,
+  product_id BIGINT NOT NULL,
+  amount NUMERIC(12,2) NOT NULL,
+  currency CHAR(3) NOT NULL DEFAULT 'USD',
+  transaction_date TIMESTAMP NOT NULL DEFAULT NOW(),
+  status VARCHAR(20) NOT NULL DEFAULT 'pending',
+  remarks TEXT,
+  marker_tag UUID,
+  PRIMARY KEY (transaction_id, transaction_date)
+) PARTITION BY RANGE (transaction_date);
+CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT;'''
+
+PARTITIONS_SQL = '''SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = %s::regclass'''
+
+
+def month_start(value):
+    return datetime.datetime(value.year, value.month, 1)
+
+
+def add_months(month, n):
+    index = month.year * 12 + month.month - 1 + n
+    return datetime.datetime(index // 12, index % 12 + 1, 1)
+
+
+def _split(table):
+    schema, _, name = table.rpartition('.')
+    return schema or 'public', name
+
+
+def partition_name(table, month):
+    """Qualified name of the monthly partition holding `month`, e.g. sample_data.transactions_p2024_01."""
+    schema, name = _split(table)
+    return f'{schema}.{name}_p{month:%Y_%m}'
+
+
+def is_partitioned(cur, table=PARTITIONED_TABLE):
+    cur.execute('SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)', (table,))
+    row = cur.fetchone()
+    return bool(row) and row[0] == 'p'
+
+
+def create_partitioned_table(cur, table=PARTITIONED_TABLE):
+    cur.execute(PARTITIONED_DDL.format(table=table))
+
+
+def ensure_partitions(cur, table=PARTITIONED_TABLE, start=None, months_ahead=3, now=None):
+    """Create monthly partitions from `start`'s month through `months_ahead` months past now; returns those created."""
+    now = month_start(now or datetime.datetime.now())
+    month = month_start(start) if start else now
+    existing = {p[0] for p in list_partitions(cur, table)}
+    created = []
+    while month <= add_months(now, months_ahead):
+        name = partition_name(table, month)
+        if name not in existing:
+            cur.execute(f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)",
+                        (month, add_months(month, 1)))
+            created.append(name)
+        month = add_months(month, 1)
+    return created
+
+
+def default_partition(cur, table=PARTITIONED_TABLE):
+    """Qualified name of the table's DEFAULT partition, or None."""
+    schema, _ = _split(table)
+    cur.execute(PARTITIONS_SQL, (table,))
+    return next((f'{schema}.{name}' for name, bound in cur.fetchall() if bound == 'DEFAULT'), None)
+
+
+def list_partitions(cur, table=PARTITIONED_TABLE):
+    """[(qualified name, lower, upper)] of the range partitions, oldest first; the DEFAULT partition is skipped."""
+    schema, _ = _split(table)
+    cur.execute(PARTITIONS_SQL, (table,))
+    parts = []
+    for name, bound in cur.fetchall():
+        if bound == 'DEFAULT':
+            continue
+        # FOR VALUES FROM ('2024-01-01 00:00:00') TO ('2024-02-01 00:00:00')
+        lo, hi = (datetime.datetime.fromisoformat(v) for v in bound.split("'")[1::2])
+        parts.append((f'{schema}.{name}', lo, hi))
+    return sorted(parts, key=lambda p: p[1])
+
+
+def partitions_for_range(cur, lo, hi, table=PARTITIONED_TABLE):
+    """Names of the partitions a transaction_date >= lo AND < hi query has to read."""
+    return [name for name, p_lo, p_hi in list_partitions(cur, table) if p_lo < hi and p_hi > lo]
+
+
+def scanned_relations(plan):
+    """Relation names read anywhere in an EXPLAIN (FORMAT JSON) plan tree."""
+    found = set()
+    stack = [plan[0]['Plan'] if isinstance(plan, list) else plan]
+    while stack:
+        node = stack.pop()
+        if 'Relation Name' in node:
+            found.add(f"{node.get('Schema', 'public')}.{node['Relation Name']}")
+        stack.extend(node.get('Plans', []))
+    return found
+
+
+def explain_partitions(cur, query, params=None):
+    """Partitions the planner will scan for `query`, after plan-time pruning."""
+    cur.execute('EXPLAIN (VERBOSE, FORMAT JSON) ' + query, params)
+    plan = cur.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return scanned_relations(plan)
+
+
+def assert_pruned(cur, query, params, lo, hi, table=PARTITIONED_TABLE):
+    """Fail unless a query bounded to [lo, hi) on transaction_date scans only the partitions for that range."""
+    scanned = explain_partitions(cur, query, params)
+    allowed = set(partitions_for_range(cur, lo, hi, table))
+    extra = scanned - allowed
+    if extra:
+        raise AssertionError(f'query scans partitions outside [{lo}, {hi}): {sorted(extra)}')
+    return scanned
+
+
+def _archive_paths(name, archive_dir):
+    base = os.path.join(archive_dir, name)
+    return base + '.copy.gz', base + '.json'
+
+
+def archive_partition(conn, name, table=PARTITIONED_TABLE, archive_dir=ARCHIVE_DIR):
+    """Detach a monthly partition, stream it to a gzip'd binary COPY file plus a JSON manifest, then drop it.
+
+    The detach, export and drop commit together, so a failure leaves the
+    partition attached and removes the files written so far. The manifest
+    is written to a temporary file before the commit and renamed after it,
+    so a crash in between leaves a manifest restore_partition() can use.
+    Returns the manifest dict.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    data_path, manifest_path = _archive_paths(name, archive_dir)
+    pending = manifest_path + '.tmp'
+    written = []
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                bounds = {p[0]: p for p in list_partitions(cur, table)}
+                if name not in bounds:
+                    raise ValueError(f'{name} is not a range partition of {table}')
+                _, lo, hi = bounds[name]
+                cur.execute(f'ALTER TABLE {table} DETACH PARTITION {name}')
+                digest = hashlib.sha256()
+                written.append(data_path)
+                with gzip.open(data_path, 'wb', compresslevel=6) as raw:
+                    writer = _HashingWriter(raw, digest)
+                    cur.copy_expert(f'COPY {name} TO STDOUT WITH (FORMAT binary)', writer)
+                rows = cur.rowcount
+                cur.execute(f'DROP TABLE {name}')
+                manifest = {'partition': name, 'table': table, 'from': lo.isoformat(), 'to': hi.isoformat(),
+                            'rows': rows, 'sha256': digest.hexdigest(), 'bytes': os.path.getsize(data_path),
+                            'archived_at': datetime.datetime.now().isoformat(timespec='seconds')}
+                written.append(pending)
+                with open(pending, 'w') as f:
+                    json.dump(manifest, f, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+    except BaseException:
+        for path in written:
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    os.replace(pending, manifest_path)
+    return manifest
+
+
+class _HashingWriter:
+    def __init__(self, raw, digest):
+        self.raw = raw
+        self.digest = digest
+
+    def write(self, data):
+        self.digest.update(data)
+        return self.raw.write(data)
+
+
+def list_archives(archive_dir=ARCHIVE_DIR):
+    if not os.path.isdir(archive_dir):
+        return []
+    manifests = []
+    for entry in sorted(os.listdir(archive_dir)):
+        if entry.endswith('.json'):
+            with open(os.path.join(archive_dir, entry)) as f:
+                manifests.append(json.load(f))
+    return manifests
+
+
+def restore_partition(conn, name, archive_dir=ARCHIVE_DIR):
+    """Reload an archived partition and reattach it; returns the row count restored.
+
+    A CHECK constraint matching the partition bounds is added before ATTACH,
+    so Postgres skips the validation scan, and dropped afterwards. Rows that
+    landed in the DEFAULT partition for the archived range while it was
+    detached would make ATTACH fail, so they are moved into the restored
+    partition first (the returned count includes them).
+    """
+    data_path, manifest_path = _archive_paths(name, archive_dir)
+    if not os.path.exists(manifest_path) and os.path.exists(manifest_path + '.tmp'):
+        # archive_partition() committed but stopped before renaming its manifest
+        manifest_path += '.tmp'
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    table, lo, hi = manifest['table'], manifest['from'], manifest['to']
+    digest = hashlib.sha256()
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute(f'CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+            with gzip.open(data_path, 'rb') as raw:
+                reader = _HashingReader(raw, digest)
+                cur.copy_expert(f'COPY {name} FROM STDIN WITH (FORMAT binary)', reader)
+            rows = cur.rowcount
+            if digest.hexdigest() != manifest['sha256'] or rows != manifest['rows']:
+                raise ValueError(f'archive {data_path} does not match its manifest')
+            default = default_partition(cur, table)
+            if default:
+                cur.execute(f'WITH moved AS (DELETE FROM {default} WHERE transaction_date >= %s AND transaction_date < %s '
+                            f'RETURNING *) INSERT INTO {name} SELECT * FROM moved', (lo, hi))
+                rows += cur.rowcount
+            check = f'{_split(name)[1]}_bounds'
+            cur.execute(f'ALTER TABLE {name} ADD CONSTRAINT {check} '
+                        'CHECK (transaction_date >= %s AND transaction_date < %s)', (lo, hi))
+            cur.execute(f'ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)', (lo, hi))
+            cur.execute(f'ALTER TABLE {name} DROP CONSTRAINT {check}')
+    os.remove(data_path)
+    os.remove(manifest_path)
+    return rows
+
+
+class _HashingReader:
+    def __init__(self, raw, digest):
+        self.raw = raw
+        self.digest = digest
+
+    def read(self, size=-1):
+        data = self.raw.read(size)
+        self.digest.update(data)
+        return data
+
+    def readline(self, size=-1):
+        data = self.raw.readline(size)
+        self.digest.update(data)
+        return data
+
+
+def apply_retention(conn, keep_months, table=PARTITIONED_TABLE, archive_dir=ARCHIVE_DIR, now=None):
+    """Archive (or, with archive_dir=None, drop) every partition wholly older than keep_months months.
+
+    Partition-level retention: no row-by-row DELETE, no dead tuples to vacuum.
+    Returns the names of the partitions removed.
+    """
+    cutoff = add_months(month_start(now or datetime.datetime.now()), -keep_months)
+    with conn:
+        with conn.cursor() as cur:
+            old = [name for name, _, hi in list_partitions(cur, table) if hi <= cutoff]
+    for name in old:
+        if archive_dir:
+            archive_partition(conn, name, table, archive_dir)
+        else:
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute(f'ALTER TABLE {table} DETACH PARTITION {name}')
+                    cur.execute(f'DROP TABLE {name}')
+    return old
+
+
+def migrate_to_partitioned(conn, table=PARTITIONED_TABLE, months_ahead=3):
+    """One-off conversion of a plain heap `table` into the monthly-partitioned layout.
+
+    The heap (and its indexes) are renamed with a _heap suffix and kept,
+    its rows are copied into the monthly partitions, and the new id
+    sequence continues after the heap's highest transaction_id. Columns
+    outside COLUMNS (e.g. business_key) are not carried over. Returns the
+    number of rows copied.
+    """
+    schema, name = _split(table)
+    heap = f'{schema}.{name}_heap'
+    with conn:
+        with conn.cursor() as cur:
+            if is_partitioned(cur, table):
+                return 0
+            cur.execute(f'ALTER TABLE {table} RENAME TO {name}_heap')
+            # index names are per schema; free them (primary key included) for the new table
+            cur.execute('SELECT indexname FROM pg_indexes WHERE schemaname = %s AND tablename = %s',
+                        (schema, f'{name}_heap'))
+            for (index,) in cur.fetchall():
+                cur.execute(f'ALTER INDEX {schema}.{index} RENAME TO {index}_heap')
+            create_partitioned_table(cur, table)
+            cur.execute(f'SELECT min(transaction_date), max(transaction_id) FROM {heap}')
+            oldest, max_id = cur.fetchone()
+            ensure_partitions(cur, table, start=oldest, months_ahead=months_ahead)
+            cols = ', '.join(('transaction_id',) + COLUMNS)
+            cur.execute(f'INSERT INTO {table} ({cols}) SELECT {cols} FROM {heap}')
+            rows = cur.rowcount
+            if max_id is not None:
+                cur.execute('SELECT setval(pg_get_serial_sequence(%s, %s), %s)', (table, 'transaction_id', max_id))
+    return rows
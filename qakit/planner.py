@@ -0,0 +1,396 @@
+import datetime
+import hashlib
+import json
+import os
+import re
+import statistics
+import time
+
+from qakit.partitions import is_partitioned
+
+PLANNER_TABLE = 'sample_data.transactions'
+PLAN_HISTORY = os.environ.get('QA_PLAN_HISTORY', os.path.join('reports', 'plans.json'))
+# a node whose estimate and actual row count differ by this factor (either way) is a misestimate
+MISESTIMATE_FACTOR = float(os.environ.get('QA_PLANNER_MISESTIMATE', 10))
+# the columns the suite's steps filter on; only these are considered for new indexes
+FILTER_COLUMNS = ('marker_tag', 'transaction_date', 'currency', 'status', 'remarks')
+# remarks can hold megabytes, past the ~2.7kB btree tuple limit; a hash index stores only the hash
+INDEX_METHODS = {'remarks': 'hash'}
+SEQ_SCANS = ('Seq Scan', 'Parallel Seq Scan')
+
+# The suite's recurring query shapes, by name; {table} is filled in, parameters are pyformat
+QUERIES = {
+    'run_rows': 'SELECT COUNT(*) FROM {table} WHERE marker_tag = %(marker)s',
+    'recent_window': "SELECT COUNT(*), SUM(amount) FROM {table} WHERE transaction_date >= NOW() - INTERVAL '30 days'",
+    'currency_status': 'SELECT SUM(amount), AVG(amount) FROM {table} WHERE currency = %(currency)s AND status = %(status)s',
+    'remarks_lookup': 'SELECT transaction_id FROM {table} WHERE remarks = %(remarks)s',
+    'date_page': ('SELECT transaction_id, transaction_date FROM {table} WHERE transaction_date < %(before)s '
+                  'ORDER BY transaction_date DESC, transaction_id DESC LIMIT 100'),
+}
+
+FRESHNESS_SQL = '''SELECT COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)::bigint, COALESCE(SUM(s.n_live_tup), 0),
+       COALESCE(SUM(s.n_mod_since_analyze), 0), MIN(GREATEST(s.last_analyze, s.last_autoanalyze))
+FROM pg_stat_user_tables s JOIN pg_class c ON c.oid = s.relid
+WHERE s.relid = %(table)s::regclass OR s.relid IN (SELECT relid FROM pg_partition_tree(%(table)s::regclass))'''
+
+INDEXES_SQL = '''SELECT a.attname, c.relname FROM pg_index i
+JOIN pg_class c ON c.oid = i.indexrelid
+JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+WHERE i.indrelid = %s::regclass'''
+
+
+def default_params(marker=None):
+    return {'marker': marker, 'currency': 'GBP', 'status': 'failed', 'remarks': 'refund-test',
+            'before': datetime.datetime.now() - datetime.timedelta(days=365)}
+
+
+# --- plan inspection (EXPLAIN ... FORMAT JSON output) ---
+
+def explain(cur, sql, params=None, analyze=False):
+    """The root plan node of `sql`; with analyze the query runs and actual rows/timings are included."""
+    options = 'ANALYZE, BUFFERS, FORMAT JSON' if analyze else 'FORMAT JSON'
+    cur.execute(f'EXPLAIN ({options}) {sql}', params)
+    doc = cur.fetchone()[0]
+    doc = json.loads(doc) if isinstance(doc, str) else doc
+    return doc[0]['Plan']
+
+
+def iter_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from iter_nodes(child)
+
+
+def plan_shape(plan):
+    """Canonical text of the plan tree: node types, join types and relations/indexes, no costs or row counts."""
+    label = plan['Node Type']
+    if plan.get('Join Type'):
+        label += f" {plan['Join Type']}"
+    target = plan.get('Index Name') or plan.get('Relation Name')
+    if target:
+        label += f'[{target}]'
+    children = plan.get('Plans', [])
+    return label + (f"({', '.join(plan_shape(c) for c in children)})" if children else '')
+
+
+def fingerprint(plan):
+    return hashlib.sha1(plan_shape(plan).encode('utf-8')).hexdigest()[:16]
+
+
+def misestimates(plan, factor=MISESTIMATE_FACTOR):
+    """Nodes of an EXPLAIN ANALYZE plan whose estimated rows (per loop) are off from the actual rows by >= factor.
+
+    Nodes below a Limit are skipped: they stop early by design, so their
+    actual rows say nothing about the estimate.
+    """
+    found = []
+    pending = [plan]
+    while pending:
+        node = pending.pop()
+        if node['Node Type'] != 'Limit':
+            pending.extend(reversed(node.get('Plans', [])))
+        if 'Actual Rows' not in node:
+            continue
+        estimated, actual = node['Plan Rows'], node['Actual Rows']
+        ratio = max(estimated, actual) / max(min(estimated, actual), 1)
+        if ratio >= factor:
+            found.append({'node': node['Node Type'], 'relation': node.get('Relation Name'),
+                          'estimated': estimated, 'actual': actual, 'ratio': round(ratio, 1)})
+    return found
+
+
+def seq_scan_columns(plan, columns=FILTER_COLUMNS):
+    """Columns of `columns` that appear in the Filter of a sequential scan somewhere in the plan."""
+    seen = set()
+    for node in iter_nodes(plan):
+        if node['Node Type'] in SEQ_SCANS and node.get('Filter'):
+            seen.update(c for c in columns if re.search(rf'\b{c}\b', node['Filter']))
+    return seen
+
+
+# --- statistics freshness and ANALYZE ---
+
+class Freshness:
+    def __init__(self, estimated_rows, live_rows, modified_since_analyze, last_analyze):
+        self.estimated_rows = estimated_rows  # pg_class.reltuples: what the planner believes
+        self.live_rows = live_rows
+        self.modified_since_analyze = modified_since_analyze
+        self.last_analyze = last_analyze
+
+    @property
+    def stale(self):
+        """Never analyzed, or more rows changed since the last ANALYZE than autovacuum's default 10% + 50."""
+        return self.last_analyze is None or self.modified_since_analyze > 50 + 0.1 * self.estimated_rows
+
+    def as_dict(self):
+        return {'estimated_rows': self.estimated_rows, 'live_rows': self.live_rows,
+                'modified_since_analyze': self.modified_since_analyze, 'stale': self.stale,
+                'last_analyze': self.last_analyze.isoformat(timespec='seconds') if self.last_analyze else None}
+
+
+def freshness(cur, table=PLANNER_TABLE):
+    """Planner statistics state from pg_class/pg_stat_user_tables, summed over partitions.
+
+    The activity counters are flushed asynchronously and can lag writes by
+    about a second.
+    """
+    cur.execute('SELECT pg_stat_clear_snapshot()')
+    cur.execute(FRESHNESS_SQL, {'table': table})
+    return Freshness(*cur.fetchone())
+
+
+def analyze(conn, table=PLANNER_TABLE):
+    """ANALYZE the table; returns seconds taken."""
+    with conn:
+        with conn.cursor() as cur:
+            start = time.perf_counter()
+            cur.execute(f'ANALYZE {table}')
+            return time.perf_counter() - start
+
+
+def after_bulk_load(conn, rows_loaded, table=PLANNER_TABLE):
+    """ANALYZE after a bulk load (unless QA_ANALYZE_AFTER_LOAD=0); returns a dict for the step log.
+
+    Records the planner's row estimate (reltuples) before and after next to
+    the live-row counter, so a load the statistics missed shows up as a gap.
+    """
+    if os.environ.get('QA_ANALYZE_AFTER_LOAD', '1') == '0':
+        return None
+    with conn:
+        with conn.cursor() as cur:
+            before = freshness(cur, table)
+    seconds = analyze(conn, table)
+    with conn:
+        with conn.cursor() as cur:
+            after = freshness(cur, table)
+    return {'rows_loaded': rows_loaded, 'estimated_before': before.estimated_rows,
+            'estimated_after': after.estimated_rows, 'live_rows': after.live_rows,
+            'analyze_seconds': round(seconds, 3)}
+
+
+def set_autoanalyze(conn, enabled, table=PLANNER_TABLE):
+    """Turn autovacuum/autoanalyze off (or back to the server default) on the table's heap partitions.
+
+    Used to keep statistics deliberately stale while a scenario measures
+    the planner before an explicit ANALYZE.
+    """
+    with conn:
+        with conn.cursor() as cur:
+            # pg_partition_tree() is empty for a table that is not partitioned, hence the oid match
+            cur.execute("SELECT oid::regclass::text FROM pg_class WHERE relkind = 'r' AND "
+                        "(oid = %(table)s::regclass OR oid IN (SELECT relid FROM pg_partition_tree(%(table)s::regclass)))",
+                        {'table': table})
+            for (name,) in cur.fetchall():
+                if enabled:
+                    cur.execute(f'ALTER TABLE {name} RESET (autovacuum_enabled)')
+                else:
+                    cur.execute(f'ALTER TABLE {name} SET (autovacuum_enabled = false)')
+
+
+# --- measuring the known queries ---
+
+class QueryPlan:
+    def __init__(self, name, plan, latencies):
+        self.name = name
+        self.plan = plan
+        self.shape = plan_shape(plan)
+        self.fingerprint = fingerprint(plan)
+        self.latencies = latencies
+        self.misestimates = misestimates(plan)
+
+    @property
+    def seconds(self):
+        return statistics.median(self.latencies)
+
+    @property
+    def estimated_rows(self):
+        return self.plan['Plan Rows']
+
+    @property
+    def actual_rows(self):
+        return self.plan.get('Actual Rows')
+
+    def as_dict(self):
+        return {'fingerprint': self.fingerprint, 'shape': self.shape, 'seconds': round(self.seconds, 4),
+                'estimated_rows': self.estimated_rows, 'actual_rows': self.actual_rows,
+                'misestimates': self.misestimates}
+
+
+def measure(conn, params, queries=None, table=PLANNER_TABLE, runs=3):
+    """EXPLAIN ANALYZE each query once and time `runs` plain executions; returns {name: QueryPlan}."""
+    results = {}
+    for name, template in (queries or QUERIES).items():
+        sql = template.format(table=table)
+        with conn:
+            with conn.cursor() as cur:
+                plan = explain(cur, sql, params, analyze=True)
+                latencies = []
+                for _ in range(runs):
+                    start = time.perf_counter()
+                    cur.execute(sql, params)
+                    cur.fetchall()
+                    latencies.append(time.perf_counter() - start)
+        results[name] = QueryPlan(name, plan, latencies)
+    return results
+
+
+# --- index advisor ---
+
+class Recommendation:
+    def __init__(self, column, queries, table=PLANNER_TABLE):
+        self.column = column
+        self.queries = sorted(queries)
+        self.method = INDEX_METHODS.get(column, 'btree')
+        self.name = f"{table.split('.')[-1]}_{column}_planner_idx"
+        self.table = table
+
+    @property
+    def qualified_name(self):
+        # an index lives in its table's schema
+        schema = self.table.rpartition('.')[0]
+        return f'{schema}.{self.name}' if schema else self.name
+
+    def ddl(self, concurrently=True):
+        return (f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {self.name} "
+                f'ON {self.table} USING {self.method} ({self.column})')
+
+    def as_dict(self):
+        return {'column': self.column, 'index': self.name, 'method': self.method, 'queries': self.queries,
+                'ddl': self.ddl()}
+
+
+def indexed_columns(cur, table=PLANNER_TABLE):
+    """{leading column: index name} for the table's existing indexes."""
+    cur.execute(INDEXES_SQL, (table,))
+    return dict(cur.fetchall())
+
+
+def advise(cur, plans, table=PLANNER_TABLE, columns=FILTER_COLUMNS):
+    """Recommend an index per filter column that the measured plans read with a sequential scan
+    and that no existing index leads with."""
+    indexed = indexed_columns(cur, table)
+    wanted = {}
+    for name, qp in plans.items():
+        for column in seq_scan_columns(qp.plan, columns):
+            if column not in indexed:
+                wanted.setdefault(column, set()).add(name)
+    return [Recommendation(c, wanted[c], table) for c in columns if c in wanted]
+
+
+def create_indexes(conn, recommendations):
+    """Build the recommended indexes; returns {qualified index name: seconds}.
+
+    CONCURRENTLY (under autocommit) on a plain table; a partitioned parent
+    does not support it, so there the build is a plain CREATE INDEX, which
+    cascades to every partition.
+    """
+    built = {}
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            for rec in recommendations:
+                concurrently = not is_partitioned(cur, rec.table)
+                start = time.perf_counter()
+                cur.execute(rec.ddl(concurrently))
+                built[rec.qualified_name] = round(time.perf_counter() - start, 3)
+    finally:
+        conn.autocommit = False
+    return built
+
+
+def drop_indexes(conn, names):
+    """Drop indexes built by create_indexes(), so later scenarios write to the table as it was."""
+    with conn:
+        with conn.cursor() as cur:
+            for name in names:
+                cur.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+# --- history of plan fingerprints ---
+
+class PlanStore:
+    """JSON file of the last plan fingerprint/shape per query name, to spot plan changes between runs."""
+
+    def __init__(self, path=PLAN_HISTORY):
+        self.path = path
+        self.data = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.data = json.load(f)
+
+    def previous(self, name):
+        return self.data.get(name)
+
+    def changes(self, plans):
+        """{name: (old fingerprint, new fingerprint)} for queries whose plan shape differs from the stored one."""
+        out = {}
+        for name, qp in plans.items():
+            old = self.data.get(name)
+            if old and old['fingerprint'] != qp.fingerprint:
+                out[name] = (old['fingerprint'], qp.fingerprint)
+        return out
+
+    def record(self, plans):
+        at = datetime.datetime.now().isoformat(timespec='seconds')
+        for name, qp in plans.items():
+            self.data[name] = {'fingerprint': qp.fingerprint, 'shape': qp.shape, 'seconds': qp.seconds, 'at': at}
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.data, f, indent=2, default=str)
+        os.replace(tmp, self.path)
+
+
+class PlannerReport:
+    """Before/after comparison of the known queries around an ANALYZE (and any advised indexes)."""
+
+    def __init__(self, before, after, stale, recommendations=(), built=None, analyze_seconds=None, changes=None):
+        self.before = before
+        self.after = after
+        self.stale = stale
+        self.recommendations = list(recommendations)
+        self.built = built or {}
+        self.analyze_seconds = analyze_seconds
+        self.changes = changes or {}
+
+    @property
+    def seconds_before(self):
+        return sum(qp.seconds for qp in self.before.values())
+
+    @property
+    def seconds_after(self):
+        return sum(qp.seconds for qp in self.after.values())
+
+    def problems(self, max_slowdown=1.1):
+        problems = []
+        for name, qp in self.after.items():
+            for m in qp.misestimates:
+                # a value missing from fresh statistics is estimated at the average non-common frequency,
+                # never 0, so an empty result stays "misestimated" however recent the ANALYZE
+                if m['relation'] and m['actual']:
+                    problems.append(f"{name}: {m['node']} on {m['relation']} still estimated {m['estimated']} rows "
+                                    f"for {m['actual']} after ANALYZE")
+        if self.seconds_after > self.seconds_before * max_slowdown:
+            problems.append(f'known queries took {self.seconds_after:.3f}s after ANALYZE vs '
+                            f'{self.seconds_before:.3f}s before')
+        return problems
+
+    def summary(self):
+        queries = {}
+        for name, before in self.before.items():
+            after = self.after.get(name)
+            queries[name] = {'before': before.as_dict(), 'after': after.as_dict() if after else None,
+                             'plan_changed': bool(after) and after.fingerprint != before.fingerprint,
+                             'speedup': round(before.seconds / after.seconds, 2) if after and after.seconds else None}
+        return {'stale_before': self.stale.as_dict(), 'analyze_seconds': self.analyze_seconds,
+                'recommendations': [r.as_dict() for r in self.recommendations], 'indexes_built': self.built,
+                'history_changes': self.changes, 'seconds_before': round(self.seconds_before, 4),
+                'seconds_after': round(self.seconds_after, 4), 'queries': queries}
+
+    def write(self, path=os.path.join('reports', 'planner.json')):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2, default=str)
+        return path
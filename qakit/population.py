@@ -0,0 +1,179 @@
+import multiprocessing
+import os
+import queue
+import time
+from concurrent.futures import FIRST_EXCEPTION, ProcessPoolExecutor, wait
+
+import numpy as np
+import psycopg2
+
+from qakit.baselines import Aggregates
+from qakit.copyload import COPY_TABLE, copy_blocks
+from qakit.db import get_conn
+from qakit.generator import BlockGenerator
+
+DEFAULT_BLOCK_SIZE = 100_000
+
+
+class PopulationError(RuntimeError):
+    """Raised when a shard fails; rows this populate() call already wrote are removed first."""
+
+    def __init__(self, shard, cause, rows_removed):
+        cleanup = 'cleanup failed' if rows_removed is None else f'{rows_removed} rows from this load removed'
+        super().__init__(f'shard {shard} failed: {cause} ({cleanup})')
+        self.shard = shard
+        self.cause = cause
+        self.rows_removed = rows_removed
+
+
+class _Aborted(Exception):
+    pass
+
+
+class PopulationResult:
+    def __init__(self, rows, seconds, shards, aggregates=None):
+        self.rows = rows
+        self.seconds = seconds
+        self.shards = shards  # list of (shard index, rows, seconds)
+        self.aggregates = aggregates  # qakit.baselines.Aggregates over every loaded row
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __repr__(self):
+        return f'PopulationResult(rows={self.rows}, seconds={self.seconds:.2f}, rows_per_sec={self.rows_per_sec:,.0f})'
+
+
+def plan_shards(total_rows, workers):
+    """Split total_rows into `workers` near-equal shard sizes (larger shards first)."""
+    workers = max(1, min(workers, total_rows)) if total_rows else 1
+    base, extra = divmod(total_rows, workers)
+    return [base + (1 if i < extra else 0) for i in range(workers)]
+
+
+def shard_seeds(seed, shards):
+    # Independent, reproducible streams per shard; None stays random
+    if seed is None:
+        return [None] * shards
+    return [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(seed).spawn(shards)]
+
+
+def _populate_shard(index, rows, marker_tag, seed, block_size, fmt, table, progress_queue, abort, conn_overrides):
+    start = time.perf_counter()
+    aggregates = Aggregates()
+
+    def blocks():
+        for blk in BlockGenerator(seed=seed, block_size=block_size, marker_tag=marker_tag).blocks(rows):
+            if abort.is_set():
+                raise _Aborted()
+            aggregates.update(blk)
+            yield blk
+            progress_queue.put(len(blk))
+
+    conn = get_conn(**conn_overrides)
+    try:
+        # one transaction per shard: an aborted or failed shard leaves nothing behind
+        with conn:
+            with conn.cursor() as cur:
+                loaded = copy_blocks(cur, blocks(), fmt=fmt, table=table)
+    finally:
+        conn.close()
+    return index, loaded, time.perf_counter() - start, aggregates
+
+
+def high_water_mark(table=COPY_TABLE, conn_overrides=None):
+    """Highest transaction_id in the table (0 when empty); rows loaded afterwards all get larger ids."""
+    conn = get_conn(**(conn_overrides or {}))
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(f'SELECT COALESCE(MAX(transaction_id), 0) FROM {table}')
+                return cur.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def delete_marker_rows(marker_tag, table=COPY_TABLE, conn_overrides=None, above_id=None):
+    """Delete the rows tagged marker_tag, only those with transaction_id > above_id when given."""
+    conn = get_conn(**(conn_overrides or {}))
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                if above_id is None:
+                    cur.execute(f'DELETE FROM {table} WHERE marker_tag = %s', (marker_tag,))
+                else:
+                    cur.execute(f'DELETE FROM {table} WHERE marker_tag = %s AND transaction_id > %s',
+                                (marker_tag, above_id))
+                return cur.rowcount
+    finally:
+        conn.close()
+
+
+def populate(total_rows, marker_tag, workers=None, block_size=DEFAULT_BLOCK_SIZE, fmt='binary', seed=None,
+             table=COPY_TABLE, progress=None, progress_interval=2.0, conn_overrides=None):
+    """Load total_rows synthetic rows tagged with marker_tag using a pool of worker processes.
+
+    Every worker generates its own shard and COPYs it on its own connection.
+    `progress(rows_done, total_rows, rows_per_sec)` is called about every
+    progress_interval seconds. If any shard fails, the remaining shards are
+    told to abort (rolling back their transactions), the rows this call
+    already committed are deleted, and PopulationError is raised for the
+    lowest-numbered failing shard, so a failed run always leaves the table
+    as it was. Only ids above the table's high-water mark at the start are
+    deleted: earlier loads may share marker_tag (a scenario's run marker)
+    and must survive. conn_overrides (e.g. {'dbname': ...}) are passed to every
+    worker's get_conn(). Each shard keeps exact per-currency/status amount
+    aggregates while generating; the merged totals come back as
+    result.aggregates, a baseline for the loaded rows at no extra scan.
+    """
+    workers = workers or os.cpu_count() or 1
+    sizes = plan_shards(total_rows, workers)
+    seeds = shard_seeds(seed, len(sizes))
+    above_id = high_water_mark(table, conn_overrides)
+    manager = multiprocessing.Manager()
+    progress_queue, abort = manager.Queue(), manager.Event()
+    start = time.perf_counter()
+    done_rows = 0
+    last_report = start
+    try:
+        with ProcessPoolExecutor(max_workers=len(sizes)) as pool:
+            futures = [pool.submit(_populate_shard, i, n, marker_tag, seeds[i], block_size, fmt, table,
+                                   progress_queue, abort, conn_overrides or {})
+                       for i, n in enumerate(sizes)]
+            pending = set(futures)
+            while pending:
+                finished, pending = wait(pending, timeout=0.5, return_when=FIRST_EXCEPTION)
+                while True:
+                    try:
+                        done_rows += progress_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                now = time.perf_counter()
+                if progress and now - last_report >= progress_interval:
+                    progress(done_rows, total_rows, done_rows / (now - start))
+                    last_report = now
+                if any(f.exception() for f in finished):
+                    abort.set()
+            failures = [(i, f.exception()) for i, f in enumerate(futures) if f.exception()]
+            failures = [(i, e) for i, e in failures if not isinstance(e, _Aborted)] or failures
+        if failures:
+            index, cause = failures[0]
+            try:
+                removed = delete_marker_rows(marker_tag, table, conn_overrides, above_id)
+            except psycopg2.Error as exc:
+                raise PopulationError(index, cause, None) from exc
+            raise PopulationError(index, cause, removed)
+        shards = sorted((f.result() for f in futures), key=lambda r: r[0])
+    finally:
+        manager.shutdown()
+    elapsed = time.perf_counter() - start
+    aggregates = Aggregates()
+    for *_, shard_aggregates in shards:
+        aggregates.merge(shard_aggregates)
+    result = PopulationResult(sum(n for _, n, _, _ in shards), elapsed, [s[:3] for s in shards], aggregates)
+    if progress:
+        progress(result.rows, total_rows, result.rows_per_sec)
+    if result.rows != total_rows:
+        raise RuntimeError(f'populated {result.rows} rows but {total_rows} were planned')
+    return result
@@ -0,0 +1,146 @@
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+
+from qakit import profiles, rules
+
+
+def rules_version(engine=None):
+    """Fingerprint of the profile rules; editing qakit/profiles.py or qakit/rules.py invalidates cached profiles.
+
+    With a compile_rules() `engine` its RuleSet is part of the fingerprint too.
+    """
+    sha = hashlib.sha256()
+    for module in (profiles, rules):
+        sha.update(inspect.getsource(module).encode('utf-8'))
+    if engine is not None:
+        sha.update(json.dumps(engine.rules.as_dict(), sort_keys=True).encode('utf-8'))
+    return sha.hexdigest()[:16]
+
+
+def _digest(version, text):
+    return hashlib.blake2b(f'{version}\0{text}'.encode('utf-8'), digest_size=20).hexdigest()
+
+
+def input_key(data, version):
+    canonical = json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return _digest(version, canonical)
+
+
+def _copy_profile(profile):
+    # callers may mutate the recommendations list; never hand out the cached one
+    return {k: (v[:] if isinstance(v, list) else v) for k, v in profile.items()}
+
+
+class ProfileCache:
+    """Content-addressed memo cache in front of the profile rules.
+
+    Keys are a hash of the canonical JSON of the input plus rules_version().
+    A bounded LRU dict sits in memory; `path` adds a SQLite tier that
+    survives between runs and is wiped when the rules version changes.
+    `engine` is the compile_rules() result to profile with, DEFAULT_RULES when omitted.
+    """
+
+    def __init__(self, maxsize=100_000, path=None, version=None, engine=None):
+        self.maxsize = maxsize
+        self.engine = engine
+        self.version = version or rules_version(engine)
+        self._lru = OrderedDict()
+        self.stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'compute_seconds': 0.0}
+        self._db = self._open_disk(path) if path else None
+
+    def _open_disk(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        db = sqlite3.connect(path)
+        db.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)')
+        db.execute('CREATE TABLE IF NOT EXISTS profiles (key TEXT PRIMARY KEY, profile TEXT NOT NULL)')
+        row = db.execute("SELECT value FROM meta WHERE name = 'rules_version'").fetchone()
+        if not row or row[0] != self.version:
+            db.execute('DELETE FROM profiles')
+            db.execute("INSERT OR REPLACE INTO meta VALUES ('rules_version', ?)", (self.version,))
+        db.commit()
+        return db
+
+    def _remember(self, key, profile):
+        self._lru[key] = profile
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def _lookup(self, key):
+        profile = self._lru.get(key)
+        if profile is not None:
+            self._lru.move_to_end(key)
+            self.stats['hits'] += 1
+            return profile
+        if self._db is not None:
+            row = self._db.execute('SELECT profile FROM profiles WHERE key = ?', (key,)).fetchone()
+            if row:
+                profile = json.loads(row[0])
+                self._remember(key, profile)
+                self.stats['disk_hits'] += 1
+                return profile
+        return None
+
+    def _store(self, items):
+        for key, profile in items:
+            self._remember(key, profile)
+        if self._db is not None:
+            self._db.executemany('INSERT OR REPLACE INTO profiles VALUES (?, ?)',
+                                 [(k, json.dumps(p)) for k, p in items])
+            self._db.commit()
+
+    def profile(self, data):
+        return self.profile_many([data])[0]
+
+    def profile_many(self, records):
+        """Profiles for many customer dicts; only cache misses reach the batch engine."""
+        records = list(records)
+        keys = [input_key(r, self.version) for r in records]
+        return self._resolve(keys, lambda i: records[i])
+
+    def profile_jsonl(self, lines):
+        """Profiles for JSONL lines, keyed on the raw line text.
+
+        Skips canonicalisation, and on a hit skips json.loads() as well;
+        the price is that a record re-serialised with a different key order
+        is a miss.
+        """
+        lines = [line.strip() for line in lines]
+        lines = [line for line in lines if line]
+        keys = [_digest(self.version, line) for line in lines]
+        return self._resolve(keys, lambda i: json.loads(lines[i]))
+
+    def _resolve(self, keys, load):
+        results = [self._lookup(k) for k in keys]
+        missing = [i for i, p in enumerate(results) if p is None]
+        if missing:
+            start = time.perf_counter()
+            computed = profiles.generate_profiles([load(i) for i in missing], self.engine)
+            self.stats['compute_seconds'] += time.perf_counter() - start
+            self.stats['misses'] += len(missing)
+            fresh = {}
+            for i, p in zip(missing, computed):
+                results[i] = fresh.setdefault(keys[i], p)
+            self._store(list(fresh.items()))
+        return [_copy_profile(p) for p in results]
+
+    def report(self):
+        s = dict(self.stats)
+        hits = s['hits'] + s['disk_hits']
+        lookups = hits + s['misses']
+        s['hit_rate'] = hits / lookups if lookups else 0.0
+        # what the hits would have cost at the observed per-profile compute time
+        s['estimated_seconds_saved'] = hits * s['compute_seconds'] / s['misses'] if s['misses'] else 0.0
+        s['size'] = len(self._lru)
+        return s
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,179 @@
+"""Build customer profiles straight from sample_data.transactions.
+
+Per-user profile inputs (AOV, last purchase age, recent purchases) are
+aggregated in SQL and streamed through a server-side named cursor into the
+batch profile engine. A watermark on transaction_id records how far the
+last run got, so later runs only recompute users with new transactions.
+The watermark only moves past ids whose writers had finished before the
+run's snapshot was taken (see refresh_profiles).
+
+"N days ago" inputs (last purchase, purchase dates) are computed against
+the run's current_date, so churn_risk of a user without new transactions
+only changes when that profile is recomputed: pass --max-age-days to also
+refresh profiles older than that, or --full to rebuild everything.
+
+Usage: python -m qakit.profile_pipeline [--full] [--max-age-days N] [--batch-size N]
+"""
+import argparse
+import json
+import time
+
+import psycopg2.extras
+
+from qakit.db import get_conn
+from qakit.profiles import CustomerColumns, iter_profiles
+
+PIPELINE = 'customer_profiles'
+RECENT_PURCHASES = 20
+
+SCHEMA_DDL = '''CREATE TABLE IF NOT EXISTS sample_data.customer_profiles (
+  user_id BIGINT PRIMARY KEY,
+  profile JSONB NOT NULL,
+  refreshed_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+CREATE TABLE IF NOT EXISTS sample_data.profile_watermarks (
+  pipeline TEXT PRIMARY KEY,
+  last_transaction_id BIGINT NOT NULL,
+  last_transaction_date TIMESTAMP,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS transactions_user_id_idx ON sample_data.transactions (user_id);'''
+
+# The transactions table has no browsing, brand or discount data, so those inputs stay NULL
+# (and the engine reports needs_more_data for them).
+INPUTS_SQL = '''
+WITH users AS ({users})
+SELECT t.user_id,
+       round(avg(t.amount) FILTER (WHERE t.status = 'completed'), 2)::float8 AS aov,
+       (current_date - max(t.transaction_date)::date) || ' days ago' AS last_purchase,
+       to_json((array_agg(json_build_object(
+            'sku', 'SKU-' || t.product_id,
+            'name', 'SKU-' || t.product_id,
+            'date', (current_date - t.transaction_date::date) || ' days ago')
+          ORDER BY t.transaction_date DESC) FILTER (WHERE t.status = 'completed'))[1:{recent}]) AS purchases
+FROM sample_data.transactions t
+JOIN users u USING (user_id)
+WHERE t.transaction_id <= %(upto_id)s
+GROUP BY t.user_id'''
+
+ALL_USERS = 'SELECT DISTINCT user_id FROM sample_data.transactions WHERE transaction_id <= %(upto_id)s'
+CHANGED_USERS = ('SELECT DISTINCT user_id FROM sample_data.transactions '
+                 'WHERE transaction_id > %(since_id)s AND transaction_id <= %(upto_id)s')
+# profiles whose time-dependent fields (days since last purchase, churn_risk) may have gone stale
+STALE_USERS = ('SELECT user_id FROM sample_data.customer_profiles '
+               'WHERE refreshed_at < NOW() - make_interval(days => %(max_age_days)s)')
+
+# Highest id written by a transaction that had already ended when this snapshot was taken. A writer still
+# in flight then may yet commit a lower id (sequence values are drawn before commit), so the watermark
+# must not pass it. Walks the primary key backwards from the newest row, so it stops early.
+SETTLED_SQL = '''SELECT transaction_id, transaction_date FROM sample_data.transactions
+WHERE age(xmin) > age(mod(pg_snapshot_xmin(pg_current_snapshot())::text::numeric, 4294967296)::text::xid)
+ORDER BY transaction_id DESC LIMIT 1'''
+
+UPSERT_SQL = '''INSERT INTO sample_data.customer_profiles (user_id, profile) VALUES %s
+ON CONFLICT (user_id) DO UPDATE SET profile = EXCLUDED.profile, refreshed_at = NOW()'''
+
+
+def ensure_schema(conn):
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute(SCHEMA_DDL)
+
+
+def read_watermark(cur, pipeline=PIPELINE):
+    cur.execute('SELECT last_transaction_id, last_transaction_date FROM sample_data.profile_watermarks '
+                'WHERE pipeline = %s', (pipeline,))
+    return cur.fetchone()
+
+
+def input_columns(rows):
+    """Turn (user_id, aov, last_purchase, purchases) rows into user ids and CustomerColumns."""
+    user_ids, aov, last, purchases = (list(c) for c in zip(*rows))
+    n = len(user_ids)
+    cols = CustomerColumns({
+        'purchases': [p or [] for p in purchases],
+        'last_purchase': last,
+        'aov': aov,
+        'browsing': [[]] * n,
+        'brand_affinity': [None] * n,
+        'discount_sensitivity': [None] * n,
+    })
+    return user_ids, cols
+
+
+def refresh_profiles(conn, full=False, batch_size=50_000, pipeline=PIPELINE, max_age_days=None):
+    """Recompute profiles for users with transactions past the stored watermark.
+
+    Runs in a single REPEATABLE READ transaction: the snapshot's highest
+    transaction_id bounds this run, and profiles and the new watermark
+    commit together, so an interrupted run is simply redone next time.
+    The stored watermark is the highest id whose writer had already
+    finished when the snapshot was taken, not the snapshot's highest id:
+    concurrent writers draw ids before they commit, so rows below the
+    snapshot's max can still appear. Users past the settled watermark are
+    refreshed again by the next run; the upserts are idempotent.
+    With max_age_days, profiles last refreshed longer ago than that are
+    recomputed too, even without new transactions.
+    Returns a dict with the users refreshed, the watermark, the snapshot's
+    highest id (upto_id) and timings.
+    """
+    start = time.perf_counter()
+    conn.set_session(isolation_level='REPEATABLE READ')
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                watermark = None if full else read_watermark(cur, pipeline)
+                cur.execute('SELECT max(transaction_id) FROM sample_data.transactions')
+                upto_id = cur.fetchone()[0]
+                if upto_id is None or (watermark and watermark[0] >= upto_id and max_age_days is None):
+                    return {'users': 0, 'watermark': watermark, 'upto_id': upto_id,
+                            'seconds': time.perf_counter() - start}
+                cur.execute(SETTLED_SQL)
+                # nothing settled yet: keep the old watermark (or start from zero)
+                settled = cur.fetchone() or watermark or (0, None)
+                if watermark and settled[0] < watermark[0]:
+                    settled = watermark
+                users_sql = CHANGED_USERS if watermark else ALL_USERS
+                if watermark and max_age_days is not None:
+                    users_sql = f'{CHANGED_USERS} UNION {STALE_USERS}'
+                params = {'since_id': watermark[0] if watermark else None, 'upto_id': upto_id,
+                          'max_age_days': max_age_days}
+                refreshed = 0
+                with conn.cursor(name=f'{pipeline}_inputs') as src:
+                    src.itersize = batch_size
+                    src.execute(INPUTS_SQL.format(users=users_sql, recent=RECENT_PURCHASES), params)
+                    while True:
+                        rows = src.fetchmany(batch_size)
+                        if not rows:
+                            break
+                        user_ids, cols = input_columns(rows)
+                        values = [(uid, json.dumps(p)) for uid, p in zip(user_ids, iter_profiles(cols))]
+                        psycopg2.extras.execute_values(cur, UPSERT_SQL, values, page_size=1000)
+                        refreshed += len(values)
+                cur.execute('''INSERT INTO sample_data.profile_watermarks (pipeline, last_transaction_id, last_transaction_date)
+VALUES (%s, %s, %s)
+ON CONFLICT (pipeline) DO UPDATE SET last_transaction_id = EXCLUDED.last_transaction_id,
+  last_transaction_date = EXCLUDED.last_transaction_date, updated_at = NOW()''', (pipeline, *settled))
+    finally:
+        conn.set_session(isolation_level='DEFAULT')
+    return {'users': refreshed, 'watermark': tuple(settled), 'upto_id': upto_id, 'seconds': time.perf_counter() - start}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--full', action='store_true', help='ignore the watermark and rebuild every profile')
+    parser.add_argument('--max-age-days', type=int, default=None,
+                        help='also refresh profiles not recomputed for this many days (time-dependent fields)')
+    parser.add_argument('--batch-size', type=int, default=50_000)
+    args = parser.parse_args(argv)
+    conn = get_conn()
+    try:
+        ensure_schema(conn)
+        result = refresh_profiles(conn, full=args.full, batch_size=args.batch_size, max_age_days=args.max_age_days)
+    finally:
+        conn.close()
+    print(f"refreshed {result['users']:,} profiles in {result['seconds']:.2f}s; watermark={result['watermark']}")
+
+
+if __name__ == '__main__':
+    main()
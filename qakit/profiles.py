@@ -0,0 +1,251 @@
+import json
+
+import numpy as np
+
+from qakit.rules import Category, CrossSell, RuleSet, compile_rules, parse_days_ago
+
+CRITICAL_FIELDS = ("purchases", "last_purchase", "aov", "browsing", "brand_affinity", "discount_sensitivity")
+PROFILE_KEYS = ("ltv_segment", "discount_sensitive", "recommendations", "loyalty_flag", "churn_risk",
+                "cross_sell_opportunity", "needs_more_data")
+
+# The rules generate_profile() applies, as data; qakit.rules compiles them into one pass per list
+DEFAULT_RULES = RuleSet(
+    ltv_thresholds=((150, "High"), (75, "Medium")),
+    ltv_default="Low",
+    ltv_unknown="Unknown",
+    discount_keywords=("high", ">"),
+    churn_days=180,
+    required_fields=CRITICAL_FIELDS,
+    recommendations=(Category("Camping Tents", ("camp", "tent"), count_above=0),),
+    cross_sell=(CrossSell("hiking gear + camping", purchased=("boot", "hiking"), browsed=("camp",)),),
+)
+_DEFAULT_ENGINE = compile_rules(DEFAULT_RULES)
+
+
+# Simple rule-based generator used by tests
+def generate_profile(data, engine=None):
+    """Profile one customer dict; `engine` is a compile_rules() result, DEFAULT_RULES when omitted."""
+    return (engine or _DEFAULT_ENGINE).profile(data)
+
+
+# --- Batch engine: a CompiledRules evaluated column-wise, in lockstep with its profile() ---
+
+def _any_per_owner(owner, mask, n):
+    return np.bincount(owner[mask], minlength=n) > 0
+
+
+class _Vocabulary(dict):
+    """Maps repeated strings to integer codes so string rules run once per distinct value."""
+
+    def code(self, value):
+        code = self.get(value)
+        if code is None:
+            code = self[value] = len(self)
+        return code
+
+    def masks(self, automaton):
+        """Keyword-group bitmask of every distinct value, indexed by code."""
+        return np.array([automaton.scan(v) for v in self], dtype=np.int64)
+
+
+INPUT_FIELDS = CRITICAL_FIELDS + ("ltv_segment",)
+
+
+class CustomerColumns:
+    """Many customers' inputs laid out column by column.
+
+    Built from a dict of equal-length lists keyed by input field (or from
+    records via from_records). Nested lists (browsing, purchases) are
+    flattened into one code array per attribute plus an `owner` array
+    holding the customer index of each entry, so the per-customer rules
+    become array operations and bincounts. Strings are dictionary-encoded,
+    so keyword checks and "N days ago" parsing run once per distinct value.
+    `engine` is the compile_rules() result the batch is evaluated with,
+    DEFAULT_RULES when omitted; its required_fields decide needs_more_data.
+    """
+
+    def __init__(self, columns, engine=None):
+        n = len(columns["aov"])
+        self.engine = engine or _DEFAULT_ENGINE
+        ltv = columns.get("ltv_segment") or [None] * n
+        required = zip(*(columns.get(f) or [None] * n for f in self.engine.rules.required_fields)) \
+            if self.engine.rules.required_fields else [()] * n
+        self._ingest(n, zip(*(columns[f] for f in CRITICAL_FIELDS), ltv, required))
+
+    @classmethod
+    def from_records(cls, records, engine=None):
+        records = list(records)
+        cols = cls.__new__(cls)
+        cols.engine = engine or _DEFAULT_ENGINE
+        required = cols.engine.rules.required_fields
+        cols._ingest(len(records), ((*map(r.get, INPUT_FIELDS), tuple(map(r.get, required))) for r in records))
+        return cols
+
+    def _ingest(self, n, rows):
+        self.n = n
+        aov = np.full(n, np.nan)
+        aov_missing = np.zeros(n, dtype=bool)
+        ltv_override = np.full(n, "", dtype=object)
+        brand_count = np.zeros(n, dtype=np.int64)
+        has_purchases = np.zeros(n, dtype=bool)
+        last_none = np.zeros(n, dtype=bool)
+        last_code = np.zeros(n, dtype=np.int64)
+        discount_code = np.zeros(n, dtype=np.int64)
+        missing = np.zeros(n, dtype=bool)
+        discounts, lasts, items, names = _Vocabulary(), _Vocabulary(), _Vocabulary(), _Vocabulary()
+        browse_owner, browse_code, browse_count = [], [], []
+        purchase_owner, purchase_code = [], []
+
+        for i, (purchases, last, a, browsing, brands, ds, ltv, required) in enumerate(rows):
+            if a is None:
+                aov_missing[i] = True
+            else:
+                aov[i] = a
+            if ltv:
+                ltv_override[i] = ltv
+            if brands:
+                brand_count[i] = len(brands)
+            discount_code[i] = discounts.code(ds or "")
+            if last is None:
+                last_none[i] = True
+            elif isinstance(last, str):
+                last_code[i] = lasts.code(last) + 1
+            if purchases:
+                has_purchases[i] = True
+                for p in purchases:
+                    purchase_owner.append(i)
+                    purchase_code.append(names.code(p.get("name", "")))
+            if browsing:
+                for b in browsing:
+                    browse_owner.append(i)
+                    browse_code.append(items.code(b.get("item", "")))
+                    browse_count.append(b.get("count", 0))
+            if None in required or [] in required or "" in required:
+                missing[i] = True
+
+        self.aov, self.aov_missing, self.ltv_override = aov, aov_missing, ltv_override
+        self.brand_count, self.has_purchases, self.needs_more_data = brand_count, has_purchases, missing
+        self.discount_code, self.discount_vocab = discount_code, discounts
+        self.last_purchase_none = last_none
+        # code 0 = not a string; distinct strings parsed once, -1 = no "N days ago" match
+        parsed = [-1] + [-1 if d is None else d for d in map(parse_days_ago, lasts)]
+        self.days = np.array(parsed, dtype=np.int64)[last_code]
+        self.browse_owner = np.array(browse_owner, dtype=np.int64)
+        self.browse_code = np.array(browse_code, dtype=np.int64)
+        self.browse_count = np.array(browse_count, dtype=float)
+        self.browse_vocab = items
+        self.purchase_owner = np.array(purchase_owner, dtype=np.int64)
+        self.purchase_code = np.array(purchase_code, dtype=np.int64)
+        self.purchase_vocab = names
+
+
+def _recommendations(engine, cols, browse_mask):
+    """Per-customer recommendation codes and the label list each code stands for.
+
+    With a single category the code is simply how many entries passed; with
+    several, labels interleave in browsing order, so each customer's
+    sequence of passing-category masks is dictionary-encoded instead.
+    """
+    n, owner = cols.n, cols.browse_owner
+    passing = np.zeros(len(owner), dtype=np.int64)
+    for bit, (_, count_above) in enumerate(engine.recs):
+        hit = ((browse_mask >> bit) & 1).astype(bool) & (cols.browse_count > count_above)
+        passing |= hit.astype(np.int64) << bit
+    if len(engine.recs) <= 1:
+        codes = np.bincount(owner[passing > 0], minlength=n)
+        label = [engine.recs[0][0]] if engine.recs else []
+        return codes, [label * k for k in range(int(codes.max(initial=0)) + 1)]
+    sequences = {}
+    for i, mask in zip(owner[passing > 0].tolist(), passing[passing > 0].tolist()):
+        sequences.setdefault(i, []).append(mask)
+    vocab = _Vocabulary()
+    vocab.code(())
+    codes = np.zeros(n, dtype=np.int64)
+    for i, masks in sequences.items():
+        codes[i] = vocab.code(tuple(masks))
+    labels = [label for label, _ in engine.recs]
+    lists = [[labels[bit] for mask in seq for bit in range(len(labels)) if mask >> bit & 1] for seq in vocab]
+    return codes, lists
+
+
+def evaluate(cols, engine=None):
+    """Compute every profile column for a CustomerColumns batch; returns a dict of arrays.
+
+    "recommendations" holds codes into the "recommendation_lists" entry.
+    """
+    engine = engine or cols.engine
+    rules = engine.rules
+    n = cols.n
+    labels = np.array(engine.ltv_labels, dtype=object)
+    tier = np.searchsorted(np.array(engine.ltv_bounds, dtype=float), np.nan_to_num(cols.aov), side="right")
+    ltv = np.where(cols.ltv_override != "", cols.ltv_override,
+                   np.where(cols.aov_missing, rules.ltv_unknown, labels[tier]))
+    discount = (cols.discount_vocab.masks(engine.discount) != 0)[cols.discount_code]
+
+    owner = cols.browse_owner
+    browse_mask = cols.browse_vocab.masks(engine.browse)[cols.browse_code]
+    recommendations, lists = _recommendations(engine, cols, browse_mask)
+
+    days_known = cols.days >= 0
+    unknown = ~days_known & cols.last_purchase_none
+    churn = np.where(unknown, ~cols.has_purchases, days_known & (cols.days > rules.churn_days))
+
+    purchase_mask = cols.purchase_vocab.masks(engine.purchase)[cols.purchase_code]
+    cross_sell = np.zeros(n, dtype=bool)
+    for bit in range(len(rules.cross_sell)):
+        bought = ((purchase_mask >> bit) & 1).astype(bool)
+        browsed = ((browse_mask >> (engine.cross_shift + bit)) & 1).astype(bool)
+        cross_sell |= _any_per_owner(cols.purchase_owner, bought, n) & _any_per_owner(owner, browsed, n)
+
+    return {
+        "ltv_segment": ltv,
+        "discount_sensitive": discount,
+        "recommendations": recommendations,
+        "recommendation_lists": lists,
+        "loyalty_flag": cols.brand_count == 1,
+        "churn_risk": churn,
+        "cross_sell_opportunity": cross_sell,
+        "needs_more_data": cols.needs_more_data,
+    }
+
+
+def iter_profiles(cols):
+    """Yield one profile dict per customer, identical to cols.engine.profile()'s output.
+
+    Profiles take few distinct values, so one template is built per distinct
+    combination and each customer gets a copy of its template.
+    """
+    out = evaluate(cols)
+    ltv_codes = {}
+    ltv_code = np.fromiter((ltv_codes.setdefault(v, len(ltv_codes)) for v in out["ltv_segment"].tolist()),
+                           np.int64, cols.n)
+    recs = out["recommendations"]
+    key = ltv_code * (int(recs.max(initial=0)) + 1) + recs
+    for name in ("discount_sensitive", "loyalty_flag", "churn_risk", "cross_sell_opportunity", "needs_more_data"):
+        key = key * 2 + out[name]
+    _, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+    templates = [{k: out[k][i:i + 1].tolist()[0] for k in PROFILE_KEYS} for i in first.tolist()]
+    for t in templates:
+        t["recommendations"] = out["recommendation_lists"][t["recommendations"]]
+    for i in inverse.tolist():
+        profile = templates[i].copy()
+        profile["recommendations"] = profile["recommendations"][:]
+        yield profile
+
+
+def generate_profiles(records, engine=None):
+    """Batch counterpart of generate_profile() for a list of customer dicts."""
+    return list(iter_profiles(CustomerColumns.from_records(records, engine)))
+
+
+def iter_jsonl_profiles(lines, batch_size=50_000, engine=None):
+    """Stream profiles for a JSONL source (an open file or any iterable of lines), batch by batch."""
+    batch = []
+    for line in lines:
+        if line.strip():
+            batch.append(json.loads(line))
+        if len(batch) >= batch_size:
+            yield from iter_profiles(CustomerColumns.from_records(batch, engine))
+            batch = []
+    if batch:
+        yield from iter_profiles(CustomerColumns.from_records(batch, engine))
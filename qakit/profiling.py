@@ -0,0 +1,232 @@
+import json
+import os
+import threading
+import time
+
+import psycopg2
+import psycopg2.extensions
+
+# Set by StepProfiler; qakit.db.get_conn() then counts connections and hands out CountingCursors
+ENABLED = False
+PROFILE_DIR = os.environ.get('QA_PROFILE_DIR', os.path.join('reports', 'profile'))
+TOP_STATEMENTS = 10
+
+COUNTER_NAMES = ('round_trips', 'connections', 'rows_read', 'rows_written')
+
+
+class Counters:
+    """Process-wide DB activity counters, shared by every thread (pool workers included)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.values = dict.fromkeys(COUNTER_NAMES, 0)
+
+    def add(self, name, n=1):
+        with self._lock:
+            self.values[name] += n
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.values)
+
+
+COUNTERS = Counters()
+
+
+class CountingCursor(psycopg2.extensions.cursor):
+    """Cursor that counts round trips and rows read/written into COUNTERS.
+
+    executemany() is counted once per parameter set (psycopg2 sends each
+    separately); fetches on a named (server-side) cursor are round trips too.
+    Activity in child processes (e.g. populate() shards) is not counted.
+    """
+
+    def execute(self, query, vars=None):
+        COUNTERS.add('round_trips')
+        try:
+            return super().execute(query, vars)
+        finally:
+            self._count_written()
+
+    def executemany(self, query, vars_list):
+        vars_list = list(vars_list)
+        COUNTERS.add('round_trips', len(vars_list))
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            self._count_written()
+
+    def callproc(self, procname, parameters=None):
+        COUNTERS.add('round_trips')
+        return super().callproc(procname, parameters)
+
+    def copy_expert(self, sql, file, size=8192):
+        COUNTERS.add('round_trips')
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            if self.rowcount > 0:
+                COUNTERS.add('rows_read' if 'STDOUT' in sql.upper() else 'rows_written', self.rowcount)
+
+    def copy_from(self, file, table, *args, **kwargs):
+        COUNTERS.add('round_trips')
+        try:
+            return super().copy_from(file, table, *args, **kwargs)
+        finally:
+            if self.rowcount > 0:
+                COUNTERS.add('rows_written', self.rowcount)
+
+    def _count_written(self):
+        if self.description is None and self.rowcount > 0:
+            COUNTERS.add('rows_written', self.rowcount)
+
+    def _count_read(self, rows, many):
+        if self.name:
+            COUNTERS.add('round_trips')
+        if many:
+            COUNTERS.add('rows_read', len(rows))
+        elif rows is not None:
+            COUNTERS.add('rows_read')
+        return rows
+
+    def fetchone(self):
+        return self._count_read(super().fetchone(), False)
+
+    def fetchmany(self, size=None):
+        return self._count_read(super().fetchmany(size) if size is not None else super().fetchmany(), True)
+
+    def fetchall(self):
+        return self._count_read(super().fetchall(), True)
+
+    def __iter__(self):
+        while True:
+            rows = self.fetchmany(self.itersize)
+            if not rows:
+                return
+            yield from rows
+
+
+PGSS_SQL = '''SELECT queryid, query, calls, {time_col}, rows, shared_blks_hit, shared_blks_read
+FROM pg_stat_statements WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())'''
+
+
+class StatementStats:
+    """pg_stat_statements snapshots on a dedicated, uncounted connection; unavailable() if the extension is missing."""
+
+    def __init__(self, connect):
+        self.conn = None
+        self.sql = None
+        try:
+            self.conn = connect()
+            self.conn.autocommit = True
+            with self.conn.cursor() as cur:
+                cur.execute("SELECT attname FROM pg_attribute WHERE attrelid = to_regclass('pg_stat_statements') "
+                            "AND attname IN ('total_exec_time', 'total_time')")
+                cols = [r[0] for r in cur.fetchall()]
+            if cols:
+                self.sql = PGSS_SQL.format(time_col=cols[0])
+                # the view exists whenever the extension is created, but reading it fails unless the
+                # library is in shared_preload_libraries; find out now rather than in every step hook
+                with self.conn.cursor() as cur:
+                    cur.execute(self.sql)
+        except psycopg2.Error:
+            self.sql = None
+            self.close()
+
+    def unavailable(self):
+        return self.sql is None
+
+    def snapshot(self):
+        if self.sql is None:
+            return {}
+        with self.conn.cursor() as cur:
+            cur.execute(self.sql)
+            return {row[0]: row[1:] for row in cur.fetchall()}
+
+    def close(self):
+        if self.conn is not None and not self.conn.closed:
+            self.conn.close()
+
+
+def statement_deltas(before, after, top=TOP_STATEMENTS):
+    """Statements whose counters moved between two snapshots, most total time first."""
+    out = []
+    for queryid, (query, calls, ms, rows, hit, read) in after.items():
+        prev = before.get(queryid)
+        if prev:
+            calls, ms, rows, hit, read = calls - prev[1], ms - prev[2], rows - prev[3], hit - prev[4], read - prev[5]
+        if calls > 0:
+            out.append({'query': ' '.join(query.split())[:200], 'calls': calls, 'ms': round(ms, 3), 'rows': rows,
+                        'shared_blks_hit': hit, 'shared_blks_read': read})
+    out.sort(key=lambda s: -s['ms'])
+    return out[:top]
+
+
+class StepProfiler:
+    """Records wall time and DB counters for nested feature/scenario/step spans.
+
+    begin()/end() are called from the behave hooks; spans are kept as
+    Chrome trace 'complete' events, so the output opens in Perfetto,
+    chrome://tracing or speedscope as a flame chart. Steps additionally get
+    pg_stat_statements deltas when the extension is installed.
+    """
+
+    def __init__(self, statements=None, clock=time.perf_counter):
+        global ENABLED
+        ENABLED = True
+        self.clock = clock
+        self.origin = clock()
+        self.statements = statements
+        self.events = []
+        self._stack = []
+
+    def begin(self, cat, name):
+        pgss = self.statements.snapshot() if cat == 'step' and self.statements else None
+        self._stack.append((cat, name, self.clock(), COUNTERS.snapshot(), pgss))
+
+    def end(self, status=None):
+        cat, name, start, counters, pgss = self._stack.pop()
+        end = self.clock()
+        after = COUNTERS.snapshot()
+        args = {k: after[k] - counters[k] for k in COUNTER_NAMES}
+        if status is not None:
+            args['status'] = status
+        if pgss is not None:
+            args['statements'] = statement_deltas(pgss, self.statements.snapshot())
+        event = {'name': name, 'cat': cat, 'ph': 'X', 'ts': round((start - self.origin) * 1e6),
+                 'dur': round((end - start) * 1e6), 'pid': os.getpid(), 'tid': 0, 'args': args}
+        self.events.append(event)
+        return event
+
+    def steps(self):
+        return [e for e in self.events if e['cat'] == 'step']
+
+    def slowest(self, n=10):
+        return sorted(self.steps(), key=lambda e: -e['dur'])[:n]
+
+    def write(self, directory=PROFILE_DIR):
+        """Write steps.json (one record per step) and trace.json (Chrome trace); returns their paths."""
+        os.makedirs(directory, exist_ok=True)
+        steps_path = os.path.join(directory, 'steps.json')
+        trace_path = os.path.join(directory, 'trace.json')
+        records = [dict(e['args'], step=e['name'], start=e['ts'] / 1e6, seconds=e['dur'] / 1e6) for e in self.steps()]
+        with open(steps_path, 'w') as f:
+            json.dump(records, f, indent=2)
+        with open(trace_path, 'w') as f:
+            json.dump({'traceEvents': sorted(self.events, key=lambda e: (e['ts'], -e['dur'])),
+                       'displayTimeUnit': 'ms'}, f)
+        return steps_path, trace_path
+
+    def summary(self, n=5):
+        lines = [f'profile: {len(self.steps())} steps']
+        for e in self.slowest(n):
+            a = e['args']
+            lines.append(f"  {e['dur'] / 1e6:8.3f}s  {a['round_trips']:6d} round trips  {a['rows_read']:>10,} read  "
+                         f"{a['rows_written']:>10,} written  {e['name']}")
+        return '\n'.join(lines)
+
+    def close(self):
+        global ENABLED
+        ENABLED = False
+        if self.statements:
+            self.statements.close()
@@ -0,0 +1,214 @@
+"""Declarative customer-profile rules compiled into a single-pass evaluator.
+
+A RuleSet lists thresholds and keyword categories as data (RuleSet.from_dict
+accepts the JSON form). compile_rules() builds one Aho-Corasick automaton
+per text field, so each browsing item, purchase name and discount text is
+scanned once, in time linear in its length, however many categories there
+are. Scan results are memoized per distinct string.
+"""
+import json
+import re
+from bisect import bisect_right
+
+DAYS_AGO_RE = re.compile(r"(\d+)\s+days\s+ago")
+SCAN_CACHE_SIZE = 65_536
+# below this many keywords a few C-level `in` checks beat walking the automaton in Python
+DIRECT_SCAN_KEYWORDS = 8
+
+
+def parse_days_ago(text):
+    if not text:
+        return None
+    m = DAYS_AGO_RE.match(text)
+    if m:
+        return int(m.group(1))
+    return None
+
+
+class KeywordAutomaton:
+    """Aho-Corasick matcher: scan(text) returns a bitmask of the keyword groups occurring in text.
+
+    `groups` is a list of keyword lists; bit i is set when any keyword of
+    groups[i] is a substring of text.lower().
+    """
+
+    def __init__(self, groups):
+        pairs = [(k.lower(), 1 << bit) for bit, keywords in enumerate(groups) for k in keywords]
+        self._direct = pairs if len(pairs) <= DIRECT_SCAN_KEYWORDS else None
+        self.goto = [{}]
+        self.out = [0]
+        for bit, keywords in enumerate(groups):
+            for keyword in keywords:
+                state = 0
+                for ch in keyword.lower():
+                    nxt = self.goto[state].get(ch)
+                    if nxt is None:
+                        nxt = self.goto[state][ch] = len(self.goto)
+                        self.goto.append({})
+                        self.out.append(0)
+                    state = nxt
+                self.out[state] |= 1 << bit
+        # breadth-first failure links; each state also reports its failure chain's outputs
+        self.fail = [0] * len(self.goto)
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for ch, nxt in self.goto[state].items():
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0) if state else 0
+                self.out[nxt] |= self.out[self.fail[nxt]]
+                queue.append(nxt)
+        self.all = (1 << len(groups)) - 1
+        self._cache = {}
+
+    def scan(self, text):
+        mask = self._cache.get(text)
+        if mask is not None:
+            return mask
+        mask = 0
+        if self._direct is not None:
+            lowered = text.lower()
+            for keyword, bit in self._direct:
+                if keyword in lowered:
+                    mask |= bit
+        else:
+            goto, fail, out = self.goto, self.fail, self.out
+            state = 0
+            for ch in text.lower():
+                while state and ch not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(ch, 0)
+                mask |= out[state]
+                if mask == self.all:
+                    break
+        if len(self._cache) >= SCAN_CACHE_SIZE:
+            self._cache.clear()
+        self._cache[text] = mask
+        return mask
+
+
+class Category:
+    """Recommend `label` once per browsing entry whose item mentions a keyword and whose count exceeds count_above."""
+
+    def __init__(self, label, keywords, count_above=0):
+        self.label = label
+        self.keywords = tuple(keywords)
+        self.count_above = count_above
+
+
+class CrossSell:
+    """Cross-sell signal: some purchase name mentions `purchased` and some browsed item mentions `browsed`."""
+
+    def __init__(self, name, purchased, browsed):
+        self.name = name
+        self.purchased = tuple(purchased)
+        self.browsed = tuple(browsed)
+
+
+class RuleSet:
+    def __init__(self, ltv_thresholds, ltv_default, ltv_unknown, discount_keywords, churn_days, required_fields,
+                 recommendations=(), cross_sell=()):
+        self.ltv_thresholds = tuple((float(t), label) for t, label in ltv_thresholds)  # (minimum aov, segment)
+        self.ltv_default = ltv_default
+        self.ltv_unknown = ltv_unknown
+        self.discount_keywords = tuple(discount_keywords)
+        self.churn_days = churn_days
+        self.required_fields = tuple(required_fields)
+        self.recommendations = tuple(recommendations)
+        self.cross_sell = tuple(cross_sell)
+
+    @classmethod
+    def from_dict(cls, spec):
+        return cls(
+            ltv_thresholds=spec["ltv"]["thresholds"], ltv_default=spec["ltv"]["default"],
+            ltv_unknown=spec["ltv"]["unknown"], discount_keywords=spec["discount_keywords"],
+            churn_days=spec["churn_days"], required_fields=spec["required_fields"],
+            recommendations=[Category(c["label"], c["keywords"], c.get("count_above", 0))
+                             for c in spec.get("recommendations", [])],
+            cross_sell=[CrossSell(c["name"], c["purchased"], c["browsed"]) for c in spec.get("cross_sell", [])])
+
+    def as_dict(self):
+        """The JSON form from_dict() accepts."""
+        return {
+            "ltv": {"thresholds": [list(t) for t in self.ltv_thresholds], "default": self.ltv_default,
+                    "unknown": self.ltv_unknown},
+            "discount_keywords": list(self.discount_keywords), "churn_days": self.churn_days,
+            "required_fields": list(self.required_fields),
+            "recommendations": [{"label": c.label, "keywords": list(c.keywords), "count_above": c.count_above}
+                                for c in self.recommendations],
+            "cross_sell": [{"name": x.name, "purchased": list(x.purchased), "browsed": list(x.browsed)}
+                           for x in self.cross_sell]}
+
+    @classmethod
+    def from_json(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+class CompiledRules:
+    """A RuleSet turned into automata and lookup tables; profile(data) makes one pass over each list."""
+
+    def __init__(self, rules):
+        self.rules = rules
+        thresholds = sorted(rules.ltv_thresholds)
+        self.ltv_bounds = [t for t, _ in thresholds]
+        self.ltv_labels = [rules.ltv_default] + [label for _, label in thresholds]
+        self.discount = KeywordAutomaton([rules.discount_keywords])
+        n_recs = len(rules.recommendations)
+        # browsing bits: one per recommendation category, then one per cross-sell rule
+        self.browse = KeywordAutomaton([c.keywords for c in rules.recommendations] +
+                                       [x.browsed for x in rules.cross_sell])
+        self.purchase = KeywordAutomaton([x.purchased for x in rules.cross_sell])
+        self.recs = [(c.label, c.count_above) for c in rules.recommendations]
+        self.rec_mask = (1 << n_recs) - 1
+        self.cross_shift = n_recs
+
+    def ltv_segment(self, aov):
+        if aov is None:
+            return self.rules.ltv_unknown
+        return self.ltv_labels[bisect_right(self.ltv_bounds, aov)]
+
+    def profile(self, data):
+        rules = self.rules
+        profile = {}
+        profile["ltv_segment"] = data.get("ltv_segment") or self.ltv_segment(data.get("aov"))
+        profile["discount_sensitive"] = bool(self.discount.scan(data.get("discount_sensitivity") or ""))
+
+        recommendations = []
+        browsed = 0
+        for b in data.get("browsing", []):
+            mask = self.browse.scan(b.get("item", ""))
+            browsed |= mask
+            matched = mask & self.rec_mask
+            if matched:
+                count = b.get("count", 0)
+                while matched:  # visit only the matched categories, lowest bit (declaration order) first
+                    low = matched & -matched
+                    label, count_above = self.recs[low.bit_length() - 1]
+                    if count > count_above:
+                        recommendations.append(label)
+                    matched ^= low
+        profile["recommendations"] = recommendations
+
+        brands = data.get("brand_affinity", []) or []
+        profile["loyalty_flag"] = bool(brands) and len(brands) == 1
+
+        last_purchase = data.get("last_purchase")
+        days = parse_days_ago(last_purchase) if isinstance(last_purchase, str) else None
+        if days is None and last_purchase is None:
+            profile["churn_risk"] = not data.get("purchases")
+        else:
+            profile["churn_risk"] = days is not None and days > rules.churn_days
+
+        purchased = 0
+        for p in data.get("purchases", []):
+            purchased |= self.purchase.scan(p.get("name", ""))
+        profile["cross_sell_opportunity"] = bool(purchased & (browsed >> self.cross_shift))
+
+        profile["needs_more_data"] = any(data.get(k) in (None, [], "") for k in rules.required_fields)
+        return profile
+
+
+def compile_rules(rules):
+    return CompiledRules(rules)
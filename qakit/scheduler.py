@@ -0,0 +1,435 @@
+"""Run the behave suite within a wall-clock budget, most important scenarios first, skipping unchanged ones.
+
+Every scenario gets a fingerprint: its steps' text (background included),
+the features' environment.py hooks, and the full source of every repo
+module holding a step function it matches or a function/class those
+reach, plus the modules the constants they read were imported from. A
+scenario whose fingerprint passed before against the same dataset is not
+re-run; its cached result is reported instead. The dataset key covers
+the target database, the seed and date anchor, the snapshot fingerprint
+(QA_SNAPSHOT_ROWS) and every other QA_* setting.
+
+The remaining scenarios are ranked by severity, then by past duration
+(shortest first). Severity comes from test_plan.csv via @plan-<id> tags,
+or from a @severity-<level> tag; untagged scenarios are Medium. Critical
+scenarios always run. The others are admitted while their expected
+durations fit the budget, then run one behave process per severity tier.
+Tiers that no longer fit once the budget is spent are deferred.
+
+Usage: python -m qakit.scheduler [--budget SECONDS] [--plan test_plan.csv] [--no-cache] [--dry-run] [paths ...] [-- behave args]
+"""
+import argparse
+import ast
+import csv
+import datetime
+import hashlib
+import inspect
+import json
+import os
+import subprocess
+import sys
+import time
+import types
+from functools import lru_cache
+
+from behave.model import Step
+from behave.parser import parse_file
+from behave.runner_util import exec_file, load_step_modules
+from behave.step_registry import registry
+
+from qakit.db import TRANSACTIONS_DDL, conn_params
+from qakit.generator import data_now, seed_from_env
+from qakit.parallel_runner import merge_reports
+from qakit.snapshots import fingerprint as dataset_fingerprint
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPORT_DIR = os.environ.get('QA_SCHEDULE_REPORT_DIR', os.path.join('reports', 'scheduler'))
+PLAN_PATH = 'test_plan.csv'
+SEVERITIES = ('Critical', 'High', 'Medium', 'Low')
+DEFAULT_SEVERITY = 'Medium'
+# results that may be reused; anything else runs again
+REUSABLE = ('passed',)
+STEP_KEYWORDS = ('given', 'when', 'then', 'and', 'but')
+
+
+def load_plan(path=PLAN_PATH):
+    """{id: severity} from test_plan.csv; {} if the file is missing."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, newline='') as f:
+        return {row['id']: row['severity'].strip().capitalize() for row in csv.DictReader(f)}
+
+
+def severity(tags, plan):
+    """Most severe level named by the tags: @plan-<id> looks the id up in the plan, @severity-<level> names it."""
+    found = []
+    for tag in tags:
+        if tag.startswith('plan-') and tag[5:] in plan:
+            found.append(plan[tag[5:]])
+        elif tag.startswith('severity-'):
+            found.append(tag[9:].capitalize())
+    found = [s for s in found if s in SEVERITIES]
+    return min(found, key=SEVERITIES.index) if found else DEFAULT_SEVERITY
+
+
+# --- fingerprints ---
+
+def _in_repo(obj):
+    code = getattr(obj, '__code__', None)
+    if code:
+        path = os.path.abspath(code.co_filename)
+        return path.startswith(ROOT + os.sep) and 'site-packages' not in path
+    module = sys.modules.get(getattr(obj, '__module__', None))
+    return module is not None and _in_repo_module(module)
+
+
+def _in_repo_module(module):
+    path = os.path.abspath(getattr(module, '__file__', None) or '')
+    return path.startswith(ROOT + os.sep) and 'site-packages' not in path
+
+
+@lru_cache(maxsize=None)
+def _read(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+@lru_cache(maxsize=None)
+def _imported_names(path):
+    """{name: module} for the module-level `from x import name` statements in a source file."""
+    names = {}
+    for node in ast.parse(_read(path)).body:
+        if isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.update({alias.asname or alias.name: node.module for alias in node.names})
+    return names
+
+
+def _names(code):
+    names, strings = set(code.co_names), []
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            inner, inner_strings = _names(const)
+            names |= inner
+            strings += inner_strings
+        elif isinstance(const, str):
+            strings.append(const)
+    return names, strings
+
+
+def _nested_steps(strings):
+    # literal context.execute_steps('Given ...') texts
+    for text in strings:
+        for line in text.splitlines():
+            keyword, _, name = line.strip().partition(' ')
+            if keyword.lower() in STEP_KEYWORDS and name:
+                yield Step('<execute_steps>', 0, keyword, 'given' if keyword.lower() in ('and', 'but') else keyword.lower(), name)
+
+
+def source_closure(funcs):
+    """{qualified name or file: source} of funcs, the repo functions/classes and nested steps they refer to,
+    and every repo module file involved.
+
+    Whole module files are included so module-level constants (DDL, SQL
+    templates, thresholds) count too; a constant imported from another
+    repo module pulls that module's file in as well.
+    """
+    sources = {}
+    files = set()
+    pending = list(funcs)
+    while pending:
+        obj = pending.pop()
+        if not _in_repo(obj):
+            continue
+        code = getattr(obj, '__code__', None)
+        key = f"{code.co_filename if code else obj.__module__}:{obj.__qualname__}"
+        if key in sources:
+            continue
+        path = os.path.abspath(code.co_filename if code else sys.modules[obj.__module__].__file__)
+        files.add(path)
+        try:
+            sources[key] = inspect.getsource(obj)
+        except (OSError, TypeError):
+            # classes built at runtime (namedtuple and the like) have no source of their own
+            sources[key] = repr(obj)
+            continue
+        if isinstance(obj, type):
+            codes = [m.__code__ for m in vars(obj).values() if isinstance(m, types.FunctionType)]
+            namespace = vars(sys.modules[obj.__module__])
+        else:
+            codes, namespace = [code], obj.__globals__
+        for c in codes:
+            names, strings = _names(c)
+            for name in names:
+                value = namespace.get(name)
+                if isinstance(value, types.ModuleType) and _in_repo_module(value):
+                    # module.attr: follow the attributes the code names, and the module's own constants
+                    files.add(os.path.abspath(value.__file__))
+                    pending.extend(getattr(value, n) for n in names if isinstance(getattr(value, n, None), (types.FunctionType, type)))
+                elif isinstance(value, (types.FunctionType, type)):
+                    pending.append(value)
+                elif name in namespace:
+                    origin = sys.modules.get(_imported_names(path).get(name))
+                    if origin is not None and _in_repo_module(origin):
+                        files.add(os.path.abspath(origin.__file__))
+            for step in _nested_steps(strings):
+                match = registry.find_match(step)
+                if match:
+                    pending.append(match.func)
+    for path in files:
+        sources[os.path.relpath(path, ROOT)] = _read(path)
+    return sources
+
+
+def environment_sources(path):
+    """source_closure() of the hooks in a behave environment.py, which run around every scenario."""
+    if not os.path.exists(path):
+        return {}
+    path = os.path.abspath(path)
+    namespace = {}
+    exec_file(path, namespace)
+    hooks = [v for v in namespace.values() if isinstance(v, types.FunctionType) and v.__code__.co_filename == path]
+    return dict(source_closure(hooks), **{os.path.relpath(path, ROOT): _read(path)})
+
+
+class ScenarioInfo:
+    def __init__(self, scenario, feature_path, plan, shared_sources=None):
+        self.location = str(scenario.location)
+        self.key = f'{feature_path}::{scenario.name}'
+        self.name = scenario.name
+        self.tags = sorted(scenario.effective_tags)
+        self.severity = severity(self.tags, plan)
+        self.steps = list(scenario.all_steps)
+        self.undefined = []
+        funcs = []
+        for step in self.steps:
+            match = registry.find_match(step)
+            if match:
+                funcs.append(match.func)
+            else:
+                self.undefined.append(f'{step.keyword} {step.name}')
+        sha = hashlib.sha256()
+        sha.update(f'{self.name}\n{self.tags}\n'.encode('utf-8'))
+        for step in self.steps:
+            table = [list(step.table.headings)] + [list(r) for r in step.table] if step.table else None
+            sha.update(json.dumps([step.step_type, step.name, step.text, table]).encode('utf-8'))
+        sources = dict(shared_sources or {}, **source_closure(funcs))
+        for key, source in sorted(sources.items()):
+            sha.update(f'{key}\n{source}'.encode('utf-8'))
+        self.fingerprint = sha.hexdigest()[:20]
+
+
+def discover(paths=('features',), steps_dir=None, plan=None):
+    """ScenarioInfo for every scenario under paths, in file order (outline rows one by one)."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in sorted(os.walk(path)):
+                files.extend(os.path.join(root, n) for n in sorted(names) if n.endswith('.feature'))
+        else:
+            files.append(path)
+    base_dir = os.path.dirname(files[0]) if files else 'features'
+    if not registry.steps['given']:
+        load_step_modules([steps_dir or os.path.join(base_dir, 'steps')])
+    plan = load_plan() if plan is None else plan
+    hooks = environment_sources(os.path.join(base_dir, 'environment.py'))
+    scenarios = []
+    for path in files:
+        feature = parse_file(path)
+        if feature is not None:
+            scenarios.extend(ScenarioInfo(s, path, plan, hooks) for s in feature.walk_scenarios())
+    return scenarios
+
+
+def dataset_key():
+    """Identity of the data the suite runs against; changing any of it invalidates every cached result."""
+    params = conn_params()
+    rows = os.environ.get('QA_SNAPSHOT_ROWS')
+    spec = {
+        'database': [params['host'], params['port'], params['dbname']],
+        'seed': seed_from_env(),
+        'now': data_now(seed_from_env()),
+        'snapshot': dataset_fingerprint(int(rows), seed_from_env(), TRANSACTIONS_DDL) if rows else None,
+        'settings': {k: v for k, v in sorted(os.environ.items()) if k.startswith('QA_') and not k.startswith('QA_SCHEDULE')},
+    }
+    return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
+
+# --- cache of results and durations ---
+
+class ResultCache:
+    """JSON file: cached results by (fingerprint, dataset) and the last duration per scenario key."""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(REPORT_DIR, 'cache.json')
+        self.data = {'results': {}, 'durations': {}}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.data = json.load(f)
+
+    def lookup(self, scenario, dataset):
+        entry = self.data['results'].get(f'{scenario.fingerprint}:{dataset}')
+        return entry if entry and entry['status'] in REUSABLE else None
+
+    def duration(self, scenario):
+        return self.data['durations'].get(scenario.key)
+
+    def record(self, scenario, dataset, status, seconds):
+        self.data['results'][f'{scenario.fingerprint}:{dataset}'] = {
+            'location': scenario.location, 'status': status, 'seconds': round(seconds, 3),
+            'at': datetime.datetime.now().isoformat(timespec='seconds')}
+        self.data['durations'][scenario.key] = round(seconds, 3)
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(tmp, self.path)
+
+
+# --- planning ---
+
+class Schedule:
+    def __init__(self, budget):
+        self.budget = budget
+        self.reused = []    # (scenario, cached entry)
+        self.selected = []  # (scenario, expected seconds), in run order
+        self.deferred = []  # (scenario, expected seconds)
+
+    @property
+    def expected_seconds(self):
+        return sum(s for _, s in self.selected)
+
+    def tiers(self):
+        """Selected scenarios grouped by severity, most severe first: [(severity, [scenario, ...])]."""
+        groups = {}
+        for scenario, _ in self.selected:
+            groups.setdefault(scenario.severity, []).append(scenario)
+        return [(level, groups[level]) for level in SEVERITIES if level in groups]
+
+    def summary(self):
+        return {'budget_seconds': self.budget, 'expected_seconds': round(self.expected_seconds, 2),
+                'selected': [s.location for s, _ in self.selected], 'reused': [s.location for s, _ in self.reused],
+                'deferred': [s.location for s, _ in self.deferred]}
+
+
+def plan_run(scenarios, cache=None, dataset=None, budget=None, reuse=True):
+    """Reuse unchanged passes, then order the rest by (severity, expected duration) and fill the budget.
+
+    Scenarios never timed count as the median known duration (1s if none
+    is known). Critical scenarios are selected even when they overrun it.
+    """
+    schedule = Schedule(budget)
+    todo = []
+    for scenario in scenarios:
+        entry = cache.lookup(scenario, dataset) if cache and reuse else None
+        if entry:
+            schedule.reused.append((scenario, entry))
+        else:
+            todo.append(scenario)
+    known = sorted(d for d in (cache.duration(s) if cache else None for s in todo) if d is not None)
+    default = known[len(known) // 2] if known else 1.0
+    order = {s.location: i for i, s in enumerate(scenarios)}
+    expected = {s.location: (cache.duration(s) if cache else None) or default for s in todo}
+    ranked = sorted(todo, key=lambda s: (SEVERITIES.index(s.severity), expected[s.location], order[s.location]))
+    spent = 0.0
+    for scenario in ranked:
+        seconds = expected[scenario.location]
+        if scenario.severity == 'Critical' or budget is None or spent + seconds <= budget:
+            schedule.selected.append((scenario, seconds))
+            spent += seconds
+        else:
+            schedule.deferred.append((scenario, seconds))
+    return schedule
+
+
+# --- running ---
+
+def scenario_results(features, locations):
+    """{location: (status, seconds)} for the given locations in a behave JSON report (background time included)."""
+    results = {}
+    for feature in merge_reports([(locations, features)]):
+        background = 0.0
+        for element in feature['elements']:
+            seconds = sum(s.get('result', {}).get('duration', 0.0) for s in element.get('steps', []))
+            if element.get('type') == 'background':
+                background = seconds
+                continue
+            results[element['location']] = (element.get('status', 'untested'), background + seconds)
+            background = 0.0
+    return results
+
+
+def run_tier(index, level, scenarios, behave_args=(), report_dir=REPORT_DIR):
+    """One behave process over a tier's locations; returns (exit code, seconds, {location: (status, seconds)})."""
+    locations = [s.location for s in scenarios]
+    report = os.path.join(report_dir, f'tier_{index}_{level.lower()}.json')
+    cmd = [sys.executable, '-m', 'behave', '--no-capture', '-f', 'json', '-o', report, '-f', 'progress',
+           *behave_args, *locations]
+    start = time.perf_counter()
+    code = subprocess.call(cmd)
+    seconds = time.perf_counter() - start
+    results = {}
+    if os.path.exists(report) and os.path.getsize(report):
+        with open(report) as f:
+            results = scenario_results(json.load(f), locations)
+    return code, seconds, results
+
+
+def run(paths=('features',), budget=None, plan_path=PLAN_PATH, use_cache=True, dry_run=False, behave_args=(),
+        report_dir=REPORT_DIR):
+    """Plan and run; returns a summary dict (also written to report_dir/summary.json)."""
+    os.makedirs(report_dir, exist_ok=True)
+    scenarios = discover(paths, plan=load_plan(plan_path))
+    cache = ResultCache(os.path.join(report_dir, 'cache.json'))
+    dataset = dataset_key()
+    # --no-cache still orders by the recorded durations, it just reuses nothing
+    schedule = plan_run(scenarios, cache, dataset, budget, reuse=use_cache)
+    summary = dict(schedule.summary(), dataset=dataset, dry_run=dry_run, statuses={}, exit_codes=[],
+                   severities={s.location: s.severity for s in scenarios})
+    if not dry_run:
+        start = time.perf_counter()
+        for index, (level, tier) in enumerate(schedule.tiers()):
+            elapsed = time.perf_counter() - start
+            if level != 'Critical' and budget is not None and elapsed >= budget:
+                summary['deferred'].extend(s.location for s in tier)
+                continue
+            code, _, results = run_tier(index, level, tier, behave_args, report_dir)
+            summary['exit_codes'].append(code)
+            for scenario in tier:
+                status, seconds = results.get(scenario.location, ('untested', 0.0))
+                summary['statuses'][scenario.location] = status
+                if status != 'untested':
+                    cache.record(scenario, dataset, status, seconds)
+            cache.save()
+        summary['wall_seconds'] = round(time.perf_counter() - start, 2)
+    for scenario, entry in schedule.reused:
+        summary['statuses'][scenario.location] = f"{entry['status']} (cached {entry['at']})"
+    critical = [s.location for s in scenarios if s.severity == 'Critical']
+    summary['critical_covered'] = all(loc in summary['statuses'] for loc in critical) if not dry_run else None
+    with open(os.path.join(report_dir, 'summary.json'), 'w') as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    behave_args = []
+    if '--' in argv:
+        split = argv.index('--')
+        argv, behave_args = argv[:split], argv[split + 1:]
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='*', default=['features'])
+    parser.add_argument('--budget', type=float, default=float(os.environ['QA_SCHEDULE_BUDGET'])
+                        if os.environ.get('QA_SCHEDULE_BUDGET') else None, help='wall-clock seconds')
+    parser.add_argument('--plan', default=PLAN_PATH)
+    parser.add_argument('--no-cache', action='store_true', help='run every selected scenario even if unchanged')
+    parser.add_argument('--dry-run', action='store_true', help='print the schedule without running it')
+    args = parser.parse_args(argv)
+    summary = run(args.paths, args.budget, args.plan, not args.no_cache, args.dry_run, behave_args)
+    print(json.dumps(summary, indent=2 if args.dry_run else None))
+    sys.exit(1 if any(summary['exit_codes']) or summary['critical_covered'] is False else 0)
+
+
+if __name__ == '__main__':
+    main()
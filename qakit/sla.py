@@ -0,0 +1,157 @@
+import datetime
+import json
+import os
+import re
+import statistics
+import time
+
+import psycopg2
+import psycopg2.errors
+
+HISTORY_PATH = os.environ.get('QA_SLA_HISTORY', os.path.join('reports', 'sla_history.json'))
+# a run regresses when its p95 exceeds the baseline p95 by this fraction and by at least MIN_REGRESSION_SECONDS
+REGRESSION_THRESHOLD = float(os.environ.get('QA_SLA_REGRESSION', 0.25))
+MIN_REGRESSION_SECONDS = 0.05
+BASELINE_WINDOW = 5
+# statement_timeout is this multiple of the SLA, so a query that misses its SLA is still measured
+CEILING_FACTOR = float(os.environ.get('QA_SLA_CEILING_FACTOR', 3))
+
+
+def query_key(query):
+    return re.sub(r'\s+', ' ', query.strip().rstrip(';')).lower()
+
+
+def percentile(values, pct):
+    """Linear-interpolated percentile of a non-empty list."""
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * pct / 100.0
+    lo = int(pos)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+
+
+class BenchmarkResult:
+    def __init__(self, query, timeout_seconds, ceiling_seconds=None):
+        self.query = query
+        self.timeout_seconds = timeout_seconds
+        self.ceiling_seconds = ceiling_seconds if ceiling_seconds is not None else timeout_seconds
+        self.latencies = []
+        self.timed_out = False
+        self.error = None
+        self.explain = None
+
+    def summary(self):
+        s = {'runs': len(self.latencies), 'timed_out': self.timed_out, 'error': self.error}
+        if self.latencies:
+            s.update({
+                'mean': statistics.fmean(self.latencies),
+                'p50': percentile(self.latencies, 50),
+                'p95': percentile(self.latencies, 95),
+                'p99': percentile(self.latencies, 99),
+                'max': max(self.latencies),
+            })
+        return s
+
+
+def _is_select(query):
+    return query.lstrip().lower().startswith(('select', 'with', 'table', 'values'))
+
+
+def run_benchmark(conn, query, timeout_seconds, runs=5, warmup=1, explain=True, ceiling_seconds=None):
+    """Run `query` warmup + runs times under a server-side statement_timeout.
+
+    The statement_timeout is a ceiling above the SLA (ceiling_seconds,
+    default CEILING_FACTOR x timeout_seconds): a query slower than its SLA
+    still completes and is measured, and only a runaway one is cancelled
+    by the server with QueryCanceled instead of hanging the suite.
+    Each execution is its own READ ONLY transaction, so a statement that
+    writes fails (ReadOnlySqlTransaction) rather than changing data on
+    every run. The first timeout stops the benchmark. For SELECTs a final
+    EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) is captured.
+    """
+    if ceiling_seconds is None:
+        ceiling_seconds = timeout_seconds * CEILING_FACTOR
+    result = BenchmarkResult(query, timeout_seconds, ceiling_seconds)
+    timeout_ms = int(ceiling_seconds * 1000)
+    for i in range(warmup + runs):
+        try:
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute('SET TRANSACTION READ ONLY')
+                    cur.execute('SET LOCAL statement_timeout = %s', (timeout_ms,))
+                    start = time.perf_counter()
+                    cur.execute(query)
+                    if cur.description is not None:
+                        cur.fetchall()
+                    elapsed = time.perf_counter() - start
+        except psycopg2.errors.QueryCanceled as e:
+            result.timed_out = True
+            result.error = str(e).strip()
+            return result
+        if i >= warmup:
+            result.latencies.append(elapsed)
+    if explain and _is_select(query):
+        try:
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute('SET TRANSACTION READ ONLY')
+                    cur.execute('SET LOCAL statement_timeout = %s', (timeout_ms,))
+                    cur.execute('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + query.strip().rstrip(';'))
+                    result.explain = cur.fetchone()[0]
+        except psycopg2.errors.QueryCanceled:
+            result.explain = None
+    return result
+
+
+class SlaHistory:
+    """JSON history of benchmark summaries per query, used as the regression baseline."""
+
+    def __init__(self, path=HISTORY_PATH):
+        self.path = path
+        self.data = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.data = json.load(f)
+
+    def baseline(self, query):
+        """Median p95 of the last BASELINE_WINDOW passing runs, or None."""
+        runs = [r['p95'] for r in self.data.get(query_key(query), {}).get('runs', []) if r.get('passed') and 'p95' in r]
+        return statistics.median(runs[-BASELINE_WINDOW:]) if runs else None
+
+    def record(self, result, passed):
+        entry = self.data.setdefault(query_key(result.query), {'query': result.query, 'runs': []})
+        summary = result.summary()
+        summary.update({'at': datetime.datetime.now().isoformat(timespec='seconds'),
+                        'timeout_seconds': result.timeout_seconds, 'ceiling_seconds': result.ceiling_seconds,
+                        'passed': passed})
+        entry['runs'].append(summary)
+        if result.explain is not None:
+            entry['last_explain'] = result.explain
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.data, f, indent=2, default=str)
+        os.replace(tmp, self.path)
+
+
+def sla_violations(result, baseline=None, threshold=REGRESSION_THRESHOLD):
+    """Human-readable reasons the result breaks its SLA or regressed; empty when it passes.
+
+    A run cancelled at the statement_timeout ceiling took longer than the
+    SLA, so it is a violation, and also a regression when a baseline exists.
+    """
+    s = result.summary()
+    problems = []
+    if result.timed_out:
+        problems.append(f'cancelled by statement_timeout after {result.ceiling_seconds}s, '
+                        f'beyond the {result.timeout_seconds}s SLA')
+        if baseline is not None:
+            problems.append(f'regressed from a baseline p95 of {baseline:.3f}s to a timeout')
+        return problems
+    if s['max'] > result.timeout_seconds:
+        problems.append(f"slowest run {s['max']:.3f}s exceeds the {result.timeout_seconds}s SLA")
+    if baseline is not None and s['p95'] > baseline * (1 + threshold) and s['p95'] - baseline > MIN_REGRESSION_SECONDS:
+        problems.append(f"p95 {s['p95']:.3f}s regressed more than {threshold:.0%} against baseline {baseline:.3f}s")
+    return problems
@@ -0,0 +1,278 @@
+"""Dataset snapshot cache: build a synthetic dataset once, clone it on later runs.
+
+A snapshot is keyed by a fingerprint of everything that shapes the data
+(row count, seed, generator distributions and source, DDL). In 'template'
+mode the dataset is built in its own database, frozen and marked
+IS_TEMPLATE, and each run gets a copy with CREATE DATABASE ... TEMPLATE
+(a file-level copy, no row regeneration). In 'dump' mode, for servers where
+the role cannot create databases, the dataset is built in the target
+database and saved with a parallel directory-format pg_dump, and later runs
+pg_restore it with the same parallelism. Entries beyond the disk or count
+limits are evicted least recently used first.
+
+Usage: python -m qakit.snapshots [--rows N] [--seed N] [--target DB] [--mode template|dump] [--list] [--clear]
+"""
+import argparse
+import datetime
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import subprocess
+import time
+import uuid
+
+from qakit import generator
+from qakit.db import TRANSACTIONS_DDL, conn_params, get_conn
+from qakit.population import populate
+
+REGISTRY_PATH = os.environ.get('QA_SNAPSHOT_REGISTRY', os.path.join('reports', 'snapshots', 'registry.json'))
+DUMP_DIR = os.environ.get('QA_SNAPSHOT_DIR', os.path.join('reports', 'snapshots'))
+MAX_BYTES = int(os.environ.get('QA_SNAPSHOT_MAX_BYTES', 20 * 2 ** 30))
+MAX_ENTRIES = int(os.environ.get('QA_SNAPSHOT_MAX_ENTRIES', 4))
+MAINTENANCE_DB = os.environ.get('QA_MAINTENANCE_DB', 'postgres')
+MODES = ('template', 'dump')
+
+
+def fingerprint(rows, seed, ddl=TRANSACTIONS_DDL):
+    """Stable key for a dataset: changes whenever rows, seed, date anchor, DDL or the generator would change the data."""
+    spec = {
+        'rows': rows,
+        'seed': seed,
+        'now': generator.data_now(seed),
+        'ddl': ' '.join(ddl.split()),
+        'distributions': [generator.COLUMNS, generator.USER_ID_MAX, generator.PRODUCT_ID_MAX, generator.AMOUNT_MIN,
+                          generator.AMOUNT_MAX, generator.CURRENCIES, generator.STATUSES, generator.REMARKS_NULL_RATE,
+                          generator.REMARKS_WORDS, str(generator.DATE_SPAN)],
+        'generator': hashlib.sha256(inspect.getsource(generator).encode('utf-8')).hexdigest(),
+    }
+    return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
+
+def template_name(fp):
+    return f'qa_tpl_{fp}'
+
+
+def _admin():
+    conn = get_conn(dbname=MAINTENANCE_DB)
+    conn.autocommit = True
+    return conn
+
+
+def _admin_execute(*statements):
+    conn = _admin()
+    try:
+        with conn.cursor() as cur:
+            for sql, params in statements:
+                cur.execute(sql, params)
+            return cur.fetchall() if cur.description else None
+    finally:
+        conn.close()
+
+
+def database_exists(name):
+    return bool(_admin_execute(('SELECT 1 FROM pg_database WHERE datname = %s', (name,))))
+
+
+def database_size(name):
+    rows = _admin_execute(('SELECT pg_database_size(%s)', (name,)))
+    return rows[0][0]
+
+
+def drop_database(name):
+    """Drop a database, clearing IS_TEMPLATE first (template databases cannot be dropped)."""
+    if database_exists(name):
+        _admin_execute((f'ALTER DATABASE "{name}" IS_TEMPLATE false', None), (f'DROP DATABASE "{name}"', None))
+
+
+def create_database(name, template=None, replace=True):
+    if replace:
+        drop_database(name)
+    suffix = f' TEMPLATE "{template}"' if template else ''
+    _admin_execute((f'CREATE DATABASE "{name}"{suffix}', None))
+
+
+def _dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+def pg_env():
+    params = conn_params()
+    env = dict(os.environ, PGHOST=params['host'], PGPORT=str(params['port']), PGUSER=params['user'])
+    if params['password']:
+        env['PGPASSWORD'] = params['password']
+    return env
+
+
+def build_dataset(dbname, rows, seed, ddl=TRANSACTIONS_DDL, marker_tag=None):
+    """Create the schema in `dbname` and fill it with `rows` generated rows; returns seconds taken."""
+    start = time.perf_counter()
+    conn = get_conn(dbname=dbname)
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute('DROP TABLE IF EXISTS sample_data.transactions')
+                cur.execute(ddl)
+    finally:
+        conn.close()
+    if rows:
+        populate(rows, marker_tag, seed=seed, conn_overrides={'dbname': dbname})
+    conn = get_conn(dbname=dbname)
+    try:
+        # frozen tuples and fresh statistics are copied into every clone
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute('VACUUM (FREEZE, ANALYZE) sample_data.transactions')
+    finally:
+        conn.close()
+    return time.perf_counter() - start
+
+
+class SnapshotResult:
+    def __init__(self, fp, target_db, hit, seconds, build_seconds, size_bytes):
+        self.fingerprint = fp
+        self.target_db = target_db
+        self.hit = hit
+        self.seconds = seconds
+        self.build_seconds = build_seconds
+        self.size_bytes = size_bytes
+
+    def summary(self):
+        verb = 'restored' if self.hit else 'built'
+        text = (f'dataset snapshot {self.fingerprint} {verb} into {self.target_db} in {self.seconds:.1f}s '
+                f'({self.size_bytes / 2 ** 20:,.0f} MB)')
+        if self.hit and self.seconds:
+            text += f'; regeneration took {self.build_seconds:.1f}s ({self.build_seconds / self.seconds:.1f}x slower)'
+        return text
+
+
+class SnapshotCache:
+    def __init__(self, mode='template', registry_path=REGISTRY_PATH, dump_dir=DUMP_DIR, max_bytes=MAX_BYTES,
+                 max_entries=MAX_ENTRIES, jobs=None):
+        if mode not in MODES:
+            raise ValueError(f'unknown snapshot mode {mode!r} (expected one of {MODES})')
+        self.mode = mode
+        self.registry_path = registry_path
+        self.dump_dir = dump_dir
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.jobs = jobs or os.cpu_count() or 1
+        self.entries = {}
+        if os.path.exists(registry_path):
+            with open(registry_path) as f:
+                self.entries = json.load(f)
+
+    def _save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.registry_path)), exist_ok=True)
+        tmp = self.registry_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(tmp, self.registry_path)
+
+    def _dump_path(self, fp):
+        return os.path.join(self.dump_dir, fp)
+
+    def _present(self, fp, entry):
+        if entry['mode'] == 'template':
+            return database_exists(template_name(fp))
+        return os.path.isdir(self._dump_path(fp))
+
+    def prepare(self, rows, seed, target_db, ddl=TRANSACTIONS_DDL):
+        """Make `target_db` hold the dataset, restoring a cached snapshot when one matches.
+
+        Template mode (re)creates target_db as a clone; dump mode restores
+        into the existing target_db, replacing sample_data.
+        """
+        fp = fingerprint(rows, seed, ddl)
+        entry = self.entries.get(fp)
+        if entry and entry['mode'] == self.mode and self._present(fp, entry):
+            start = time.perf_counter()
+            if self.mode == 'template':
+                create_database(target_db, template_name(fp))
+            else:
+                subprocess.run(['pg_restore', '--clean', '--if-exists', '--no-owner', '-j', str(self.jobs),
+                                '-d', target_db, self._dump_path(fp)], check=True, env=pg_env())
+            seconds = time.perf_counter() - start
+            entry['last_used'] = datetime.datetime.now().isoformat(timespec='seconds')
+            entry['restore_seconds'] = seconds
+            self._save()
+            return SnapshotResult(fp, target_db, True, seconds, entry['build_seconds'], entry['bytes'])
+
+        marker = str(uuid.uuid5(uuid.NAMESPACE_OID, f'qa-snapshot-{fp}'))
+        if self.mode == 'template':
+            building = template_name(fp) + '_build'
+            create_database(building)
+            try:
+                build_seconds = build_dataset(building, rows, seed, ddl, marker)
+            except BaseException:
+                drop_database(building)
+                raise
+            drop_database(template_name(fp))
+            _admin_execute((f'ALTER DATABASE "{building}" RENAME TO "{template_name(fp)}"', None),
+                           (f'ALTER DATABASE "{template_name(fp)}" IS_TEMPLATE true', None))
+            size = database_size(template_name(fp))
+            start = time.perf_counter()
+            create_database(target_db, template_name(fp))
+            build_seconds += time.perf_counter() - start
+        else:
+            build_seconds = build_dataset(target_db, rows, seed, ddl, marker)
+            path = self._dump_path(fp)
+            shutil.rmtree(path, ignore_errors=True)
+            os.makedirs(self.dump_dir, exist_ok=True)
+            subprocess.run(['pg_dump', '-Fd', '-j', str(self.jobs), '-n', 'sample_data', '-f', path, target_db],
+                           check=True, env=pg_env())
+            size = _dir_size(path)
+        now = datetime.datetime.now().isoformat(timespec='seconds')
+        self.entries[fp] = {'mode': self.mode, 'rows': rows, 'seed': seed, 'marker_tag': marker, 'bytes': size,
+                            'build_seconds': build_seconds, 'created': now, 'last_used': now}
+        self.evict(keep=fp)
+        self._save()
+        return SnapshotResult(fp, target_db, False, build_seconds, build_seconds, size)
+
+    def remove(self, fp):
+        entry = self.entries.pop(fp, None)
+        if entry is None:
+            return
+        if entry['mode'] == 'template':
+            drop_database(template_name(fp))
+        else:
+            shutil.rmtree(self._dump_path(fp), ignore_errors=True)
+        self._save()
+
+    def evict(self, keep=None):
+        """Drop least recently used snapshots until within max_entries and max_bytes; returns the evicted keys."""
+        evicted = []
+        by_age = sorted((e['last_used'], fp) for fp, e in self.entries.items() if fp != keep)
+        while by_age and (len(self.entries) > self.max_entries or
+                          sum(e['bytes'] for e in self.entries.values()) > self.max_bytes):
+            _, fp = by_age.pop(0)
+            self.remove(fp)
+            evicted.append(fp)
+        return evicted
+
+    def clear(self):
+        for fp in list(self.entries):
+            self.remove(fp)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10_000_001)
+    parser.add_argument('--seed', type=int, default=generator.seed_from_env())
+    parser.add_argument('--target', default=os.environ.get('QA_SNAPSHOT_DB', 'qa_run'))
+    parser.add_argument('--mode', choices=MODES, default=os.environ.get('QA_SNAPSHOT_MODE', 'template'))
+    parser.add_argument('--list', action='store_true', help='show cached snapshots and exit')
+    parser.add_argument('--clear', action='store_true', help='drop every cached snapshot and exit')
+    args = parser.parse_args(argv)
+    cache = SnapshotCache(mode=args.mode)
+    if args.list:
+        print(json.dumps(cache.entries, indent=2))
+    elif args.clear:
+        cache.clear()
+    else:
+        print(cache.prepare(args.rows, args.seed, args.target).summary())
+
+
+if __name__ == '__main__':
+    main()
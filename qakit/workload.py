@@ -0,0 +1,204 @@
+import datetime
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import psycopg2.extensions
+
+from qakit.integrity import ALLOWED_STATUSES
+from qakit.sla import percentile
+
+OPERATIONS = ('insert', 'update', 'read')
+DEFAULT_MIX = {'insert': 0.4, 'update': 0.4, 'read': 0.2}
+HOT_ROWS = 16
+INCREMENT = Decimal('0.01')
+MAX_RETRIES = 8
+# upper bounds in milliseconds; the last bucket is open-ended
+HISTOGRAM_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+RETRYABLE = {'40001': 'serialization_failures', '40P01': 'deadlocks'}
+
+INSERT_SQL = ('INSERT INTO sample_data.transactions (user_id, product_id, amount, currency, transaction_date, status, '
+              "remarks, marker_tag) VALUES (%s, %s, %s, 'USD', %s, 'pending', 'workload-insert', %s)")
+UPDATE_SQL = 'UPDATE sample_data.transactions SET amount = amount + %s, status = %s WHERE transaction_id = %s'
+READ_SQL = 'SELECT status, amount FROM sample_data.transactions WHERE transaction_id = %s'
+
+
+def histogram(latencies):
+    """Counts per HISTOGRAM_MS bucket (plus one overflow bucket) for latencies in seconds."""
+    counts = [0] * (len(HISTOGRAM_MS) + 1)
+    for seconds in latencies:
+        ms = seconds * 1000
+        for i, bound in enumerate(HISTOGRAM_MS):
+            if ms <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+    labels = [f'<={b}ms' for b in HISTOGRAM_MS] + [f'>{HISTOGRAM_MS[-1]}ms']
+    return dict(zip(labels, counts))
+
+
+def setup_hot_rows(pool, marker_tag, rows=HOT_ROWS):
+    """Insert the counter rows updates contend on; returns their transaction_ids."""
+    now = datetime.datetime.utcnow()
+    with pool.connection() as conn:
+        with conn:
+            with conn.cursor() as cur:
+                ids = []
+                for i in range(rows):
+                    cur.execute('INSERT INTO sample_data.transactions (user_id, product_id, amount, currency, '
+                                "transaction_date, status, remarks, marker_tag) VALUES (%s, %s, 0, 'USD', %s, "
+                                "'pending', 'workload-counter', %s) RETURNING transaction_id", (i, i, now, marker_tag))
+                    ids.append(cur.fetchone()[0])
+    return ids
+
+
+class ClientStats:
+    def __init__(self):
+        self.latencies = {op: [] for op in OPERATIONS}
+        self.attempts = 0
+        self.serialization_failures = 0
+        self.deadlocks = 0
+        self.failed = 0
+        self.inserted = 0
+        self.increments = {}
+
+
+def _run_client(pool, client_id, hot_ids, marker_tag, mix, operations, deadline, isolation, max_retries, seed, stop):
+    rng = random.Random(seed)
+    stats = ClientStats()
+    ops, weights = zip(*mix.items())
+    with pool.connection() as conn:
+        conn.set_session(isolation_level=isolation)
+        try:
+            done = 0
+            while not stop.is_set() and (operations is None or done < operations) and \
+                    (deadline is None or time.monotonic() < deadline):
+                op = rng.choices(ops, weights)[0]
+                # updates touch two hot rows in random order, so concurrent clients can deadlock
+                targets = rng.sample(hot_ids, 2) if op == 'update' else [rng.choice(hot_ids)]
+                status = rng.choice(ALLOWED_STATUSES)
+                start = time.perf_counter()
+                for attempt in range(max_retries + 1):
+                    stats.attempts += 1
+                    try:
+                        with conn:
+                            with conn.cursor() as cur:
+                                if op == 'insert':
+                                    cur.execute(INSERT_SQL, (client_id, rng.randint(1, 100_000), INCREMENT,
+                                                             datetime.datetime.utcnow(), marker_tag))
+                                elif op == 'update':
+                                    for tid in targets:
+                                        cur.execute(UPDATE_SQL, (INCREMENT, status, tid))
+                                else:
+                                    cur.execute(READ_SQL, (targets[0],))
+                                    cur.fetchall()
+                        break
+                    except psycopg2.extensions.TransactionRollbackError as e:
+                        counter = RETRYABLE.get(e.pgcode)
+                        if counter:
+                            setattr(stats, counter, getattr(stats, counter) + 1)
+                        time.sleep(rng.random() * min(0.001 * 2 ** attempt, 0.1))
+                else:
+                    stats.failed += 1
+                    done += 1
+                    continue
+                stats.latencies[op].append(time.perf_counter() - start)
+                if op == 'insert':
+                    stats.inserted += 1
+                elif op == 'update':
+                    for tid in targets:
+                        stats.increments[tid] = stats.increments.get(tid, 0) + 1
+                done += 1
+        finally:
+            conn.set_session(isolation_level='DEFAULT')
+    return stats
+
+
+class WorkloadReport:
+    def __init__(self, clients, seconds, client_stats):
+        self.clients = clients
+        self.seconds = seconds
+        self.latencies = {op: [x for s in client_stats for x in s.latencies[op]] for op in OPERATIONS}
+        self.committed = sum(len(v) for v in self.latencies.values())
+        self.attempts = sum(s.attempts for s in client_stats)
+        self.serialization_failures = sum(s.serialization_failures for s in client_stats)
+        self.deadlocks = sum(s.deadlocks for s in client_stats)
+        self.failed = sum(s.failed for s in client_stats)
+        self.inserted = sum(s.inserted for s in client_stats)
+        self.increments = {}
+        for s in client_stats:
+            for tid, n in s.increments.items():
+                self.increments[tid] = self.increments.get(tid, 0) + n
+        self.problems = []
+
+    @property
+    def throughput(self):
+        return self.committed / self.seconds if self.seconds else 0.0
+
+    def summary(self):
+        per_op = {}
+        for op, lat in self.latencies.items():
+            if lat:
+                per_op[op] = {'count': len(lat), 'p50_ms': round(percentile(lat, 50) * 1000, 2),
+                              'p95_ms': round(percentile(lat, 95) * 1000, 2),
+                              'p99_ms': round(percentile(lat, 99) * 1000, 2), 'histogram': histogram(lat)}
+        attempts = self.attempts or 1
+        return {'clients': self.clients, 'seconds': round(self.seconds, 3), 'committed': self.committed,
+                'ops_per_sec': round(self.throughput, 1), 'failed': self.failed,
+                'serialization_failure_rate': self.serialization_failures / attempts,
+                'deadlock_rate': self.deadlocks / attempts, 'operations': per_op, 'problems': self.problems}
+
+
+def verify_no_lost_updates(pool, report, marker_tag):
+    """Compare the committed work each client counted with what the table holds; fills report.problems."""
+    with pool.connection() as conn:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT transaction_id, amount FROM sample_data.transactions "
+                            "WHERE marker_tag = %s AND remarks = 'workload-counter'", (marker_tag,))
+                for tid, amount in cur.fetchall():
+                    expected = INCREMENT * report.increments.get(tid, 0)
+                    if amount != expected:
+                        report.problems.append(f'row {tid}: amount {amount} but {expected} was committed')
+                cur.execute("SELECT COUNT(*) FROM sample_data.transactions "
+                            "WHERE marker_tag = %s AND remarks = 'workload-insert'", (marker_tag,))
+                rows = cur.fetchone()[0]
+                if rows != report.inserted:
+                    report.problems.append(f'{rows} workload inserts persisted but {report.inserted} were committed')
+    return report.problems
+
+
+def run_workload(pool, marker_tag, clients=8, operations=500, duration=None, mix=None,
+                 isolation='READ COMMITTED', max_retries=MAX_RETRIES, seed=None, hot_rows=HOT_ROWS):
+    """Drive `clients` concurrent connections with a mix of inserts, updates and reads.
+
+    Each client thread holds one pool connection and runs `operations`
+    operations and/or until `duration` seconds pass (None disables either
+    limit). Serialization failures
+    and deadlocks are retried with jittered exponential backoff; latencies
+    include retries. Rows are tagged with `marker_tag`, and afterwards the
+    table is checked against the work the clients saw commit, so a lost
+    update or lost insert shows up in report.problems. `pool` needs
+    at least `clients` connections.
+    """
+    mix = mix or DEFAULT_MIX
+    hot_ids = setup_hot_rows(pool, marker_tag, max(hot_rows, 2))
+    seeds = random.Random(seed).sample(range(2 ** 31), clients)
+    deadline = time.monotonic() + duration if duration else None
+    stop = threading.Event()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        futures = [executor.submit(_run_client, pool, i, hot_ids, marker_tag, mix, operations,
+                                   deadline, isolation, max_retries, seeds[i], stop)
+                   for i in range(clients)]
+        try:
+            client_stats = [f.result() for f in futures]
+        except BaseException:
+            stop.set()
+            raise
+    report = WorkloadReport(clients, time.perf_counter() - start, client_stats)
+    verify_no_lost_updates(pool, report, marker_tag)
+    return report
@@ -0,0 +1,21 @@
+import os
+
+import pytest
+
+from qakit.db import ConnectionPool
+
+
+@pytest.fixture(scope='session')
+def db_pool():
+    # Same pooled connection layer the behave run uses (features/environment.py)
+    pool = ConnectionPool(maxconn=int(os.environ.get('QA_POOL_MAX', 8)))
+    yield pool
+    print(pool.summary())
+    pool.closeall()
+
+
+@pytest.fixture
+def conn(db_pool):
+    with db_pool.connection() as c:
+        yield c
+    # the connection goes back to the pool with any open transaction rolled back
@@ -0,0 +1,71 @@
+from decimal import Decimal
+
+from qakit.baselines import Aggregates, list_manifests, load_manifest, save_manifest, verify
+from qakit.generator import BlockGenerator
+
+
+def brute_force(blocks):
+    groups = {}
+    for blk in blocks:
+        for row in blk.rows():
+            amount, currency, status = row[2], row[3], row[5]
+            groups.setdefault((currency, status), []).append(amount)
+    return {k: (len(v), sum(v), min(v), max(v)) for k, v in groups.items()}
+
+
+def as_decimals(aggregates):
+    return {k: (g[0], Decimal(g[1]).scaleb(-2), Decimal(g[2]).scaleb(-2), Decimal(g[3]).scaleb(-2))
+            for k, g in aggregates.groups.items()}
+
+
+def test_update_matches_row_by_row_decimal_totals():
+    blocks = list(BlockGenerator(seed=7, block_size=1_000).blocks(5_500))
+    aggregates = Aggregates()
+    for blk in blocks:
+        aggregates.update(blk)
+    assert aggregates.rows == 5_500
+    assert as_decimals(aggregates) == brute_force(blocks)
+
+
+def test_shard_merge_equals_single_pass():
+    blocks = list(BlockGenerator(seed=3, block_size=500).blocks(2_000))
+    single = Aggregates()
+    for blk in blocks:
+        single.update(blk)
+    left, right = Aggregates().update(blocks[0]).update(blocks[1]), Aggregates().update(blocks[2]).update(blocks[3])
+    assert left.merge(right).groups == single.groups
+
+
+def test_expected_avg_rounds_like_numeric_cast():
+    aggregates = Aggregates({('USD', 'completed'): [2, 101, 50, 51], ('EUR', 'failed'): [1, 999, 999, 999]})
+    usd = aggregates.expected(currency='USD')
+    assert usd['sum'] == Decimal('1.01') and usd['avg'] == Decimal('0.51')
+    assert aggregates.expected()['count'] == 3
+    assert aggregates.expected(currency='GBP')['sum'] is None
+
+
+def test_manifest_round_trip(tmp_path):
+    aggregates = Aggregates().update(BlockGenerator(seed=1).block(300))
+    save_manifest(aggregates, 'run-1', directory=str(tmp_path))
+    assert load_manifest('run-1', directory=str(tmp_path)).groups == aggregates.groups
+    assert [m['marker_tag'] for m in list_manifests(str(tmp_path))] == ['run-1']
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute(self, sql, params):
+        self.params = params
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_verify_reports_only_mismatching_groups():
+    aggregates = Aggregates({('USD', 'completed'): [2, 300, 100, 200], ('EUR', 'failed'): [1, 50, 50, 50]})
+    cur = FakeCursor([('USD', 'completed', 2, Decimal('3.00'), Decimal('1.00'), Decimal('2.00')),
+                      ('EUR', 'failed', 1, Decimal('0.51'), Decimal('0.51'), Decimal('0.51'))])
+    problems = verify(cur, aggregates, 'run-1')
+    assert cur.params == ('run-1',)
+    assert len(problems) == 1 and problems[0].startswith('EUR/failed')
@@ -0,0 +1,87 @@
+from contextlib import contextmanager
+
+from qakit.checksum import MerkleTree, compare
+
+
+class FakeCursor:
+    """Answers compare()'s three queries from {transaction_id: row hash} in memory."""
+
+    def __init__(self, rows, log):
+        self.rows = rows
+        self.log = log
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params):
+        self.log.append(sql)
+        if 'MIN(transaction_id)' in sql:
+            self.result = [(min(self.rows), max(self.rows)) if self.rows else (None, None)]
+            return
+        ids = [i for i in self.rows if params['lo'] <= i < params['hi']]
+        if 'GROUP BY' in sql:
+            buckets = {}
+            for i in ids:
+                count, total = buckets.get((i - params['origin']) // params['width'], (0, 0))
+                buckets[(i - params['origin']) // params['width']] = (count + 1, (total + self.rows[i]) % 2 ** 64)
+            self.result = [(b, c, t) for b, (c, t) in buckets.items()]
+        else:
+            self.result = [(i, format(self.rows[i], 'x')) for i in ids]
+
+    def fetchall(self):
+        return self.result
+
+
+class FakePool:
+    def __init__(self, rows):
+        self.rows = rows
+        self.log = []
+
+    @contextmanager
+    def connection(self):
+        yield self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return FakeCursor(self.rows, self.log)
+
+
+def table(n):
+    return {i: i * 2654435761 % 2 ** 64 for i in range(1, n + 1)}
+
+
+def test_merkle_diff_finds_only_changed_leaves():
+    leaves = [(10, i) for i in range(7)]
+    changed = list(leaves)
+    changed[5] = (10, 99)
+    assert MerkleTree(leaves).root == MerkleTree(list(leaves)).root
+    assert MerkleTree(leaves).diff(MerkleTree(changed)) == [5]
+
+
+def test_identical_tables_cost_one_digest_row_per_leaf():
+    source, target = FakePool(table(10_000)), FakePool(table(10_000))
+    report = compare(source, target, leaf_rows=1_000, workers=3)
+    assert report.matches and report.source_rows == report.target_rows == 10_000
+    assert report.leaves == 10 and report.result_rows == 2 * (1 + 10)
+
+
+def test_divergent_rows_are_localized():
+    rows = table(10_000)
+    damaged = dict(rows)
+    del damaged[1234]
+    damaged[7777] += 1
+    damaged[10_001] = 5
+    report = compare(FakePool(rows), FakePool(damaged), leaf_rows=1_000, workers=2, fanout=4, row_diff_rows=100)
+    assert not report.matches
+    assert (report.missing, report.changed, report.extra) == ([1234], [7777], [10_001])
+    assert len(report.divergent_ranges) == 3
+    # per-row hashes are only fetched for the few small ranges that differ
+    assert report.result_rows < 1_000
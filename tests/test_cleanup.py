@@ -0,0 +1,121 @@
+from qakit.cleanup import (DELETE_SQL, TableStats, delete_marker_batched, delete_scenario_rows, id_high_water_mark,
+                           table_stats)
+
+
+class FakeCursor:
+    def __init__(self, remaining):
+        self.remaining = remaining
+        self.calls = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params):
+        self.calls.append(params)
+        self.rowcount = min(params['limit'], self.remaining)
+        self.remaining -= self.rowcount
+
+
+class FakeConn:
+    def __init__(self, remaining):
+        self.cur = FakeCursor(remaining)
+        self.commits = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.commits += 1
+        return False
+
+    def cursor(self):
+        return self.cur
+
+
+def test_batched_delete_commits_each_batch():
+    conn = FakeConn(25)
+    assert delete_marker_batched(conn, 'run-1', batch_size=10) == (25, 3)
+    assert conn.commits == 3 and conn.cur.calls[0] == {'marker': 'run-1', 'limit': 10}
+
+
+def test_exact_multiple_needs_one_empty_batch():
+    assert delete_marker_batched(FakeConn(20), 'run-1', batch_size=10) == (20, 3)
+
+
+def test_delete_is_bounded_by_marker_and_limit():
+    sql = DELETE_SQL.format(table='sample_data.transactions')
+    assert sql.count('marker_tag = %(marker)s') == 2 and 'LIMIT %(limit)s' in sql
+
+
+def test_dead_ratio():
+    assert TableStats(900, 100, 0, 0, None, 0).dead_ratio == 0.1
+    assert TableStats(0, 0, 0, 0, None, 0).dead_ratio == 0.0
+
+
+class ScenarioCursor:
+    def __init__(self, exists, ids):
+        self.exists = exists
+        self.ids = list(ids)
+        self.calls = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.calls.append((sql, params))
+        if 'to_regclass' in sql:
+            self.result = ('sample_data.transactions' if self.exists else None,)
+        elif 'MAX(transaction_id) FROM deleted' in sql:
+            batch = [i for i in self.ids if i > params['above']][:params['limit']]
+            self.ids = [i for i in self.ids if i not in batch]
+            self.result = (len(batch), max(batch, default=None))
+        else:
+            self.result = (42,)
+
+    def fetchone(self):
+        return self.result
+
+
+class ScenarioConn(FakeConn):
+    def __init__(self, exists=True, ids=()):
+        self.cur = ScenarioCursor(exists, ids)
+        self.commits = 0
+
+
+def test_scenario_rows_are_deleted_in_keyset_batches_above_the_start_id():
+    conn = ScenarioConn(ids=range(43, 68))
+    assert id_high_water_mark(conn) == 42
+    assert delete_scenario_rows(conn, 'scn-1', 42, batch_size=10, vacuum_rows=100) == (25, None)
+    deletes = [params for sql, params in conn.cur.calls if 'deleted' in sql]
+    assert [p['above'] for p in deletes] == [42, 52, 62] and deletes[0]['marker'] == 'scn-1'
+    assert not any(sql.startswith('VACUUM') for sql, _ in conn.cur.calls)
+
+
+def test_large_scenario_delete_is_vacuumed():
+    conn = ScenarioConn(ids=range(1, 31))
+    deleted, vacuum_seconds = delete_scenario_rows(conn, 'scn-1', 0, batch_size=10, vacuum_rows=30)
+    assert deleted == 30 and vacuum_seconds is not None
+    assert conn.cur.calls[-1][0] == 'VACUUM sample_data.transactions' and conn.autocommit is False
+
+
+def test_missing_table_has_nothing_to_clean():
+    conn = ScenarioConn(exists=False)
+    assert id_high_water_mark(conn) == 0
+    assert delete_scenario_rows(conn, 'scn-1', 0) == (0, None)
+    assert len(conn.cur.calls) == 2
+
+
+def test_table_stats_are_integers(conn):
+    # SUM() over bigint counters is numeric; steps do float arithmetic on these
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute('CREATE TEMP TABLE cleanup_stats AS SELECT 1 AS id')
+            stats = table_stats(cur, 'pg_temp.cleanup_stats')
+            cur.execute('DROP TABLE cleanup_stats')
+    assert all(type(v) is int for v in (stats.live, stats.dead, stats.deleted, stats.vacuums, stats.total_bytes))
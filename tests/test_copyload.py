@@ -0,0 +1,73 @@
+import csv
+import datetime
+import io
+import struct
+from decimal import Decimal
+
+from qakit.copyload import (BINARY_HEADER, BINARY_TRAILER, IterStream, encode_numeric_cents,
+                            iter_copy_chunks)
+from qakit.generator import BlockGenerator
+
+NOW = datetime.datetime(2024, 6, 1, 12, 0, 0)
+MARKER = '9b2f4c1e-0d7a-4f55-8a44-3c1b2a9e6f10'
+
+
+def decode_numeric(field):
+    ndigits, weight, sign, dscale = struct.unpack('>hhhh', field[:8])
+    digits = struct.unpack(f'>{ndigits}h', field[8:])
+    value = sum((Decimal(d) * Decimal(10000) ** (weight - i) for i, d in enumerate(digits)), Decimal(0))
+    value = value.quantize(Decimal(1).scaleb(-dscale))
+    return -value if sign == 0x4000 else value
+
+
+def test_numeric_binary_encoding_round_trips():
+    for cents in (0, 5, 100, 12345, 1000000, 999999999999, -250, -1000000):
+        raw = encode_numeric_cents(cents)
+        (length,) = struct.unpack('>i', raw[:4])
+        assert length == len(raw) - 4
+        assert decode_numeric(raw[4:]) == Decimal(cents).scaleb(-2)
+
+
+def test_csv_stream_matches_generated_rows():
+    blocks = list(BlockGenerator(seed=11, block_size=300, now=NOW, marker_tag=MARKER).blocks(700))
+    expected = [r for b in blocks for r in b.rows()]
+    stats = {}
+    stream = IterStream(iter_copy_chunks(blocks, 'csv', stats, chunk_rows=128))
+    text = b''.join(iter(lambda: stream.read(1000), b'')).decode('utf-8')
+    parsed = list(csv.reader(io.StringIO(text)))
+    assert stats['rows'] == len(parsed) == 700
+    for row, exp in zip(parsed, expected):
+        assert int(row[0]) == exp[0] and int(row[1]) == exp[1]
+        assert Decimal(row[2]) == exp[2]
+        assert row[3] == exp[3] and row[5] == exp[5]
+        assert datetime.datetime.fromisoformat(row[4]) == exp[4]
+        assert row[6] == (exp[6] or '')
+        assert row[7] == MARKER
+
+
+def test_full_read_drains_the_stream():
+    stream = IterStream([b'abc', b'', b'def', b'gh'])
+    assert stream.read(2) == b'ab'
+    assert stream.read() == b'cdefgh'
+    assert stream.read() == b''
+    assert stream.read(4) == b''
+
+
+def test_binary_stream_framing_and_row_count():
+    blocks = BlockGenerator(seed=12, block_size=250, now=NOW, marker_tag=MARKER).blocks(600)
+    stats = {}
+    data = b''.join(iter_copy_chunks(blocks, 'binary', stats, chunk_rows=100))
+    assert data.startswith(BINARY_HEADER) and data.endswith(BINARY_TRAILER)
+    assert stats['rows'] == 600 and stats['bytes'] == len(data)
+    pos, tuples = len(BINARY_HEADER), 0
+    while True:
+        (nfields,) = struct.unpack_from('>h', data, pos)
+        pos += 2
+        if nfields == -1:
+            break
+        assert nfields == 8
+        for _ in range(nfields):
+            (length,) = struct.unpack_from('>i', data, pos)
+            pos += 4 + max(length, 0)
+        tuples += 1
+    assert tuples == 600 and pos == len(data)
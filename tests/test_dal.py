@@ -0,0 +1,83 @@
+import psycopg2.errors
+
+from qakit.dal import TransactionWriter, forget_prepared
+
+
+class FakeConnection:
+    encoding = 'UTF8'
+
+
+class FakeCursor:
+    """Records statements; any INSERT carrying a None user_id fails like a NOT NULL violation."""
+
+    def __init__(self, connection=None):
+        self.connection = connection or FakeConnection()
+        self.statements = []
+        self._pending = []
+        self._next_id = 1
+
+    def mogrify(self, template, args):
+        self._pending.append(args)
+        return repr(args).encode('utf-8')
+
+    def execute(self, sql, params=None):
+        sql = sql.decode('utf-8') if isinstance(sql, bytes) else sql
+        self.statements.append(sql)
+        rows, self._pending = self._pending, []
+        if params is not None:
+            rows = [params]
+        if sql.startswith(('INSERT', 'EXECUTE')) and any(r[0] is None for r in rows):
+            raise psycopg2.errors.NotNullViolation('null value in column "user_id" violates not-null constraint')
+        self.result = [(self._next_id + i,) for i in range(len(rows))]
+        self._next_id += len(rows)
+
+    def fetchall(self):
+        return self.result
+
+    def fetchone(self):
+        return self.result[0]
+
+    def count(self, prefix):
+        return sum(s.startswith(prefix) for s in self.statements)
+
+
+def row(user_id):
+    return (user_id, 1, '1.00', 'USD', None, 'completed', 'dal-test', None)
+
+
+def test_insert_prepares_once_per_connection():
+    conn = FakeConnection()
+    first, second = FakeCursor(conn), FakeCursor(conn)
+    assert TransactionWriter(first).insert(row(1)) == 1
+    TransactionWriter(first).insert(row(2))
+    TransactionWriter(second).insert(row(3))
+    assert first.count('PREPARE') == 1 and second.count('PREPARE') == 0
+    assert first.count('EXECUTE qa_insert_sample_data_transactions') == 2
+    forget_prepared(conn)
+    TransactionWriter(second).insert(row(4))
+    assert second.count('PREPARE') == 1
+
+
+def test_insert_many_pages_rows_into_few_statements():
+    cur = FakeCursor()
+    ids = TransactionWriter(cur, page_size=100).insert_many([row(i) for i in range(1, 251)], returning=True)
+    assert ids == list(range(1, 251))
+    assert cur.count('INSERT') == 3
+    assert TransactionWriter(cur).insert_many([]) is None
+
+
+def test_insert_rows_isolates_each_rejected_row():
+    cur = FakeCursor()
+    rows = [row(None if i in (3, 17, 18) else i) for i in range(40)]
+    result = TransactionWriter(cur, page_size=16).insert_rows(rows)
+    assert result.failed_rows == [3, 17, 18]
+    assert len(result.ids) == 37
+    assert all(isinstance(e.error, psycopg2.errors.NotNullViolation) for e in result.errors)
+    assert cur.count('SAVEPOINT') == cur.count('RELEASE') + cur.count('ROLLBACK TO')
+
+
+def test_insert_rows_clean_batch_is_one_insert_per_page():
+    cur = FakeCursor()
+    result = TransactionWriter(cur).insert_rows([row(i) for i in range(1, 6)])
+    assert result.errors == [] and result.ids == [1, 2, 3, 4, 5]
+    assert cur.statements[0] == 'SAVEPOINT qa_dal_batch' and cur.count('INSERT') == 1
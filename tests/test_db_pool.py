@@ -0,0 +1,71 @@
+import threading
+
+import psycopg2.extensions
+import pytest
+
+from qakit.dal import _prepared
+from qakit.db import ConnectionPool, PoolTimeout
+
+
+class FakeConn:
+    def __init__(self):
+        self.closed = 0
+        self.autocommit = False
+        self.rollbacks = 0
+        self.resets = 0
+        self.info = type('Info', (), {'transaction_status': psycopg2.extensions.TRANSACTION_STATUS_IDLE})()
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def reset(self):
+        self.resets += 1
+
+    def close(self):
+        self.closed = 1
+
+
+class FakePool(ConnectionPool):
+    def _connect(self):
+        self.stats['connects'] += 1
+        return FakeConn()
+
+
+def test_connections_are_reused():
+    pool = FakePool(maxconn=2)
+    for _ in range(5):
+        with pool.connection():
+            pass
+    assert pool.stats['connects'] == 1 and pool.stats['checkouts'] == 5
+
+
+def test_open_transaction_rolled_back_on_return():
+    pool = FakePool(maxconn=1)
+    with pool.connection() as c:
+        c.info.transaction_status = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+        c.autocommit = True
+    assert c.rollbacks == 1 and c.autocommit is False
+
+
+def test_waits_are_counted_and_time_out():
+    pool = FakePool(maxconn=1, timeout=0.05)
+    held = pool.getconn()
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+    threading.Timer(0.05, pool.putconn, (held,)).start()
+    assert pool.getconn(timeout=2) is held
+    assert pool.stats['waits'] == 1 and pool.stats['wait_seconds'] > 0
+
+
+def test_reset_reclaims_leaked_and_resets_idle():
+    pool = FakePool(maxconn=2)
+    idle = pool.getconn()
+    leaked = pool.getconn()
+    pool.putconn(idle)
+    _prepared[idle] = {'qa_insert_sample_data_transactions'}
+    pool.reset()
+    assert leaked.closed and idle.resets == 1
+    assert idle not in _prepared
+    pool.putconn(leaked)  # late return of a reclaimed connection is ignored
+    assert pool.stats['discarded'] == 1
+    assert pool.getconn() is idle
@@ -0,0 +1,57 @@
+import numpy as np
+
+from qakit.dedup import BloomFilter, DedupIngestor, RecentKeys, business_keys, merge_sql
+from qakit.generator import BlockGenerator
+
+
+def block(n=1000, seed=7):
+    return BlockGenerator(seed=seed, block_size=n).block(n)
+
+
+def test_business_keys_ignore_status_remarks_and_marker():
+    blk = block()
+    keys = business_keys(blk)
+    assert len(np.unique(keys)) == len(blk)
+    blk.status[:] = 'refund'
+    blk.remarks[:] = None
+    blk.marker_tag = 'other'
+    assert (business_keys(blk) == keys).all()
+    blk.amount_cents[0] += 1
+    assert business_keys(blk)[0] != keys[0]
+
+
+def test_bloom_filter_has_no_false_negatives_and_few_false_positives():
+    bloom = BloomFilter(capacity=10_000, error_rate=0.01)
+    added = business_keys(block(10_000, seed=1))
+    bloom.add(added)
+    assert bloom.contains(added).all()
+    assert bloom.contains(business_keys(block(10_000, seed=2))).mean() < 0.03
+
+
+def test_recent_keys_evicts_oldest():
+    recent = RecentKeys(maxlen=2)
+    recent.add([1, 2, 2, 3])
+    assert 1 not in recent and 2 in recent and 3 in recent
+
+
+def test_filter_drops_in_batch_and_confirmed_duplicates_only():
+    ingestor = DedupIngestor(conn=None)
+    blk = block(100)
+    batch_keys = set()
+    kept = ingestor._filter(blk.take(np.r_[np.arange(100), np.arange(10)]), batch_keys)
+    assert len(kept) == 100 and ingestor.stats['client_duplicates'] == 10
+    # nothing is remembered until a batch commits
+    assert len(ingestor._filter(blk, set())) == 100
+    keys = np.fromiter(batch_keys, np.uint64)
+    ingestor.bloom.add(keys)
+    ingestor.recent.add(batch_keys)
+    assert len(ingestor._filter(blk, set())) == 0
+    # a Bloom hit the exact set cannot confirm still goes to the server
+    ingestor.recent = RecentKeys()
+    assert len(ingestor._filter(blk, set())) == 100
+    assert ingestor.stats['bloom_unconfirmed'] == 100
+
+
+def test_merge_is_on_conflict_do_nothing():
+    sql = merge_sql()
+    assert 'ON CONFLICT (business_key) DO NOTHING' in sql and 'FROM dedup_staging' in sql
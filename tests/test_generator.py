@@ -0,0 +1,55 @@
+import datetime
+from decimal import Decimal
+
+import numpy as np
+
+from qakit.generator import BlockGenerator, CURRENCIES, DATE_SPAN, STATUSES, data_now
+
+NOW = datetime.datetime(2024, 6, 1, 12, 0, 0)
+
+
+def test_blocks_total_exact_row_count():
+    gen = BlockGenerator(seed=1, block_size=1000, now=NOW)
+    sizes = [len(b) for b in gen.blocks(2500)]
+    assert sizes == [1000, 1000, 500]
+
+
+def test_same_seed_same_rows():
+    a = list(BlockGenerator(seed=7, block_size=100, now=NOW, marker_tag='m').rows(250))
+    b = list(BlockGenerator(seed=7, block_size=100, now=NOW, marker_tag='m').rows(250))
+    c = list(BlockGenerator(seed=8, block_size=100, now=NOW, marker_tag='m').rows(250))
+    assert a == b
+    assert a != c
+
+
+def test_value_ranges_and_distribution():
+    blk = BlockGenerator(seed=3, now=NOW).block(50_000)
+    assert blk.user_id.min() >= 1 and blk.user_id.max() <= 10_000_000
+    assert blk.product_id.min() >= 1 and blk.product_id.max() <= 1_000_000
+    assert blk.amount_cents.min() >= 100 and blk.amount_cents.max() <= 50_000
+    assert set(blk.currency) <= set(CURRENCIES)
+    assert set(blk.status) == set(STATUSES)
+    assert abs(np.mean(blk.currency == 'USD') - 0.6) < 0.02
+    assert abs(np.mean(blk.remarks == None) - 0.2) < 0.02  # noqa: E711
+    oldest = np.datetime64(NOW - DATE_SPAN, 'us')
+    assert blk.transaction_date.min() >= oldest and blk.transaction_date.max() <= np.datetime64(NOW, 'us')
+
+
+def test_rows_match_gen_row_types():
+    row = next(BlockGenerator(seed=5, now=NOW, marker_tag='tag').rows(1))
+    uid, pid, amount, currency, ts, status, remarks, marker = row
+    assert isinstance(uid, int) and isinstance(pid, int)
+    assert isinstance(amount, Decimal) and amount.as_tuple().exponent == -2
+    assert isinstance(ts, datetime.datetime)
+    assert marker == 'tag'
+
+
+def test_seeded_generator_has_a_fixed_default_now(monkeypatch):
+    monkeypatch.delenv('QA_DATA_NOW', raising=False)
+    assert data_now(None) is None
+    assert data_now(7).day == 1 and data_now(7).hour == 0
+    a = list(BlockGenerator(seed=7, block_size=100).rows(50))
+    b = list(BlockGenerator(seed=7, block_size=100).rows(50))
+    assert a == b
+    monkeypatch.setenv('QA_DATA_NOW', '2024-06-01T12:00:00')
+    assert BlockGenerator(seed=7).now == NOW == BlockGenerator().now
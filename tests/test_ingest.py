@@ -0,0 +1,134 @@
+import threading
+import time
+
+import pytest
+
+from qakit import ingest as ingest_module
+from qakit.generator import BlockGenerator
+from qakit.ingest import AimdBatchSizer, TokenBucket, ingest
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_token_bucket_allows_burst_then_paces():
+    clock = FakeClock()
+    bucket = TokenBucket(100, burst=50, clock=clock, sleep=clock.sleep)
+    assert bucket.acquire(50) == 0.0
+    assert bucket.acquire(100) == pytest.approx(1.0)
+    clock.now += 0.5
+    assert bucket.acquire(50) == pytest.approx(0.0)
+    # 300 rows overall in 1.5s + the 50-row burst
+    assert bucket.acquire(10) == pytest.approx(0.1)
+
+
+def test_token_bucket_rejects_non_positive_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(0)
+
+
+def test_aimd_grows_additively_and_halves_on_pressure():
+    sizer = AimdBatchSizer(initial=4000, minimum=1000, maximum=6000, target_seconds=1.0)
+    assert sizer.observe(0.2) == 5000
+    assert sizer.observe(0.2) == 6000
+    assert sizer.observe(0.2) == 6000
+    assert sizer.observe(1.5) == 3000
+    assert sizer.observe(0.1, busy=True) == 1500
+    assert sizer.observe(2.0) == 1000
+
+
+class IngestCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        pass
+
+    def fetchone(self):
+        return (6, self.conn.waiting)
+
+
+class IngestConnection:
+    def __init__(self, waiting=0):
+        self.waiting = waiting
+        self.commits = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.commits += exc_type is None
+        return False
+
+    def cursor(self):
+        return IngestCursor(self)
+
+
+def slow_copy(delay, fail_after=None):
+    batches = []
+
+    def copy_blocks(cur, blocks, fmt, table):
+        if fail_after is not None and len(batches) >= fail_after:
+            raise RuntimeError('copy failed')
+        time.sleep(delay)
+        batches.append(sum(len(b) for b in blocks))
+        return batches[-1]
+    return copy_blocks, batches
+
+
+def test_ingest_loads_everything_under_backpressure_and_rate_limit(monkeypatch):
+    copy_blocks, batches = slow_copy(0.02)
+    monkeypatch.setattr(ingest_module, 'copy_blocks', copy_blocks)
+    conn = IngestConnection(waiting=5)
+    sizer = AimdBatchSizer(initial=400, minimum=100, maximum=400, target_seconds=1.0)
+    snapshots = []
+    metrics = ingest(conn, 2_000, 'run-1', rate=4_000, burst=500, sizer=sizer, seed=1, chunk_rows=100,
+                     queue_chunks=1, on_metrics=snapshots.append)
+    assert metrics.rows == sum(batches) == 2_000 and len(snapshots) == len(batches)
+    # a full queue blocks the generator instead of buffering; the bucket holds batches past the burst
+    assert metrics.alerts['backpressure']['count'] > 0 and metrics.producer_blocked_seconds > 0
+    assert metrics.alerts['rate_limited']['count'] > 0 and metrics.throttle_seconds > 0
+    # 5 backends waiting on locks/IO >= busy_waiters: every batch halves the next one, down to the minimum
+    assert metrics.alerts['server_busy']['count'] == len(batches)
+    assert batches[:3] == [400, 200, 100] and metrics.max_queue_depth <= 1
+
+
+def test_producer_error_is_raised_after_the_loader_drains(monkeypatch):
+    class BrokenGenerator(BlockGenerator):
+        def blocks(self, rows):
+            for i, blk in enumerate(super().blocks(rows)):
+                if i == 3:
+                    raise ValueError('generator broke')
+                yield blk
+
+    copy_blocks, batches = slow_copy(0)
+    monkeypatch.setattr(ingest_module, 'copy_blocks', copy_blocks)
+    monkeypatch.setattr(ingest_module, 'BlockGenerator', BrokenGenerator)
+    with pytest.raises(ValueError, match='generator broke'):
+        ingest(IngestConnection(), 1_000, 'run-1', seed=1, chunk_rows=100, busy_waiters=0,
+               sizer=AimdBatchSizer(initial=100, minimum=100, maximum=100))
+    assert sum(batches) == 300
+
+
+def test_loader_error_stops_the_producer(monkeypatch):
+    copy_blocks, batches = slow_copy(0, fail_after=1)
+    monkeypatch.setattr(ingest_module, 'copy_blocks', copy_blocks)
+    with pytest.raises(RuntimeError, match='copy failed'):
+        ingest(IngestConnection(), 100_000, 'run-1', seed=1, chunk_rows=100, queue_chunks=2, busy_waiters=0,
+               sizer=AimdBatchSizer(initial=100, minimum=100, maximum=100))
+    assert batches == [100]
+    assert not any(t.name == 'ingest-producer' for t in threading.enumerate())
@@ -0,0 +1,100 @@
+from contextlib import contextmanager
+
+from qakit.integrity import RULES, Rule, id_ranges, merge_partials, scan, scan_sql
+
+NEG = Rule('negative_amount', 'amount < 0')
+CUR = Rule('invalid_currency', 'currency IS NULL')
+
+
+def test_id_ranges_cover_span_without_overlap():
+    ranges = id_ranges(1, 10, 3)
+    assert ranges == [(1, 3), (4, 6), (7, 10)]
+    assert id_ranges(5, 6, 8) == [(5, 5), (6, 6)]
+    assert id_ranges(None, None, 4) == []
+
+
+def test_scan_sql_is_one_query_with_filter_aggregates():
+    sql = scan_sql([NEG, CUR], ranged=True)
+    assert sql.count('FROM sample_data.transactions') == 1
+    assert 'COUNT(*) FILTER (WHERE amount < 0)' in sql and 'MIN(transaction_id) FILTER (WHERE currency IS NULL)' in sql
+    assert 'MAX(transaction_id) FILTER (WHERE currency IS NULL)' in sql
+    assert sql.endswith('BETWEEN %s AND %s')
+
+
+def test_merge_partials_sums_counts_and_keeps_lowest_and_highest_id():
+    rows, merged = merge_partials([NEG, CUR], [(10, 2, 7, 9, 0, None, None), (5, 1, 3, 3, 1, 12, 12)])
+    assert rows == 15
+    assert merged == {'negative_amount': (3, 3, 9), 'invalid_currency': (1, 12, 12)}
+
+
+def test_default_rules_registered():
+    assert {'invalid_currency', 'negative_amount', 'extreme_date_in_recent_window', 'unknown_status'} <= set(RULES)
+
+
+class FakeCursor:
+    def __init__(self, log):
+        self.log = log
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.log.append((sql, params))
+        if sql.startswith('SELECT MIN(transaction_id), MAX'):
+            self.result = [(1, 100)]
+        elif 'FILTER' in sql:
+            lo, hi = params or (1, 100)
+            # one negative amount per range, at its first id
+            self.result = [(hi - lo + 1, 1, lo, lo)]
+        else:
+            first, last, limit = params
+            self.result = [(i,) for i in range(first, last + 1)][:limit]
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return self.result
+
+
+class FakeConn:
+    def __init__(self, log):
+        self.log = log
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return FakeCursor(self.log)
+
+
+class FakePool:
+    def __init__(self):
+        self.log = []
+
+    @contextmanager
+    def connection(self):
+        yield FakeConn(self.log)
+
+
+def test_parallel_scan_merges_ranges_and_samples_violators():
+    pool = FakePool()
+    report = scan(pool, rules=[NEG], workers=4, samples=2)
+    assert report.rows == 100 and report.ranges == 4
+    assert report.violations('negative_amount') == 4
+    assert report['negative_amount'].sample_ids == [1, 2]
+    assert sum('FILTER' in sql for sql, _ in pool.log) == 4
+    assert pool.log[-1][1] == (1, 76, 2)
+
+
+def test_sparse_violations_are_sampled_without_a_follow_up_query():
+    pool = FakePool()
+    report = scan(pool, rules=[NEG], workers=1, samples=5)
+    assert report['negative_amount'].sample_ids == [1]
+    assert not any('ORDER BY' in sql for sql, _ in pool.log)
@@ -0,0 +1,63 @@
+import datetime
+
+import pytest
+
+from qakit.keyset import decode_token, encode_token, iter_pages, iter_rows, page_sql
+
+T0 = datetime.datetime(2024, 1, 1, 12, 0)
+
+
+class FakeCursor:
+    """Answers keyset page queries from an in-memory list of (transaction_date, transaction_id) keys."""
+
+    def __init__(self, keys):
+        self.keys = sorted(keys)
+        self.queries = 0
+
+    def execute(self, sql, params):
+        self.queries += 1
+        desc = 'DESC' in sql
+        keys = self.keys[::-1] if desc else self.keys
+        if len(params) == 3:
+            after = (params[0], params[1])
+            keys = [k for k in keys if (k < after if desc else k > after)]
+        self.result = keys[:params[-1]]
+
+    def fetchall(self):
+        return self.result
+
+
+def tied_keys():
+    # 25 rows share one timestamp; page boundaries land inside the tie group
+    return [(T0, i) for i in range(1, 26)] + [(T0 + datetime.timedelta(minutes=i), 100 + i) for i in range(10)]
+
+
+@pytest.mark.parametrize('descending', [False, True])
+def test_pages_cover_every_row_once(descending):
+    cur = FakeCursor(tied_keys())
+    rows = list(iter_rows(cur, page_size=7, descending=descending))
+    assert rows == sorted(tied_keys(), reverse=descending)
+    assert cur.queries == 6  # 5 full pages, then an empty one ends the scan
+
+
+def test_token_resumes_after_last_page():
+    cur = FakeCursor(tied_keys())
+    pages = iter_pages(cur, page_size=7)
+    first, second = next(pages), next(pages)
+    resumed = list(iter_rows(FakeCursor(tied_keys()), page_size=7, token=second.token))
+    assert first.rows + second.rows + resumed == sorted(tied_keys())
+
+
+def test_token_round_trip_and_validation():
+    token = encode_token((T0, 42), descending=True)
+    assert decode_token(token) == ((T0, 42), True)
+    with pytest.raises(ValueError):
+        decode_token('not-a-token')
+    with pytest.raises(ValueError):
+        next(iter_pages(FakeCursor([]), token=token, descending=False))
+
+
+def test_page_sql_seeks_on_row_comparison():
+    sql = page_sql(('transaction_date', 'transaction_id'), True, False)
+    assert '(transaction_date, transaction_id) < (%s, %s)' in sql
+    assert 'OFFSET' not in sql and sql.endswith('transaction_id DESC LIMIT %s')
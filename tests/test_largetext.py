@@ -0,0 +1,72 @@
+import hashlib
+
+from qakit.largetext import PATTERN, RemarksCopyStream, TextDigest, copy_escape, payload_chunks, read_remarks
+
+
+def unescape(field):
+    out, i = [], 0
+    while i < len(field):
+        if field[i] == '\\':
+            out.append({'t': '\t', 'n': '\n', 'r': '\r', '\\': '\\'}[field[i + 1]])
+            i += 2
+        else:
+            out.append(field[i])
+            i += 1
+    return ''.join(out)
+
+
+def test_payload_chunks_reach_requested_size_in_bounded_chunks():
+    chunks = list(payload_chunks(100_000, chunk_bytes=4096))
+    total = sum(len(c.encode('utf-8')) for c in chunks)
+    assert 100_000 <= total < 100_000 + len(PATTERN.encode('utf-8'))
+    assert max(len(c.encode('utf-8')) for c in chunks) <= 4096
+
+
+def test_copy_escape():
+    assert copy_escape('a\\b\tc\nd\re') == 'a\\\\b\\tc\\nd\\re'
+
+
+def test_copy_stream_encodes_one_row_and_digests_raw_text():
+    chunks = list(payload_chunks(50_000, chunk_bytes=1000))
+    stream = RemarksCopyStream({'user_id': 7, 'amount': '9.99', 'status': 'completed'}, chunks)
+    data = b''
+    while True:
+        piece = stream.read(777)
+        if not piece:
+            break
+        assert len(piece) <= 777
+        data += piece
+    assert data.endswith(b'\n') and data.count(b'\n') == 1
+    fields = data[:-1].decode('utf-8').split('\t')
+    assert fields[:3] == ['7', '\\N', '9.99'] and len(fields) == 8
+    text = ''.join(chunks)
+    assert unescape(fields[-1]) == text
+    assert stream.digest.as_tuple() == (len(text), len(text.encode('utf-8')),
+                                        hashlib.sha256(text.encode('utf-8')).hexdigest())
+
+
+class FakeCursor:
+    def __init__(self, text):
+        self.text = text
+        self.windows = 0
+
+    def execute(self, sql, params):
+        if 'char_length' in sql:
+            self.result = (len(self.text),)
+        else:
+            start, length, _ = params
+            self.windows += 1
+            self.result = (self.text[start - 1:start - 1 + length],)
+
+    def fetchone(self):
+        return self.result
+
+
+def test_read_remarks_hashes_window_by_window():
+    text = ''.join(payload_chunks(10_000))
+    cur = FakeCursor(text)
+    result = read_remarks(cur, 1, window_chars=1000)
+    expected = TextDigest()
+    expected.update(text)
+    assert (result.chars, result.octets, result.sha256) == expected.as_tuple()
+    assert result.windows == cur.windows == -(-len(text) // 1000)
@@ -0,0 +1,93 @@
+import json
+
+from qakit.parallel_runner import (discover, load_durations, merge_plan_histories, merge_profiles, merge_reports,
+                                   merge_sla_histories, plan_shards, scenario_counts, worker_state)
+
+
+def test_discover_lists_outline_rows_individually():
+    locations = discover(['features/transactions_large_scale.feature'])
+    assert 'features/transactions_large_scale.feature:135' in locations
+    assert 'features/transactions_large_scale.feature:136' in locations
+    assert len(locations) == len(set(locations))
+
+
+def test_plan_shards_balances_by_duration():
+    locs = ['f:1', 'f:2', 'f:3', 'f:4']
+    shards = plan_shards(locs, 2, {'f:1': 10.0, 'f:2': 1.0, 'f:3': 1.0, 'f:4': 8.0})
+    assert sorted(shards) == [['f:1'], ['f:2', 'f:3', 'f:4']]
+
+
+def test_plan_shards_without_history_is_round_robin_in_file_order():
+    shards = plan_shards(['f:1', 'f:2', 'f:3'], 2)
+    assert shards == [['f:1', 'f:3'], ['f:2']]
+    assert plan_shards(['f:1'], 4) == [['f:1']]
+    assert plan_shards([], 4, {}) == []
+
+
+def scenario(line, status, duration=1.0):
+    return {'type': 'scenario', 'location': f'features/a.feature:{line}', 'status': status,
+            'steps': [{'result': {'status': status, 'duration': duration}}]}
+
+
+def background(line):
+    return {'type': 'background', 'location': f'features/a.feature:{line}', 'steps': []}
+
+
+def feature(status, *elements):
+    return {'location': 'features/a.feature:1', 'name': 'A', 'status': status, 'elements': list(elements)}
+
+
+def test_merge_reports_restores_file_order_and_worst_status():
+    merged = merge_reports([(['features/a.feature:20'], [feature('failed', background(3), scenario(10, 'skipped'),
+                                                                 background(3), scenario(20, 'passed'))]),
+                            (['features/a.feature:10'], [feature('failed', background(3), scenario(10, 'failed'),
+                                                                 background(3), scenario(20, 'skipped'))])])
+    assert len(merged) == 1 and merged[0]['status'] == 'failed'
+    assert [e['location'] for e in merged[0]['elements']] == [
+        'features/a.feature:3', 'features/a.feature:10', 'features/a.feature:3', 'features/a.feature:20']
+    assert scenario_counts(merged) == {'failed': 1, 'passed': 1}
+
+
+def test_load_durations_sums_step_times(tmp_path):
+    path = tmp_path / 'report.json'
+    path.write_text(json.dumps([feature('passed', background(3), scenario(10, 'passed', 2.5))]))
+    assert load_durations(str(path)) == {'features/a.feature:10': 2.5}
+    assert load_durations(str(tmp_path / 'missing.json')) == {}
+
+
+def write_json(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data))
+    return str(path)
+
+
+def test_worker_histories_are_seeded_and_merged_without_losing_runs(tmp_path):
+    shared = write_json(tmp_path / 'sla_history.json', {'q': {'query': 'SELECT 1', 'runs': [{'p95': 1.0}]}})
+    workers = [write_json(tmp_path / 'w0.json', {'q': {'query': 'SELECT 1', 'runs': [{'p95': 1.0}, {'p95': 2.0}]}}),
+               write_json(tmp_path / 'w1.json', {'q': {'query': 'SELECT 1', 'runs': [{'p95': 1.0}, {'p95': 3.0}]},
+                                                 'r': {'query': 'SELECT 2', 'runs': [{'p95': 4.0}]}})]
+    merged = merge_sla_histories(workers, shared).data
+    assert [r['p95'] for r in merged['q']['runs']] == [1.0, 2.0, 3.0]
+    assert [r['p95'] for r in merged['r']['runs']] == [4.0]
+
+    plans = write_json(tmp_path / 'plans.json', {'a': {'fingerprint': 'x'}, 'b': {'fingerprint': 'y'}})
+    worker_plans = [write_json(tmp_path / 'p0.json', {'a': {'fingerprint': 'z'}, 'b': {'fingerprint': 'y'}}),
+                    write_json(tmp_path / 'p1.json', {'a': {'fingerprint': 'x'}, 'b': {'fingerprint': 'w'}})]
+    assert merge_plan_histories(worker_plans, plans).data == {'a': {'fingerprint': 'z'}, 'b': {'fingerprint': 'w'}}
+
+
+def test_worker_profiles_are_merged(tmp_path):
+    for i in range(2):
+        write_json(tmp_path / f'worker_{i}' / 'profile' / 'steps.json', [{'step': f'Given {i}', 'seconds': 1.0}])
+        write_json(tmp_path / f'worker_{i}' / 'profile' / 'trace.json', {'traceEvents': [{'name': str(i), 'pid': i}]})
+    dirs = [str(tmp_path / f'worker_{i}' / 'profile') for i in range(3)]
+    shared = merge_profiles(dirs, str(tmp_path / 'profile'))
+    steps = json.loads((tmp_path / 'profile' / 'steps.json').read_text())
+    assert shared and [s['worker'] for s in steps] == [0, 1]
+    assert merge_profiles([str(tmp_path / 'none')], str(tmp_path / 'x')) is None
+
+
+def test_worker_state_points_every_state_file_into_the_worker_dir(tmp_path):
+    state = worker_state(3, str(tmp_path))
+    assert set(state) == {'QA_SLA_HISTORY', 'QA_PLAN_HISTORY', 'QA_PROFILE_DIR', 'QA_LOG_FILE'}
+    assert all(path.startswith(str(tmp_path / 'worker_3')) for path in state.values())
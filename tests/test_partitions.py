@@ -0,0 +1,164 @@
+import datetime
+import gzip
+import hashlib
+import json
+import os
+
+import pytest
+
+from qakit.partitions import (add_months, archive_partition, list_partitions, month_start, partition_name, partitions_for_range,
+                              restore_partition, scanned_relations)
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute(self, sql, params=None):
+        pass
+
+    def fetchall(self):
+        return self.rows
+
+
+def bound(lo, hi):
+    return f"FOR VALUES FROM ('{lo} 00:00:00') TO ('{hi} 00:00:00')"
+
+
+PARTS = [('transactions_p2024_02', bound('2024-02-01', '2024-03-01')),
+         ('transactions_default', 'DEFAULT'),
+         ('transactions_p2024_01', bound('2024-01-01', '2024-02-01'))]
+
+
+def test_month_arithmetic_and_names():
+    assert month_start(datetime.datetime(2024, 3, 17, 8, 30)) == datetime.datetime(2024, 3, 1)
+    assert add_months(datetime.datetime(2024, 11, 1), 3) == datetime.datetime(2025, 2, 1)
+    assert add_months(datetime.datetime(2024, 1, 1), -1) == datetime.datetime(2023, 12, 1)
+    assert partition_name('sample_data.transactions', datetime.datetime(2024, 1, 1)) == 'sample_data.transactions_p2024_01'
+
+
+def test_list_partitions_parses_bounds_and_skips_default():
+    parts = list_partitions(FakeCursor(PARTS))
+    assert [p[0] for p in parts] == ['sample_data.transactions_p2024_01', 'sample_data.transactions_p2024_02']
+    assert parts[1][1:] == (datetime.datetime(2024, 2, 1), datetime.datetime(2024, 3, 1))
+
+
+def test_partitions_for_range_is_half_open():
+    cur = FakeCursor(PARTS)
+    assert partitions_for_range(cur, datetime.datetime(2024, 1, 15), datetime.datetime(2024, 2, 1)) == \
+        ['sample_data.transactions_p2024_01']
+
+
+def test_scanned_relations_walks_the_plan_tree():
+    plan = [{'Plan': {'Node Type': 'Aggregate', 'Plans': [{'Node Type': 'Append', 'Plans': [
+        {'Node Type': 'Seq Scan', 'Relation Name': 'transactions_p2024_01', 'Schema': 'sample_data'},
+        {'Node Type': 'Index Scan', 'Relation Name': 'transactions_p2024_02', 'Schema': 'sample_data'}]}]}}]
+    assert scanned_relations(plan) == {'sample_data.transactions_p2024_01', 'sample_data.transactions_p2024_02'}
+
+
+class RestoreCursor(FakeCursor):
+    """Replays a restore: the archive COPY loads 3 rows, the DEFAULT partition holds 2 for the archived month."""
+
+    def __init__(self, rows):
+        super().__init__(rows)
+        self.statements = []
+        self.rowcount = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+        self.rowcount = 2 if sql.startswith('WITH moved') else 0
+
+    def copy_expert(self, sql, reader):
+        while reader.read(8192):
+            pass
+        self.rowcount = 3
+
+
+class RestoreConnection:
+    def __init__(self, cur):
+        self.cur = cur
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return self.cur
+
+
+def test_restore_moves_default_partition_rows_before_attach(tmp_path):
+    name = 'sample_data.transactions_p2024_01'
+    data = b'PGCOPY archived rows'
+    with gzip.open(tmp_path / f'{name}.copy.gz', 'wb') as f:
+        f.write(data)
+    (tmp_path / f'{name}.json').write_text(json.dumps({
+        'partition': name, 'table': 'sample_data.transactions', 'from': '2024-01-01T00:00:00',
+        'to': '2024-02-01T00:00:00', 'rows': 3, 'sha256': hashlib.sha256(data).hexdigest()}))
+    cur = RestoreCursor(PARTS)
+    assert restore_partition(RestoreConnection(cur), name, str(tmp_path)) == 5
+    move = next(i for i, sql in enumerate(cur.statements) if sql.startswith('WITH moved'))
+    attach = next(i for i, sql in enumerate(cur.statements) if 'ATTACH PARTITION' in sql)
+    assert 'DELETE FROM sample_data.transactions_default' in cur.statements[move] and move < attach
+    assert os.listdir(tmp_path) == []
+
+
+class ArchiveCursor(RestoreCursor):
+    def __init__(self, rows, fail_on=None):
+        super().__init__(rows)
+        self.fail_on = fail_on
+
+    def execute(self, sql, params=None):
+        if self.fail_on and sql.startswith(self.fail_on):
+            raise RuntimeError(f'{self.fail_on} failed')
+        super().execute(sql, params)
+
+    def copy_expert(self, sql, writer):
+        writer.write(b'PGCOPY archived rows')
+        self.rowcount = 3
+
+
+class ArchiveConnection(RestoreConnection):
+    """Records which archive files exist when the transaction commits."""
+
+    def __init__(self, cur, archive_dir):
+        super().__init__(cur)
+        self.archive_dir = archive_dir
+        self.at_commit = None
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.at_commit = sorted(os.listdir(self.archive_dir))
+        return False
+
+
+NAME = 'sample_data.transactions_p2024_01'
+
+
+def test_archive_writes_the_manifest_before_commit_and_renames_it_after(tmp_path):
+    conn = ArchiveConnection(ArchiveCursor(PARTS), tmp_path)
+    manifest = archive_partition(conn, NAME, archive_dir=str(tmp_path))
+    assert conn.at_commit == [f'{NAME}.copy.gz', f'{NAME}.json.tmp']
+    assert sorted(os.listdir(tmp_path)) == [f'{NAME}.copy.gz', f'{NAME}.json']
+    assert manifest['rows'] == 3 and manifest['sha256'] == hashlib.sha256(b'PGCOPY archived rows').hexdigest()
+
+
+def test_failed_archive_removes_its_files(tmp_path):
+    conn = ArchiveConnection(ArchiveCursor(PARTS, fail_on='DROP TABLE'), tmp_path)
+    with pytest.raises(RuntimeError):
+        archive_partition(conn, NAME, archive_dir=str(tmp_path))
+    assert os.listdir(tmp_path) == []
+
+
+def test_restore_uses_a_manifest_left_unrenamed(tmp_path):
+    archive_partition(ArchiveConnection(ArchiveCursor(PARTS), tmp_path), NAME, archive_dir=str(tmp_path))
+    os.rename(tmp_path / f'{NAME}.json', tmp_path / f'{NAME}.json.tmp')
+    assert restore_partition(RestoreConnection(RestoreCursor(PARTS)), NAME, str(tmp_path)) == 5
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,153 @@
+import datetime
+
+from qakit.planner import (Freshness, PlanStore, PlannerReport, QueryPlan, advise, analyze, create_indexes,
+                           fingerprint, freshness, misestimates, plan_shape, seq_scan_columns, set_autoanalyze)
+
+
+def seq_scan(filter_, plan_rows, actual_rows=None):
+    node = {'Node Type': 'Seq Scan', 'Relation Name': 'transactions', 'Filter': filter_, 'Plan Rows': plan_rows,
+            'Total Cost': 1234.5}
+    if actual_rows is not None:
+        node['Actual Rows'] = actual_rows
+    return node
+
+
+def aggregate(child, actual_rows=None):
+    node = {'Node Type': 'Aggregate', 'Plan Rows': 1, 'Plans': [child], 'Total Cost': 99.0}
+    if actual_rows is not None:
+        node['Actual Rows'] = actual_rows
+    return node
+
+
+def test_shape_and_fingerprint_ignore_costs_and_rows():
+    a = aggregate(seq_scan("(currency = 'GBP'::bpchar)", 10))
+    b = aggregate(seq_scan("(currency = 'EUR'::bpchar)", 90_000))
+    b['Total Cost'] = 1.0
+    assert plan_shape(a) == 'Aggregate(Seq Scan[transactions])'
+    assert fingerprint(a) == fingerprint(b)
+    index = aggregate({'Node Type': 'Index Scan', 'Index Name': 'transactions_currency_planner_idx',
+                       'Relation Name': 'transactions', 'Plan Rows': 10})
+    assert fingerprint(index) != fingerprint(a)
+
+
+def test_misestimates_flag_bad_estimates_but_not_nodes_under_limit():
+    stale = aggregate(seq_scan('(marker_tag = ...)', plan_rows=1, actual_rows=250_000), actual_rows=1)
+    assert [m['node'] for m in misestimates(stale)] == ['Seq Scan']
+    limited = {'Node Type': 'Limit', 'Plan Rows': 100, 'Actual Rows': 100,
+               'Plans': [seq_scan('(transaction_date < ...)', plan_rows=900_000, actual_rows=100)]}
+    assert misestimates(limited) == []
+
+
+def test_seq_scan_columns_are_read_from_filters():
+    plan = aggregate(seq_scan("((currency = 'GBP'::bpchar) AND ((status)::text = 'failed'::text))", 10))
+    assert seq_scan_columns(plan) == {'currency', 'status'}
+
+
+class FakeCursor:
+    def __init__(self, indexes):
+        self.indexes = indexes
+
+    def execute(self, sql, params=None):
+        pass
+
+    def fetchall(self):
+        return self.indexes
+
+
+def plans(**filters):
+    return {name: QueryPlan(name, aggregate(seq_scan(f, 10, 10), 1), [0.01]) for name, f in filters.items()}
+
+
+def test_advise_skips_indexed_columns_and_hashes_remarks():
+    measured = plans(run_rows='(marker_tag = ...)', remarks_lookup="(remarks = 'x'::text)",
+                     currency_status="((currency = 'GBP'::bpchar) AND ((status)::text = 'failed'::text))")
+    recs = advise(FakeCursor([('marker_tag', 'transactions_marker_tag_idx'), ('transaction_id', 'transactions_pkey')]),
+                  measured)
+    assert [r.column for r in recs] == ['currency', 'status', 'remarks']
+    assert recs[0].queries == ['currency_status']
+    assert 'USING hash (remarks)' in recs[2].ddl() and 'CONCURRENTLY' in recs[2].ddl()
+
+
+def test_plan_store_reports_changed_shapes(tmp_path):
+    path = str(tmp_path / 'plans.json')
+    store = PlanStore(path)
+    store.record(plans(run_rows='(marker_tag = ...)'))
+    store.save()
+    index_plan = aggregate({'Node Type': 'Index Only Scan', 'Index Name': 'transactions_marker_tag_idx',
+                            'Relation Name': 'transactions', 'Plan Rows': 10, 'Actual Rows': 10}, 1)
+    changed = PlanStore(path).changes({'run_rows': QueryPlan('run_rows', index_plan, [0.001])})
+    assert list(changed) == ['run_rows']
+
+
+def test_report_problems_on_remaining_misestimates_and_slowdown():
+    stale = Freshness(0, 1_000_000, 1_000_000, datetime.datetime(2024, 1, 1))
+    assert stale.stale and not Freshness(1_000_000, 1_000_000, 10, datetime.datetime(2024, 1, 1)).stale
+    before = plans(run_rows='(marker_tag = ...)')
+    good = PlannerReport(before, plans(run_rows='(marker_tag = ...)'), stale)
+    assert good.problems() == []
+    bad_after = {'run_rows': QueryPlan('run_rows', aggregate(seq_scan('(marker_tag = ...)', 1, 500), 1), [0.5])}
+    problems = PlannerReport(before, bad_after, stale).problems()
+    assert len(problems) == 2
+    absent = {'run_rows': QueryPlan('run_rows', aggregate(seq_scan('(marker_tag = ...)', 1800, 0), 1), [0.01])}
+    assert PlannerReport(before, absent, stale).problems() == []
+    assert good.summary()['queries']['run_rows']['plan_changed'] is False
+
+
+class BuildCursor(FakeCursor):
+    def __init__(self, relkind):
+        super().__init__([])
+        self.relkind = relkind
+        self.statements = []
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+
+    def fetchone(self):
+        return (self.relkind,)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class BuildConnection:
+    autocommit = False
+
+    def __init__(self, relkind):
+        self.cur = BuildCursor(relkind)
+
+    def cursor(self):
+        return self.cur
+
+
+def test_create_indexes_is_plain_on_a_partitioned_table():
+    recs = advise(FakeCursor([]), plans(run_rows='(marker_tag = ...)'))
+    for relkind, concurrent in (('r', True), ('p', False)):
+        conn = BuildConnection(relkind)
+        built = create_indexes(conn, recs)
+        assert list(built) == ['sample_data.transactions_marker_tag_planner_idx']
+        assert ('CONCURRENTLY' in conn.cur.statements[-1]) is concurrent and conn.autocommit is False
+
+
+def test_freshness_and_autoanalyze_cover_an_unpartitioned_table(conn):
+    # pg_partition_tree() returns no rows for a plain table
+    table = 'pg_temp.planner_freshness'
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute('CREATE TEMP TABLE planner_freshness AS SELECT g AS id FROM generate_series(1, 1000) g')
+    try:
+        analyze(conn, table)
+        with conn:
+            with conn.cursor() as cur:
+                assert freshness(cur, table).estimated_rows == 1000
+        set_autoanalyze(conn, False, table)
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute('SELECT reloptions FROM pg_class WHERE oid = %s::regclass', (table,))
+                assert cur.fetchone()[0] == ['autovacuum_enabled=false']
+    finally:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(f'DROP TABLE {table}')
@@ -0,0 +1,103 @@
+import time
+
+import pytest
+
+from qakit import population
+from qakit.generator import BlockGenerator
+from qakit.population import PopulationError, plan_shards, shard_seeds
+
+OUTCOMES = FAILING_SEED = None
+
+
+def test_plan_shards_covers_total_exactly():
+    assert plan_shards(10, 3) == [4, 3, 3]
+    assert plan_shards(10_000_001, 8)[0] == 1_250_001
+    assert sum(plan_shards(10_000_001, 8)) == 10_000_001
+    assert plan_shards(2, 8) == [1, 1]
+
+
+def test_shard_seeds_are_reproducible_and_distinct():
+    assert shard_seeds(None, 3) == [None, None, None]
+    seeds = shard_seeds(42, 4)
+    assert seeds == shard_seeds(42, 4)
+    assert len(set(seeds)) == 4
+
+
+class LoadCursor:
+    def __init__(self, log):
+        self.log = log
+        self.rowcount = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.log.append((sql, params))
+        self.rowcount = 5
+
+    def fetchone(self):
+        return (1000,)
+
+
+class LoadConnection:
+    log = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return LoadCursor(self.log)
+
+    def close(self):
+        pass
+
+
+def fake_copy_blocks(cur, blocks, fmt, table):
+    # runs in the forked shard workers; each shard appends how it ended to OUTCOMES
+    loaded = 0
+    try:
+        for blk in blocks:
+            time.sleep(0.01)
+            loaded += len(blk)
+    except population._Aborted:
+        with open(OUTCOMES, 'a') as f:
+            f.write(f'aborted {loaded}\n')
+        raise
+    with open(OUTCOMES, 'a') as f:
+        f.write(f'finished {loaded}\n')
+    return loaded
+
+
+class FailingGenerator(BlockGenerator):
+    def blocks(self, rows):
+        for i, blk in enumerate(super().blocks(rows)):
+            if self.seed == FAILING_SEED and i == 2:
+                raise ValueError('bad block')
+            yield blk
+
+
+def test_failed_shard_aborts_the_others_and_removes_only_this_loads_rows(monkeypatch, tmp_path):
+    global OUTCOMES, FAILING_SEED
+    OUTCOMES = str(tmp_path / 'outcomes')
+    FAILING_SEED = shard_seeds(7, 3)[1]
+    LoadConnection.log = []
+    monkeypatch.setattr(population, 'get_conn', lambda **kw: LoadConnection())
+    monkeypatch.setattr(population, 'copy_blocks', fake_copy_blocks)
+    monkeypatch.setattr(population, 'BlockGenerator', FailingGenerator)
+    with pytest.raises(PopulationError) as excinfo:
+        population.populate(3000, 'run-1', workers=3, block_size=10, seed=7)
+    err = excinfo.value
+    assert err.shard == 1 and isinstance(err.cause, ValueError) and err.rows_removed == 5
+    with open(OUTCOMES) as f:
+        outcomes = f.read().split()
+    # the two healthy shards were stopped well before their 1000 rows
+    assert outcomes.count('aborted') == 2 and all(int(n) < 1000 for n in outcomes[1::2])
+    sql, params = LoadConnection.log[-1]
+    # rows up to the high-water mark read before the load (1000) belong to earlier loads and stay
+    assert sql.startswith('DELETE') and 'transaction_id > %s' in sql and params == ('run-1', 1000)
@@ -0,0 +1,54 @@
+import json
+
+from qakit.profile_cache import ProfileCache
+from qakit.profiles import generate_profile
+
+CUSTOMER = {"purchases": [{"name": "Hiking Boots"}], "last_purchase": "30 days ago", "aov": 185,
+            "browsing": [{"item": "Camping Tents", "count": 3}], "brand_affinity": ["NorthFace"],
+            "discount_sensitivity": "High"}
+
+
+def customer(aov):
+    return dict(CUSTOMER, aov=aov)
+
+
+def test_hits_misses_and_lru_eviction():
+    cache = ProfileCache(maxsize=2)
+    assert cache.profile(customer(10)) == generate_profile(customer(10))
+    cache.profile(dict(reversed(list(customer(10).items()))))  # key order does not matter
+    cache.profile(customer(20))
+    cache.profile(customer(30))  # evicts aov=10
+    cache.profile(customer(10))
+    s = cache.report()
+    assert (s['hits'], s['misses'], s['evictions'], s['size']) == (1, 4, 2, 2)
+
+
+def test_cached_profiles_are_not_shared():
+    cache = ProfileCache()
+    cache.profile(CUSTOMER)["recommendations"].append("tampered")
+    assert cache.profile(CUSTOMER) == generate_profile(CUSTOMER)
+
+
+def test_disk_tier_survives_and_is_invalidated_by_rule_changes(tmp_path):
+    path = str(tmp_path / "profiles.sqlite")
+    first = ProfileCache(path=path)
+    first.profile_many([customer(a) for a in (10, 100, 200)])
+    first.close()
+
+    second = ProfileCache(path=path)
+    assert second.profile(customer(100)) == generate_profile(customer(100))
+    assert second.report()['disk_hits'] == 1
+    second.close()
+
+    changed = ProfileCache(path=path, version="rules-v2")
+    changed.profile(customer(100))
+    assert changed.report()['disk_hits'] == 0 and changed.report()['misses'] == 1
+    changed.close()
+
+
+def test_jsonl_lines_hit_without_parsing():
+    cache = ProfileCache()
+    lines = [json.dumps(customer(a)) + "\n" for a in (10, 100, 10)]
+    assert cache.profile_jsonl(lines) == [generate_profile(customer(a)) for a in (10, 100, 10)]
+    cache.profile_jsonl(lines[:1])
+    assert cache.report()['hits'] == 1 and cache.report()['misses'] == 3
@@ -0,0 +1,129 @@
+import json
+
+from qakit.profile_pipeline import CHANGED_USERS, STALE_USERS, input_columns, refresh_profiles
+from qakit.profiles import generate_profile, iter_profiles
+
+
+def test_sql_rows_feed_the_profile_engine():
+    purchases = [{'sku': 'SKU-7', 'name': 'SKU-7', 'date': '3 days ago'}]
+    rows = [(1, 180.0, '3 days ago', purchases), (2, None, '400 days ago', None)]
+    user_ids, cols = input_columns(rows)
+    assert user_ids == [1, 2]
+    expected = [
+        generate_profile({'purchases': purchases, 'last_purchase': '3 days ago', 'aov': 180.0,
+                          'browsing': [], 'brand_affinity': None, 'discount_sensitivity': None}),
+        generate_profile({'purchases': [], 'last_purchase': '400 days ago', 'aov': None,
+                          'browsing': [], 'brand_affinity': None, 'discount_sensitivity': None}),
+    ]
+    profiles = list(iter_profiles(cols))
+    assert profiles == expected
+    assert profiles[0]['ltv_segment'] == 'High' and profiles[1]['churn_risk'] is True
+    assert all(p['needs_more_data'] for p in profiles)
+
+
+class PipelineCursor:
+    """Replays refresh_profiles() against a table of (transaction_id, user_id) rows.
+
+    `settled` is what SETTLED_SQL finds: ids above it belong to writers still
+    in flight when the snapshot was taken.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.connection = db
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        db = self.db
+        if isinstance(sql, bytes):  # an execute_values page
+            return
+        if 'FROM sample_data.profile_watermarks' in sql:
+            self.rows = [db.watermark] if db.watermark else []
+        elif sql.startswith('SELECT max(transaction_id)'):
+            self.rows = [(max((i for i, _ in db.transactions), default=None),)]
+        elif 'pg_current_snapshot' in sql:
+            self.rows = [(db.settled, f'date-{db.settled}')] if db.settled else []
+        elif 'WITH users AS' in sql:
+            db.inputs.append((sql, params))
+            since = params['since_id'] or 0
+            users = sorted({u for i, u in db.transactions if since < i <= params['upto_id']})
+            if 'refreshed_at' in sql:
+                users = sorted(set(users) | set(db.stale))
+            self.rows = [(u, 100.0, '3 days ago', []) for u in users]
+        elif sql.startswith('INSERT INTO sample_data.profile_watermarks'):
+            db.watermark = params[1:]
+
+    def mogrify(self, template, args):
+        self.db.upserts.append(args[0])
+        return json.dumps(args).encode()
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchmany(self, size):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+
+class PipelineConnection:
+    encoding = 'UTF8'
+
+    def __init__(self, transactions, settled):
+        self.transactions = transactions
+        self.settled = settled
+        self.watermark = None
+        self.stale = []
+        self.inputs = []
+        self.upserts = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set_session(self, **kwargs):
+        pass
+
+    def cursor(self, name=None):
+        return PipelineCursor(self)
+
+
+def test_watermark_stops_at_the_settled_id_and_later_runs_are_incremental():
+    conn = PipelineConnection([(1, 10), (2, 11), (3, 12), (4, 13)], settled=3)
+    result = refresh_profiles(conn, batch_size=2)
+    # id 4's writer was still in flight: the watermark stays at 3 although the run saw up to 4
+    assert result['users'] == 4 and result['upto_id'] == 4 and result['watermark'] == (3, 'date-3')
+    assert conn.inputs[0][1]['since_id'] is None and sorted(conn.upserts) == [10, 11, 12, 13]
+
+    conn.transactions += [(5, 10), (6, 14)]
+    conn.settled, conn.upserts = 6, []
+    result = refresh_profiles(conn)
+    sql, params = conn.inputs[-1]
+    assert CHANGED_USERS in sql and params['since_id'] == 3 and params['upto_id'] == 6
+    assert sorted(conn.upserts) == [10, 13, 14] and result['watermark'] == (6, 'date-6')
+
+
+def test_settled_id_below_the_stored_watermark_keeps_the_watermark():
+    conn = PipelineConnection([(1, 10), (2, 11), (3, 12)], settled=None)
+    conn.watermark = (2, 'date-2')
+    result = refresh_profiles(conn)
+    assert result['watermark'] == (2, 'date-2') and conn.upserts == [12]
+
+
+def test_nothing_new_returns_the_same_keys_and_max_age_refreshes_stale_profiles():
+    conn = PipelineConnection([(1, 10), (2, 11)], settled=2)
+    conn.watermark = (2, 'date-2')
+    result = refresh_profiles(conn)
+    assert set(result) == {'users', 'watermark', 'upto_id', 'seconds'} and result['users'] == 0
+    assert conn.inputs == []
+    conn.stale = [10]
+    result = refresh_profiles(conn, max_age_days=7)
+    sql, params = conn.inputs[-1]
+    assert STALE_USERS in sql and params['max_age_days'] == 7 and conn.upserts == [10]
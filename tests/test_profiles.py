@@ -0,0 +1,92 @@
+import io
+import json
+import random
+
+from qakit.profile_cache import ProfileCache
+from qakit.profiles import (CustomerColumns, generate_profile, generate_profiles, iter_jsonl_profiles,
+                            iter_profiles)
+from qakit.rules import RuleSet, compile_rules
+
+CUSTOM_RULES = RuleSet.from_dict({
+    "ltv": {"thresholds": [[200, "Gold"], [25, "Silver"], [100, "Bronze"]], "default": "None", "unknown": "?"},
+    "discount_keywords": ["low", "%"],
+    "churn_days": 30,
+    "required_fields": ["aov", "email"],
+    "recommendations": [{"label": "Shoes", "keywords": ["shoe", "boot"], "count_above": 1},
+                        {"label": "Outdoor", "keywords": ["camp", "hiking"]},
+                        {"label": "Jackets", "keywords": ["jacket"], "count_above": 2}],
+    "cross_sell": [{"name": "tent", "purchased": ["backpack"], "browsed": ["tent"]},
+                   {"name": "jacket", "purchased": ["t-shirt"], "browsed": ["jacket", "grill"]}],
+})
+
+ITEMS = ["Camping Tents", "Hiking Boots", "Sale Shoes", "TENT stakes", "Campfire Grill", "Jackets", ""]
+NAMES = ["Hiking Boots", "Backpack", "T-Shirt", "Snow BOOTS", "Jacket", ""]
+LAST = [None, "", "30 days ago", "181 days ago", "180 days ago", "0 days ago", "yesterday", "365  days ago", 12]
+DISCOUNT = [None, "", "High", "Medium", "low", ">20%", "very HIGH"]
+AOV = [None, 0, 25, 74.99, 75, 149.5, 150, 210]
+
+
+def random_customer(rng):
+    data = {
+        "purchases": [{"sku": f"SKU-{i}", "name": rng.choice(NAMES)} for i in range(rng.randint(0, 3))],
+        "last_purchase": rng.choice(LAST),
+        "aov": rng.choice(AOV),
+        "browsing": [{"item": rng.choice(ITEMS), "count": rng.randint(0, 3), "window_days": 7}
+                     for _ in range(rng.randint(0, 4))],
+        "brand_affinity": rng.sample(["NorthFace", "Osprey", "Generic"], rng.randint(0, 3)),
+        "discount_sensitivity": rng.choice(DISCOUNT),
+    }
+    if rng.random() < 0.1:
+        data["ltv_segment"] = rng.choice(["VIP", ""])
+    for key in list(data):
+        if rng.random() < 0.05:
+            del data[key]
+    return data
+
+
+def test_batch_engine_matches_generate_profile():
+    rng = random.Random(1234)
+    records = [random_customer(rng) for _ in range(5000)]
+    assert generate_profiles(records) == [generate_profile(r) for r in records]
+
+
+def test_batch_engine_matches_a_custom_rule_set():
+    engine = compile_rules(CUSTOM_RULES)
+    rng = random.Random(4321)
+    records = [random_customer(rng) for _ in range(3000)]
+    for r in records[::3]:
+        r["email"] = "someone@example.com"
+    expected = [generate_profile(r, engine=engine) for r in records]
+    assert generate_profiles(records, engine) == expected
+    assert any(len(set(p["recommendations"])) > 1 for p in expected)
+    assert expected != [generate_profile(r) for r in records]
+    source = io.StringIO("".join(json.dumps(r) + "\n" for r in records[:200]))
+    assert list(iter_jsonl_profiles(source, batch_size=64, engine=engine)) == expected[:200]
+    cache = ProfileCache(engine=engine)
+    assert cache.profile_many(records[:50]) == expected[:50]
+    assert cache.version != ProfileCache().version
+    assert RuleSet.from_dict(CUSTOM_RULES.as_dict()).as_dict() == CUSTOM_RULES.as_dict()
+
+
+def test_columnar_input_and_empty_batch():
+    cols = CustomerColumns({
+        "purchases": [[], [{"name": "Hiking Boots"}]],
+        "last_purchase": [None, "200 days ago"],
+        "aov": [None, 180],
+        "browsing": [[], [{"item": "Camping Tents", "count": 2}]],
+        "brand_affinity": [[], ["NorthFace"]],
+        "discount_sensitivity": ["Low", "High"],
+    })
+    profiles = list(iter_profiles(cols))
+    assert profiles[1] == {"ltv_segment": "High", "discount_sensitive": True, "recommendations": ["Camping Tents"],
+                           "loyalty_flag": True, "churn_risk": True, "cross_sell_opportunity": True,
+                           "needs_more_data": False}
+    assert profiles[0]["ltv_segment"] == "Unknown" and profiles[0]["needs_more_data"] is True
+    assert generate_profiles([]) == []
+
+
+def test_jsonl_stream_in_batches():
+    rng = random.Random(99)
+    records = [random_customer(rng) for _ in range(250)]
+    source = io.StringIO("".join(json.dumps(r) + "\n" for r in records))
+    assert list(iter_jsonl_profiles(source, batch_size=64)) == [generate_profile(r) for r in records]
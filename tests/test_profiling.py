@@ -0,0 +1,86 @@
+import json
+
+import psycopg2.errors
+
+from qakit import profiling
+from qakit.profiling import COUNTERS, StatementStats, StepProfiler, statement_deltas
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_statement_deltas_keeps_moved_statements_slowest_first():
+    before = {1: ('SELECT 1', 5, 10.0, 5, 0, 0), 2: ('SELECT 2', 1, 1.0, 1, 0, 0)}
+    after = {1: ('SELECT 1', 7, 30.0, 7, 4, 1), 2: ('SELECT 2', 1, 1.0, 1, 0, 0), 3: ('INSERT  INTO t\n VALUES (1)', 1, 50.0, 1, 0, 0)}
+    deltas = statement_deltas(before, after)
+    assert [d['query'] for d in deltas] == ['INSERT INTO t VALUES (1)', 'SELECT 1']
+    assert deltas[1] == {'query': 'SELECT 1', 'calls': 2, 'ms': 20.0, 'rows': 2, 'shared_blks_hit': 4,
+                         'shared_blks_read': 1}
+
+
+def test_profiler_nests_spans_and_attributes_counters(tmp_path):
+    clock = FakeClock()
+    profiler = StepProfiler(clock=clock)
+    try:
+        assert profiling.ENABLED
+        profiler.begin('scenario', 'S')
+        profiler.begin('step', 'Given a')
+        COUNTERS.add('round_trips', 3)
+        COUNTERS.add('rows_written', 100)
+        clock.now = 2.0
+        step = profiler.end('passed')
+        clock.now = 2.5
+        scenario = profiler.end('passed')
+    finally:
+        profiler.close()
+    assert not profiling.ENABLED
+    assert step['dur'] == 2_000_000 and step['args']['round_trips'] == 3 and step['args']['rows_written'] == 100
+    assert scenario['dur'] == 2_500_000 and scenario['args']['round_trips'] == 3
+    steps_path, trace_path = profiler.write(str(tmp_path))
+    with open(trace_path) as f:
+        assert [e['cat'] for e in json.load(f)['traceEvents']] == ['scenario', 'step']
+    with open(steps_path) as f:
+        assert json.load(f)[0]['seconds'] == 2.0
+    assert 'Given a' in profiler.summary()
+
+
+class PgssCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        if 'FROM pg_stat_statements' in sql:
+            raise psycopg2.errors.ObjectNotInPrerequisiteState('pg_stat_statements must be loaded via '
+                                                               'shared_preload_libraries')
+
+    def fetchall(self):
+        return [('total_exec_time',)]
+
+
+class PgssConnection:
+    autocommit = False
+    closed = False
+
+    def cursor(self):
+        return PgssCursor(self)
+
+    def close(self):
+        self.closed = True
+
+
+def test_statement_stats_unavailable_when_extension_is_not_preloaded():
+    conn = PgssConnection()
+    stats = StatementStats(lambda: conn)
+    assert stats.unavailable() and stats.snapshot() == {}
+    assert conn.closed
@@ -0,0 +1,133 @@
+import json
+import os
+import random
+import re
+
+from qakit.profiles import CRITICAL_FIELDS, DEFAULT_RULES, generate_profile, parse_days_ago
+from qakit.rules import Category, KeywordAutomaton, RuleSet, compile_rules
+
+FEATURE = os.path.join(os.path.dirname(__file__), "..", "features", "customer_profile.feature")
+
+
+def legacy_generate_profile(data):
+    # generate_profile() as it was before the rules were compiled; kept as the oracle
+    profile = {}
+    aov = data.get("aov")
+    ltv = data.get("ltv_segment")
+    if not ltv:
+        if aov is None:
+            profile["ltv_segment"] = "Unknown"
+        elif aov >= 150:
+            profile["ltv_segment"] = "High"
+        elif aov >= 75:
+            profile["ltv_segment"] = "Medium"
+        else:
+            profile["ltv_segment"] = "Low"
+    else:
+        profile["ltv_segment"] = ltv
+
+    ds = (data.get("discount_sensitivity") or "").lower()
+    if "high" in ds or (isinstance(ds, str) and ">" in ds):
+        profile["discount_sensitive"] = True
+    else:
+        profile["discount_sensitive"] = False
+
+    profile["recommendations"] = []
+    for b in data.get("browsing", []):
+        if "camp" in b.get("item", "").lower() or "tent" in b.get("item", "").lower():
+            if b.get("count", 0) > 0:
+                profile["recommendations"].append("Camping Tents")
+
+    brands = data.get("brand_affinity", []) or []
+    profile["loyalty_flag"] = bool(brands) and len(brands) == 1
+
+    last_purchase = data.get("last_purchase")
+    days = None
+    if isinstance(last_purchase, str):
+        days = parse_days_ago(last_purchase)
+    if days is None and last_purchase is None and data.get("purchases"):
+        profile["churn_risk"] = False
+    elif days is None and last_purchase is None:
+        profile["churn_risk"] = True
+    else:
+        profile["churn_risk"] = (days is not None and days > 180)
+
+    names = [p.get("name", "").lower() for p in data.get("purchases", [])]
+    profile["cross_sell_opportunity"] = (any("boot" in n for n in names) or any("hiking" in n for n in names)) and any("camp" in b.get("item", "").lower() for b in data.get("browsing", []))
+
+    profile["needs_more_data"] = any(data.get(k) in (None, [], "") for k in CRITICAL_FIELDS)
+    return profile
+
+
+ITEMS = ["Camping Tents", "Hiking Boots", "Sale Shoes", "TENT stakes", "Campfire Grill", "Encampment", "Ten", ""]
+NAMES = ["Hiking Boots", "Backpack", "Snow BOOTS", "Hik", "Bootcamp", ""]
+LAST = [None, "", "30 days ago", "181 days ago", "180 days ago", "yesterday", 12]
+DISCOUNT = [None, "", "High", "Medium", ">20%", "very HIGH", "hig"]
+AOV = [None, 0, 74.99, 75, 149.5, 150, 210]
+
+
+def random_customer(rng):
+    data = {
+        "purchases": [{"name": rng.choice(NAMES)} for _ in range(rng.randint(0, 3))],
+        "last_purchase": rng.choice(LAST),
+        "aov": rng.choice(AOV),
+        "browsing": [{"item": rng.choice(ITEMS), "count": rng.randint(0, 2)} for _ in range(rng.randint(0, 4))],
+        "brand_affinity": rng.sample(["NorthFace", "Osprey", "Generic"], rng.randint(0, 3)),
+        "discount_sensitivity": rng.choice(DISCOUNT),
+    }
+    if rng.random() < 0.1:
+        data["ltv_segment"] = rng.choice(["VIP", ""])
+    for key in list(data):
+        if rng.random() < 0.05:
+            del data[key]
+    return data
+
+
+def test_compiled_default_rules_match_legacy_generator():
+    rng = random.Random(2024)
+    for _ in range(5000):
+        data = random_customer(rng)
+        assert generate_profile(data) == legacy_generate_profile(data)
+
+
+def test_feature_file_customers_match_legacy_generator():
+    with open(FEATURE) as f:
+        blocks = re.findall(r'"""(.*?)"""', f.read(), re.S)
+    assert blocks
+    for block in blocks:
+        data = json.loads(block)
+        assert list(generate_profile(data).items()) == list(legacy_generate_profile(data).items())
+
+
+def test_automaton_reports_overlapping_and_nested_keywords():
+    automaton = KeywordAutomaton([["he", "hers"], ["she"], ["his"], ["xyz"]])
+    assert automaton.scan("USHERS") == 0b011
+    assert automaton.scan("this") == 0b100
+    assert automaton.scan("") == 0
+
+
+def test_ruleset_from_dict_with_many_categories():
+    rules = RuleSet.from_dict({
+        "ltv": {"thresholds": [[500, "Platinum"], [100, "Gold"]], "default": "Basic", "unknown": "?"},
+        "discount_keywords": ["coupon"],
+        "churn_days": 30,
+        "required_fields": ["aov"],
+        "recommendations": [{"label": f"Cat {i}", "keywords": [f"kw{i:03d}"]} for i in range(200)] +
+                           [{"label": "Bulk", "keywords": ["kw007"], "count_above": 5}],
+        "cross_sell": [{"name": "x", "purchased": ["kw001"], "browsed": ["kw199"]}],
+    })
+    engine = compile_rules(rules)
+    profile = generate_profile({
+        "aov": 100, "discount_sensitivity": "Coupon user", "last_purchase": "31 days ago",
+        "purchases": [{"name": "KW001 thing"}],
+        "browsing": [{"item": "kw007 kw150", "count": 6}, {"item": "kw199", "count": 0}],
+    }, engine=engine)
+    assert profile["ltv_segment"] == "Gold" and profile["discount_sensitive"] and profile["churn_risk"]
+    assert profile["recommendations"] == ["Cat 7", "Cat 150", "Bulk"]
+    assert profile["cross_sell_opportunity"] and not profile["needs_more_data"]
+    assert engine.ltv_segment(499.99) == "Gold" and engine.ltv_segment(500) == "Platinum"
+
+
+def test_default_rules_are_declared_as_data():
+    assert isinstance(DEFAULT_RULES.recommendations[0], Category)
+    assert DEFAULT_RULES.required_fields == CRITICAL_FIELDS
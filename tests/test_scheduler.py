@@ -0,0 +1,91 @@
+import json
+
+from qakit.db import TRANSACTIONS_DDL
+from qakit.scheduler import (ResultCache, environment_sources, plan_run, scenario_results, severity,
+                             source_closure)
+
+
+class FakeScenario:
+    def __init__(self, location, severity='Medium', fingerprint=None):
+        self.location = location
+        self.key = location
+        self.severity = severity
+        self.fingerprint = fingerprint or f'fp-{location}'
+
+
+def helper(x):
+    return x + 1
+
+
+def step_impl(context):
+    return helper(context)
+
+
+def create_table(cur):
+    cur.execute(TRANSACTIONS_DDL)
+
+
+def test_severity_from_plan_and_tags():
+    plan = {'001': 'Medium', '007': 'High'}
+    assert severity(['plan-001'], plan) == 'Medium'
+    assert severity(['plan-001', 'plan-007'], plan) == 'High'
+    assert severity(['plan-007', 'severity-critical'], plan) == 'Critical'
+    assert severity(['slow', 'plan-999'], plan) == 'Medium'
+
+
+def test_source_closure_follows_repo_helpers():
+    sources = source_closure([step_impl])
+    assert any(key.endswith(':helper') for key in sources)
+    assert any('return helper(context)' in s for s in sources.values())
+
+
+def test_source_closure_includes_modules_of_imported_constants():
+    sources = source_closure([create_table])
+    assert 'qakit/db.py' in sources and 'tests/test_scheduler.py' in sources
+
+
+def test_environment_hooks_are_part_of_the_fingerprint(tmp_path):
+    env = tmp_path / 'environment.py'
+    env.write_text('def before_scenario(context, scenario):\n    context.x = 1\n')
+    assert any('context.x = 1' in s for s in environment_sources(str(env)).values())
+    assert environment_sources(str(tmp_path / 'missing.py')) == {}
+
+
+def test_critical_always_runs_and_rest_fill_budget_by_severity_then_duration(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache.json'))
+    cache.data['durations'] = {'crit': 50.0, 'high-slow': 8.0, 'high-fast': 2.0, 'medium': 3.0, 'low': 1.0}
+    scenarios = [FakeScenario('low', 'Low'), FakeScenario('medium'), FakeScenario('high-slow', 'High'),
+                 FakeScenario('high-fast', 'High'), FakeScenario('crit', 'Critical')]
+    schedule = plan_run(scenarios, cache, 'ds', budget=56.0)
+    assert [s.location for s, _ in schedule.selected] == ['crit', 'high-fast', 'medium', 'low']
+    assert [s.location for s, _ in schedule.deferred] == ['high-slow']
+    assert [level for level, _ in schedule.tiers()] == ['Critical', 'High', 'Medium', 'Low']
+    assert [s.location for s, _ in plan_run(scenarios, cache, 'ds', budget=0).selected] == ['crit']
+
+
+def test_unchanged_passes_are_reused_for_the_same_dataset_only(tmp_path):
+    path = str(tmp_path / 'cache.json')
+    cache = ResultCache(path)
+    passed, failed = FakeScenario('a'), FakeScenario('b')
+    cache.record(passed, 'ds', 'passed', 1.5)
+    cache.record(failed, 'ds', 'failed', 0.5)
+    cache.save()
+    cache = ResultCache(path)
+    schedule = plan_run([passed, failed], cache, 'ds')
+    assert [s.location for s, _ in schedule.reused] == ['a']
+    assert [s.location for s, _ in schedule.selected] == ['b']
+    assert plan_run([passed], cache, 'other-ds').reused == []
+    assert plan_run([FakeScenario('a', fingerprint='edited')], cache, 'ds').reused == []
+    assert plan_run([passed], cache, 'ds', reuse=False).reused == []
+
+
+def test_scenario_results_add_background_time_and_skip_unselected():
+    step = {'result': {'status': 'passed', 'duration': 1.0}}
+    report = [{'name': 'f', 'location': 'x.feature:1', 'elements': [
+        {'type': 'background', 'steps': [step]},
+        {'type': 'scenario', 'location': 'x.feature:5', 'status': 'passed', 'steps': [step, step]},
+        {'type': 'background', 'steps': [step]},
+        {'type': 'scenario', 'location': 'x.feature:9', 'status': 'skipped', 'steps': []},
+    ]}]
+    results = scenario_results(json.loads(json.dumps(report)), ['x.feature:5'])
+    assert results == {'x.feature:5': ('passed', 3.0)}
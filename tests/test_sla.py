@@ -0,0 +1,89 @@
+from qakit.sla import BenchmarkResult, SlaHistory, percentile, query_key, run_benchmark, sla_violations
+
+
+def result(latencies, timeout=1, timed_out=False):
+    r = BenchmarkResult('SELECT COUNT(*) FROM sample_data.transactions;', timeout)
+    r.latencies = list(latencies)
+    r.timed_out = timed_out
+    r.error = 'canceling statement due to statement timeout' if timed_out else None
+    return r
+
+
+def test_percentile_interpolates():
+    assert percentile([3, 1, 2], 50) == 2
+    assert percentile([0, 10], 95) == 9.5
+    assert percentile([4], 99) == 4
+
+
+def test_query_key_ignores_whitespace_case_and_semicolon():
+    assert query_key('select  count(*)\n FROM t;') == query_key('SELECT count(*) FROM t')
+
+
+def test_violations_for_timeout_sla_and_regression():
+    assert sla_violations(result([0.1, 0.2])) == []
+    assert 'exceeds' in sla_violations(result([0.1, 1.5]))[0]
+    assert 'regressed' in sla_violations(result([0.5, 0.5]), baseline=0.2)[0]
+    # tiny absolute differences are noise, not regressions
+    assert sla_violations(result([0.003, 0.003]), baseline=0.001) == []
+
+
+def test_timeout_is_a_violation_and_a_regression_against_a_baseline():
+    problems = sla_violations(result([0.9], timed_out=True))
+    assert len(problems) == 1 and 'beyond the 1s SLA' in problems[0]
+    assert 'regressed' in sla_violations(result([], timed_out=True), baseline=0.2)[1]
+
+
+def test_history_baseline_uses_passing_runs_only(tmp_path):
+    path = str(tmp_path / 'reports' / 'sla.json')
+    history = SlaHistory(path)
+    assert history.baseline('SELECT COUNT(*) FROM sample_data.transactions') is None
+    history.record(result([0.2, 0.2]), passed=True)
+    history.record(result([0.4, 0.4]), passed=True)
+    history.record(result([], timed_out=True), passed=False)
+    history.save()
+
+    reloaded = SlaHistory(path)
+    assert abs(reloaded.baseline('select count(*) from sample_data.transactions') - 0.3) < 1e-9
+    assert len(reloaded.data[query_key(result([]).query)]['runs']) == 3
+
+
+class ReadOnlyCursor:
+    def __init__(self, conn):
+        self.log = conn.log
+        self.timeouts = conn.timeouts
+        self.description = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.log.append(sql)
+        if 'statement_timeout' in sql:
+            self.timeouts.append(params)
+
+
+class ReadOnlyConnection:
+    def __init__(self):
+        self.log = []
+        self.timeouts = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return ReadOnlyCursor(self)
+
+
+def test_every_benchmark_run_is_read_only_under_a_ceiling_above_the_sla():
+    conn = ReadOnlyConnection()
+    r = run_benchmark(conn, 'UPDATE sample_data.transactions SET amount = amount + 1', 1, runs=2, warmup=1)
+    assert len(r.latencies) == 2 and r.explain is None
+    assert set(conn.timeouts) == {(3000,)}
+    statements = [sql for sql in conn.log if not sql.startswith('SET LOCAL')]
+    assert statements == ['SET TRANSACTION READ ONLY', 'UPDATE sample_data.transactions SET amount = amount + 1'] * 3
@@ -0,0 +1,72 @@
+import json
+import os
+
+import pytest
+
+from qakit.snapshots import SnapshotCache, SnapshotResult, fingerprint
+
+
+def test_fingerprint_tracks_dataset_parameters():
+    base = fingerprint(1000, 42)
+    assert fingerprint(1000, 42) == base
+    assert fingerprint(1001, 42) != base
+    assert fingerprint(1000, 43) != base
+    assert fingerprint(1000, 42, ddl='CREATE TABLE t (id INT);') != base
+
+
+def test_fingerprint_tracks_the_date_anchor(monkeypatch):
+    monkeypatch.setenv('QA_DATA_NOW', '2024-06-01T00:00:00')
+    base = fingerprint(1000, 42)
+    monkeypatch.setenv('QA_DATA_NOW', '2024-07-01T00:00:00')
+    assert fingerprint(1000, 42) != base
+
+
+def test_fingerprint_ignores_ddl_whitespace():
+    assert fingerprint(10, 1, ddl='CREATE TABLE t (\n  id INT\n);') == fingerprint(10, 1, ddl='CREATE TABLE t ( id INT );')
+
+
+def make_cache(tmp_path, **kwargs):
+    return SnapshotCache(mode='dump', registry_path=str(tmp_path / 'registry.json'), dump_dir=str(tmp_path), **kwargs)
+
+
+def add_entry(cache, fp, size, last_used):
+    os.makedirs(cache._dump_path(fp))
+    cache.entries[fp] = {'mode': 'dump', 'rows': 1, 'seed': 1, 'bytes': size, 'build_seconds': 1.0,
+                         'created': last_used, 'last_used': last_used}
+
+
+def test_evict_least_recently_used_over_disk_limit(tmp_path):
+    cache = make_cache(tmp_path, max_bytes=250, max_entries=10)
+    add_entry(cache, 'old', 100, '2024-01-01T00:00:00')
+    add_entry(cache, 'mid', 100, '2024-02-01T00:00:00')
+    add_entry(cache, 'new', 100, '2024-03-01T00:00:00')
+    assert cache.evict() == ['old']
+    assert sorted(cache.entries) == ['mid', 'new']
+    assert not os.path.exists(cache._dump_path('old'))
+    with open(tmp_path / 'registry.json') as f:
+        assert sorted(json.load(f)) == ['mid', 'new']
+
+
+def test_evict_keeps_the_entry_just_built(tmp_path):
+    cache = make_cache(tmp_path, max_bytes=10 ** 9, max_entries=1)
+    add_entry(cache, 'new', 100, '2024-01-01T00:00:00')
+    add_entry(cache, 'other', 100, '2024-02-01T00:00:00')
+    assert cache.evict(keep='new') == ['other']
+    assert list(cache.entries) == ['new']
+
+
+def test_registry_round_trip(tmp_path):
+    cache = make_cache(tmp_path)
+    add_entry(cache, 'abc', 10, '2024-01-01T00:00:00')
+    cache._save()
+    assert make_cache(tmp_path).entries == cache.entries
+
+
+def test_unknown_mode_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        SnapshotCache(mode='rsync', registry_path=str(tmp_path / 'r.json'))
+
+
+def test_summary_compares_restore_with_regeneration():
+    text = SnapshotResult('abc', 'qa_run', True, 2.0, 100.0, 2 ** 30).summary()
+    assert 'restored into qa_run' in text and '50.0x' in text
@@ -1,26 +1,8 @@
-import os
 import datetime
 import uuid
-import pytest
 from decimal import Decimal
-import psycopg2
 
-# Helper to build DB connection
-def get_conn():
-    params = {
-        'host': os.environ.get('PGHOST', 'localhost'),
-        'port': int(os.environ.get('PGPORT', 5432)),
-        'dbname': os.environ.get('PGDATABASE', 'postgres'),
-        'user': os.environ.get('PGUSER', 'postgres'),
-        'password': os.environ.get('PGPASSWORD', ''),
-    }
-    return psycopg2.connect(**params)
-
-@pytest.fixture(scope='module')
-def conn():
-    c = get_conn()
-    yield c
-    c.close()
+from qakit.dal import TransactionWriter
 
 
 def test_currency_char3_rejects(conn):
@@ -29,8 +11,7 @@ def test_currency_char3_rejects(conn):
     try:
         with conn:
             with conn.cursor() as cur:
-                cur.execute("INSERT INTO sample_data.transactions (user_id, product_id, amount, currency, transaction_date, status, remarks, marker_tag) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)",
-                            (10001,10002, Decimal('1.00'), 'USDX', datetime.datetime.utcnow(), 'pending', 'pytest-currency-test', marker))
+                TransactionWriter(cur).insert((10001,10002, Decimal('1.00'), 'USDX', datetime.datetime.utcnow(), 'pending', 'pytest-currency-test', marker))
     except Exception as e:
         err = e
     assert err is not None, "Expected DB to reject currency with length > 3"
@@ -44,9 +25,7 @@ def test_status_update_unexpected_value(conn):
     try:
         with conn:
             with conn.cursor() as cur:
-                cur.execute("INSERT INTO sample_data.transactions (user_id, product_id, amount, currency, transaction_date, status, remarks, marker_tag) VALUES (%s,%s,%s,%s,%s,%s,%s,%s) RETURNING transaction_id",
-                            (20001,20002, Decimal('5.00'), 'USD', datetime.datetime.utcnow(), 'pending', 'pytest-status-test', marker))
-                rowid = cur.fetchone()[0]
+                rowid = TransactionWriter(cur).insert((20001,20002, Decimal('5.00'), 'USD', datetime.datetime.utcnow(), 'pending', 'pytest-status-test', marker))
                 cur.execute("UPDATE sample_data.transactions SET status = %s WHERE transaction_id = %s", ('invalid_state', rowid))
                 cur.execute("SELECT status FROM sample_data.transactions WHERE transaction_id = %s", (rowid,))
                 status_db = cur.fetchone()[0]
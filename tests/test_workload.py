@@ -0,0 +1,155 @@
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+
+import psycopg2.errors
+
+from qakit import workload
+from qakit.workload import ClientStats, WorkloadReport, histogram, run_workload
+
+
+class Deadlock(psycopg2.errors.DeadlockDetected):
+    pgcode = '40P01'
+
+
+class SerializationFailure(psycopg2.errors.SerializationFailure):
+    pgcode = '40001'
+
+
+def test_histogram_buckets_by_upper_bound():
+    h = histogram([0.0005, 0.001, 0.0015, 0.3, 9.0])
+    assert h['<=1ms'] == 2 and h['<=2ms'] == 1 and h['<=500ms'] == 1 and h['>5000ms'] == 1
+    assert sum(h.values()) == 5
+
+
+def test_report_merges_clients():
+    a, b = ClientStats(), ClientStats()
+    a.latencies['insert'] = [0.01, 0.02]
+    a.inserted, a.attempts, a.deadlocks = 2, 3, 1
+    a.increments = {7: 2}
+    b.latencies['update'] = [0.03]
+    b.attempts, b.serialization_failures = 2, 1
+    b.increments = {7: 1, 8: 1}
+    report = WorkloadReport(2, 0.5, [a, b])
+    assert report.committed == 3 and report.throughput == 6.0
+    assert report.increments == {7: 3, 8: 1}
+    s = report.summary()
+    assert s['deadlock_rate'] == 0.2 and s['serialization_failure_rate'] == 0.2
+    assert s['operations']['insert']['count'] == 2 and 'read' not in s['operations']
+
+
+class WorkloadCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        db = self.conn.db
+        if sql.startswith('UPDATE'):
+            with db.lock:
+                if db.failures:
+                    raise db.failures.pop(0)('could not serialize access')
+            self.conn.pending.append(('update', params[2], params[0]))
+        elif sql.startswith('INSERT'):
+            remarks = 'workload-counter' if 'workload-counter' in sql else 'workload-insert'
+            with db.lock:
+                db.next_id += 1
+                tid = db.next_id
+            self.conn.pending.append(('insert', tid, remarks))
+            self.result = [(tid,)]
+        elif 'remarks = \'workload-counter\'' in sql:
+            self.result = [(tid, amount) for tid, (amount, remarks) in db.rows.items() if remarks == 'workload-counter']
+        elif 'COUNT(*)' in sql:
+            self.result = [(sum(remarks == 'workload-insert' for _, remarks in db.rows.values()),)]
+        else:
+            self.result = [('pending', Decimal('0'))]
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return self.result
+
+
+class WorkloadConnection:
+    def __init__(self, db):
+        self.db = db
+        self.pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.db.commit(self.pending)
+        self.pending = []
+        return False
+
+    def set_session(self, **kwargs):
+        pass
+
+    def cursor(self):
+        return WorkloadCursor(self)
+
+
+class WorkloadDb:
+    """Committed rows by id; `failures` are error classes raised by the next UPDATEs, `lose` drops commits."""
+
+    def __init__(self, failures=(), lose=()):
+        self.rows = {}
+        self.next_id = 0
+        self.failures = list(failures)
+        self.lose = set(lose)
+        self.commits = 0
+        self.lock = threading.Lock()
+
+    def commit(self, changes):
+        with self.lock:
+            self.commits += 1
+            if self.commits in self.lose:
+                return
+            for kind, tid, value in changes:
+                if kind == 'insert':
+                    self.rows[tid] = [Decimal('0'), value]
+                else:
+                    self.rows[tid][0] += value
+
+    @contextmanager
+    def connection(self):
+        yield WorkloadConnection(self)
+
+
+def test_deadlocks_and_serialization_failures_are_retried_with_backoff(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(workload.time, 'sleep', sleeps.append)
+    db = WorkloadDb(failures=[Deadlock, SerializationFailure, Deadlock])
+    report = run_workload(db, 'run-1', clients=1, operations=4, mix={'update': 1}, seed=3, hot_rows=2)
+    assert report.deadlocks == 2 and report.serialization_failures == 1
+    assert report.attempts == 7 and report.failed == 0 and report.committed == 4
+    # jittered exponential backoff: attempt n sleeps at most 1ms * 2**n
+    assert len(sleeps) == 3 and all(0 <= t <= 0.001 * 2 ** n for n, t in enumerate(sleeps))
+    assert report.problems == []
+
+
+def test_an_operation_failing_every_retry_is_counted_not_raised(monkeypatch):
+    monkeypatch.setattr(workload.time, 'sleep', lambda s: None)
+    db = WorkloadDb(failures=[Deadlock] * 3)
+    report = run_workload(db, 'run-1', clients=1, operations=2, mix={'update': 1}, max_retries=2, seed=3, hot_rows=2)
+    assert report.failed == 1 and report.committed == 1 and report.deadlocks == 3
+    assert report.problems == []
+
+
+def test_lost_update_and_lost_insert_are_flagged():
+    # commit 1 is the hot-row setup; the first two workload transactions then "commit" without effect
+    db = WorkloadDb(lose={2, 3})
+    report = run_workload(db, 'run-1', clients=1, operations=6, mix={'update': 1}, seed=5, hot_rows=2)
+    assert len(report.problems) == 2 and all('was committed' in p for p in report.problems)
+    db = WorkloadDb(lose={2})
+    report = run_workload(db, 'run-1', clients=1, operations=3, mix={'insert': 1}, seed=5, hot_rows=2)
+    assert report.problems == ['2 workload inserts persisted but 3 were committed']